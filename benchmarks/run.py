@@ -0,0 +1,302 @@
+"""
+Runs the SDK's evaluation micro-benchmarks.
+
+For each benchmark this reports the time per operation and the memory each operation allocates, as
+measured by ``tracemalloc``. Results can be written as JSON and compared against a previous run:
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --compare results.json
+
+Use ``--filter`` to run only the benchmarks whose names contain the given text.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from scenarios import (
+    BIG_SEGMENT_MEMBERSHIP,
+    BIG_SEGMENT_USER_HASH,
+    EVALUATION_SCENARIOS,
+    USER,
+    make_data
+)
+
+from ldclient.async_client import AsyncLDClient
+from ldclient.async_config import AsyncBigSegmentsConfig, AsyncConfig
+from ldclient.async_feature_store import AsyncInMemoryFeatureStore
+from ldclient.client import LDClient
+from ldclient.config import BigSegmentsConfig, Config
+from ldclient.context import Context
+from ldclient.evaluation import EvaluationDetail
+from ldclient.feature_store import InMemoryFeatureStore
+from ldclient.impl.events.types import EventFactory
+from ldclient.interfaces import (
+    AsyncBigSegmentStore,
+    AsyncEventProcessor,
+    BigSegmentStore,
+    BigSegmentStoreMetadata,
+    EventProcessor
+)
+from ldclient.testing.mock_async_components import MockAsyncUpdateProcessor
+from ldclient.testing.stub_util import MockUpdateProcessor
+from ldclient.version import VERSION
+from ldclient.versioned_data_kind import FEATURES
+
+# A benchmark is a function that performs its operation the given number of times.
+Benchmark = Callable[[int], None]
+
+
+class _DiscardingEventProcessor(EventProcessor):
+    """Accepts events without keeping them, so that event creation is measured but memory use is not skewed."""
+
+    def send_event(self, event):
+        pass
+
+    def flush(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class _DiscardingAsyncEventProcessor(AsyncEventProcessor):
+    def send_event(self, event):
+        pass
+
+    def flush(self):
+        pass
+
+    async def flush_and_wait(self, timeout: float) -> bool:
+        return True
+
+    async def stop(self):
+        pass
+
+
+class _StubBigSegmentStore(BigSegmentStore):
+    def get_metadata(self) -> BigSegmentStoreMetadata:
+        return BigSegmentStoreMetadata(int(time.time() * 1000))
+
+    def get_membership(self, context_hash: str) -> Optional[dict]:
+        return BIG_SEGMENT_MEMBERSHIP if context_hash == BIG_SEGMENT_USER_HASH else None
+
+    def stop(self):
+        pass
+
+
+class _StubAsyncBigSegmentStore(AsyncBigSegmentStore):
+    async def get_metadata(self) -> BigSegmentStoreMetadata:
+        return BigSegmentStoreMetadata(int(time.time() * 1000))
+
+    async def get_membership(self, context_hash: str) -> Optional[dict]:
+        return BIG_SEGMENT_MEMBERSHIP if context_hash == BIG_SEGMENT_USER_HASH else None
+
+    async def stop(self) -> None:
+        pass
+
+
+def _repeat(op: Callable[[], Any]) -> Benchmark:
+    def run(n: int) -> None:
+        for _ in range(n):
+            op()
+
+    return run
+
+
+def _repeat_async(loop: asyncio.AbstractEventLoop, op: Callable[[], Any]) -> Benchmark:
+    async def repeat(n: int) -> None:
+        for _ in range(n):
+            await op()
+
+    def run(n: int) -> None:
+        loop.run_until_complete(repeat(n))
+
+    return run
+
+
+def _evaluate(method: Callable[[str, Context, Any], Any], key: str, context: Context) -> Callable[[], Any]:
+    return lambda: method(key, context, None)
+
+
+def _sync_client_benchmarks(client: LDClient) -> List[Tuple[str, Benchmark]]:
+    benchmarks = []
+    for name, key, context in EVALUATION_SCENARIOS:
+        benchmarks.append(('sync/variation/%s' % name, _repeat(_evaluate(client.variation, key, context))))
+        benchmarks.append(('sync/variation_detail/%s' % name, _repeat(_evaluate(client.variation_detail, key, context))))
+    benchmarks.append(('sync/all_flags_state', _repeat(lambda: client.all_flags_state(USER))))
+    benchmarks.append(('sync/all_flags_state/with_reasons', _repeat(lambda: client.all_flags_state(USER, with_reasons=True))))
+    return benchmarks
+
+
+def _async_client_benchmarks(loop: asyncio.AbstractEventLoop, client: AsyncLDClient) -> List[Tuple[str, Benchmark]]:
+    benchmarks = []
+    for name, key, context in EVALUATION_SCENARIOS:
+        benchmarks.append(('async/variation/%s' % name, _repeat_async(loop, _evaluate(client.variation, key, context))))
+        benchmarks.append(('async/variation_detail/%s' % name, _repeat_async(loop, _evaluate(client.variation_detail, key, context))))
+    benchmarks.append(('async/all_flags_state', _repeat_async(loop, lambda: client.all_flags_state(USER))))
+    benchmarks.append(('async/all_flags_state/with_reasons', _repeat_async(loop, lambda: client.all_flags_state(USER, with_reasons=True))))
+    return benchmarks
+
+
+def _component_benchmarks(client: LDClient) -> List[Tuple[str, Benchmark]]:
+    flag = client._data_system.store.get(FEATURES, 'flat-boolean', lambda x: x)
+    detail = EvaluationDetail(True, 1, {'kind': 'FALLTHROUGH'})
+    event_factory = EventFactory(False)
+    return [
+        ('context/create', _repeat(lambda: Context.create('bench-user'))),
+        ('context/builder', _repeat(lambda: Context.builder('bench-user').name('Bench User').set('email', 'bench-user@example.com').set('plan', 'enterprise').build())),
+        ('context/create_multi', _repeat(lambda: Context.create_multi(Context.create('bench-user'), Context.create('bench-org', 'organization')))),
+        ('events/new_eval_event', _repeat(lambda: event_factory.new_eval_event(flag, USER, detail, False))),
+    ]
+
+
+def _measure_time(benchmark: Benchmark, min_time: float, repeat: int) -> Tuple[int, List[float]]:
+    # Find an iteration count that takes long enough to time reliably, then time several batches.
+    n = 1
+    while True:
+        start = time.perf_counter_ns()
+        benchmark(n)
+        elapsed = time.perf_counter_ns() - start
+        if elapsed >= min_time * 1e9 / repeat or n >= 1 << 24:
+            break
+        n = n * 10 if elapsed < min_time * 1e7 else n * 2
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        benchmark(n)
+        samples.append((time.perf_counter_ns() - start) / n)
+    return n, samples
+
+
+def _measure_memory(benchmark: Benchmark, samples: int) -> Tuple[float, float]:
+    # The peak is measured one operation at a time, since it reflects transient allocations; the
+    # retained size is measured over all of them, since caches or leaks only show up cumulatively.
+    gc.collect()
+    tracemalloc.start()
+    try:
+        benchmark(1)
+        gc.collect()
+        base, _ = tracemalloc.get_traced_memory()
+        peaks = []
+        for _ in range(samples):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            benchmark(1)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(peaks), (current - base) / samples
+
+
+def _run(benchmarks: List[Tuple[str, Benchmark]], args) -> List[Dict[str, Any]]:
+    results = []
+    for name, benchmark in benchmarks:
+        iterations, samples = _measure_time(benchmark, args.min_time, args.repeat)
+        peak_bytes, retained_bytes = _measure_memory(benchmark, args.memory_samples)
+        result = {  # type: Dict[str, Any]
+            'name': name,
+            'iterations': iterations,
+            'ns_per_op': statistics.median(samples),
+            'ns_per_op_min': min(samples),
+            'peak_bytes_per_op': peak_bytes,
+            'retained_bytes_per_op': retained_bytes,
+        }
+        results.append(result)
+        print('%-48s %12.0f ns/op %12.0f ns/op (min) %10.0f B/op (peak) %8.1f B/op (retained)' % (name, result['ns_per_op'], result['ns_per_op_min'], peak_bytes, retained_bytes))
+    return results
+
+
+def _compare(results: List[Dict[str, Any]], baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {r['name']: r for r in json.load(f)['results']}
+    print()
+    print('%-48s %12s %12s %8s' % ('benchmark', 'baseline', 'current', 'change'))
+    for result in results:
+        old = baseline.get(result['name'])
+        if old is None:
+            print('%-48s %12s %12.0f %8s' % (result['name'], '-', result['ns_per_op'], 'new'))
+            continue
+        change = (result['ns_per_op'] - old['ns_per_op']) / old['ns_per_op'] * 100.0
+        print('%-48s %12.0f %12.0f %+7.1f%%' % (result['name'], old['ns_per_op'], result['ns_per_op'], change))
+
+
+async def _start_async_client(data) -> AsyncLDClient:
+    store = AsyncInMemoryFeatureStore()
+    await store.init(data)
+    config = AsyncConfig(
+        'bench-sdk-key',
+        feature_store=store,
+        update_processor_class=MockAsyncUpdateProcessor,
+        event_processor_class=lambda config: _DiscardingAsyncEventProcessor(),
+        big_segments=AsyncBigSegmentsConfig(store=_StubAsyncBigSegmentStore()),
+        diagnostic_opt_out=True,
+    )
+    client = AsyncLDClient(config)
+    await client.start()
+    return client
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description='Runs the SDK evaluation micro-benchmarks.')
+    parser.add_argument('--filter', default='', help='only run benchmarks whose names contain this text')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--compare', help='compare the results with a JSON file written by --output')
+    parser.add_argument('--min-time', type=float, default=1.0, help='approximate seconds spent timing each benchmark')
+    parser.add_argument('--repeat', type=int, default=5, help='number of timed batches per benchmark')
+    parser.add_argument('--memory-samples', type=int, default=200, help='number of operations traced for memory use')
+    args = parser.parse_args(argv)
+
+    data = make_data()
+    store = InMemoryFeatureStore()
+    store.init(data)
+    config = Config(
+        'bench-sdk-key',
+        feature_store=store,
+        update_processor_class=MockUpdateProcessor,
+        event_processor_class=lambda config: _DiscardingEventProcessor(),
+        big_segments=BigSegmentsConfig(store=_StubBigSegmentStore()),
+        diagnostic_opt_out=True,
+    )
+    loop = asyncio.new_event_loop()
+    client = LDClient(config)
+    async_client = loop.run_until_complete(_start_async_client(data))
+    try:
+        benchmarks = _component_benchmarks(client) + _sync_client_benchmarks(client) + _async_client_benchmarks(loop, async_client)
+        results = _run([b for b in benchmarks if args.filter in b[0]], args)
+    finally:
+        client.close()
+        loop.run_until_complete(async_client.close())
+        loop.close()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(
+                {
+                    'sdk_version': VERSION,
+                    'python_version': platform.python_version(),
+                    'python_implementation': platform.python_implementation(),
+                    'platform': platform.platform(),
+                    'timestamp': int(time.time()),
+                    'results': results,
+                },
+                f,
+                indent=2,
+            )
+    if args.compare:
+        _compare(results, args.compare)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,138 @@
+"""
+Flag data and evaluation scenarios for the benchmark suite.
+
+The data is built with the same builders that the unit tests use, so it stays valid as the data
+model evolves. Each scenario names one flag and the context it is evaluated for; the flags are all
+stored together so that ``all_flags_state`` sees the complete data set.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+from ldclient.context import Context
+from ldclient.impl.big_segments import _hash_for_user_key
+from ldclient.impl.evaluator import _make_big_segment_ref
+from ldclient.testing.builders import (
+    FlagBuilder,
+    FlagRuleBuilder,
+    SegmentBuilder,
+    SegmentRuleBuilder,
+    make_clause,
+    make_clause_matching_segment_key
+)
+from ldclient.versioned_data_kind import FEATURES, SEGMENTS, VersionedDataKind
+
+RULE_COUNT = 50
+TARGET_GROUPS = 20
+TARGET_KEYS_PER_GROUP = 500
+SEGMENT_COUNT = 10
+SEGMENT_INCLUDED_KEYS = 200
+PREREQUISITE_DEPTH = 5
+
+USER = (
+    Context.builder('bench-user')
+    .name('Bench User')
+    .set('email', 'bench-user@example.com')
+    .set('plan', 'enterprise')
+    .set('country', 'us')
+    .set('appVersion', '4.12.1')
+    .build()
+)
+ORGANIZATION = Context.builder('bench-org').kind('organization').set('tier', 'gold').build()
+MULTI_CONTEXT = Context.create_multi(USER, ORGANIZATION)
+
+BIG_SEGMENT = SegmentBuilder('big-segment').version(1).unbounded(True).generation(1).build()
+BIG_SEGMENT_USER_HASH = _hash_for_user_key(USER.key)
+BIG_SEGMENT_MEMBERSHIP = {_make_big_segment_ref(BIG_SEGMENT): True}
+
+
+def _flat_flag():
+    return FlagBuilder('flat-boolean').version(1).on(True).variations(False, True).off_variation(0).fallthrough_variation(1).build()
+
+
+def _many_rules_flag():
+    # Only the last rule matches, so every evaluation walks all of them; the clauses cycle through
+    # the operator families so that each kind of matching is represented.
+    rules = []
+    for i in range(RULE_COUNT - 1):
+        clause = [
+            make_clause(None, 'country', 'in', 'c%d' % i, 'd%d' % i, 'e%d' % i),
+            make_clause(None, 'email', 'endsWith', '@example-%d.com' % i),
+            make_clause(None, 'appVersion', 'semVerLessThan', '1.%d.0' % i),
+            make_clause(None, 'email', 'matches', '^admin-%d@' % i),
+            make_clause(None, 'plan', 'startsWith', 'legacy-%d' % i),
+        ][i % 5]
+        rules.append(FlagRuleBuilder().id('rule-%d' % i).clauses(clause).variation(0).build())
+    rules.append(FlagRuleBuilder().id('rule-last').clauses(make_clause(None, 'plan', 'in', 'enterprise')).variation(1).build())
+    return FlagBuilder('many-rules').version(1).on(True).variations(False, True).off_variation(0).fallthrough_variation(0).rules(*rules).build()
+
+
+def _large_targets_flag():
+    builder = FlagBuilder('large-targets').version(1).on(True).variations(False, True).off_variation(0).fallthrough_variation(1)
+    for group in range(TARGET_GROUPS):
+        builder.target(0, *('user-%d-%d' % (group, i) for i in range(TARGET_KEYS_PER_GROUP)))
+        builder.context_target('organization', 0, *('org-%d-%d' % (group, i) for i in range(TARGET_KEYS_PER_GROUP)))
+    builder.context_target(Context.DEFAULT_KIND, 0)
+    return builder.build()
+
+
+def _segments():
+    segments = []
+    for i in range(SEGMENT_COUNT):
+        country = 'us' if i == SEGMENT_COUNT - 1 else 'zz%d' % i
+        segments.append(
+            SegmentBuilder('segment-%d' % i)
+            .version(1)
+            .included(*('member-%d-%d' % (i, j) for j in range(SEGMENT_INCLUDED_KEYS)))
+            .rules(SegmentRuleBuilder().clauses(make_clause(None, 'country', 'in', country)).build())
+            .build()
+        )
+    return segments
+
+
+def _segment_heavy_flag(segments):
+    rule = FlagRuleBuilder().id('segments').clauses(make_clause_matching_segment_key(*(s.key for s in segments))).variation(1).build()
+    return FlagBuilder('segment-heavy').version(1).on(True).variations(False, True).off_variation(0).fallthrough_variation(0).rules(rule).build()
+
+
+def _prerequisite_chain_flags():
+    flags = []
+    for i in range(PREREQUISITE_DEPTH):
+        builder = FlagBuilder('prerequisite-%d' % i).version(1).on(True).variations(False, True).off_variation(0).fallthrough_variation(1)
+        if i < PREREQUISITE_DEPTH - 1:
+            builder.prerequisite('prerequisite-%d' % (i + 1), 1)
+        flags.append(builder.build())
+    flags.append(FlagBuilder('prerequisite-chain').version(1).on(True).variations(False, True).off_variation(0).prerequisite('prerequisite-0', 1).fallthrough_variation(1).build())
+    return flags
+
+
+def _rollout_flag():
+    rollout = {'variations': [{'variation': 0, 'weight': 30000}, {'variation': 1, 'weight': 30000}, {'variation': 2, 'weight': 40000}]}
+    return FlagBuilder('rollout').version(1).on(True).variations('a', 'b', 'c').off_variation(0).salt('bench-salt').fallthrough_rollout(rollout).build()
+
+
+def _big_segment_flag():
+    rule = FlagRuleBuilder().id('big-segment').clauses(make_clause_matching_segment_key(BIG_SEGMENT.key)).variation(1).build()
+    return FlagBuilder('big-segment-flag').version(1).on(True).variations(False, True).off_variation(0).fallthrough_variation(0).rules(rule).build()
+
+
+def make_data() -> Dict[VersionedDataKind, Dict[str, Dict[str, Any]]]:
+    """Returns the full data set in the form accepted by a feature store's ``init`` method."""
+    segments = _segments()
+    flags = [_flat_flag(), _many_rules_flag(), _large_targets_flag(), _segment_heavy_flag(segments), _rollout_flag(), _big_segment_flag()]
+    flags.extend(_prerequisite_chain_flags())
+    return {
+        FEATURES: {f.key: f.to_json_dict() for f in flags},
+        SEGMENTS: {s.key: s.to_json_dict() for s in segments + [BIG_SEGMENT]},
+    }
+
+
+# (scenario name, flag key, context)
+EVALUATION_SCENARIOS = [
+    ('flat-boolean', 'flat-boolean', USER),
+    ('many-rules', 'many-rules', USER),
+    ('large-targets', 'large-targets', MULTI_CONTEXT),
+    ('segment-heavy', 'segment-heavy', USER),
+    ('prerequisite-chain', 'prerequisite-chain', USER),
+    ('rollout', 'rollout', USER),
+    ('big-segment', 'big-segment-flag', USER),
+]  # type: List[Tuple[str, str, Context]]
@@ -4,7 +4,16 @@ Async client for the LaunchDarkly Server-Side Python SDK.
 
 import asyncio
 import traceback
-from typing import Any, Callable, List, Optional, Tuple
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple
+)
 from uuid import uuid4
 
 from ldclient.async_config import AsyncConfig
@@ -28,7 +37,7 @@ from ldclient.impl.client_common import (
 )
 from ldclient.impl.client_common import secure_mode_hash as _secure_mode_hash
 from ldclient.impl.datasystem import AsyncDataSystem, DataAvailability
-from ldclient.impl.evaluator_common import error_reason
+from ldclient.impl.evaluator_common import EvaluationScope, error_reason
 from ldclient.impl.events.async_event_processor import (
     DefaultAsyncEventProcessor
 )
@@ -45,7 +54,8 @@ from ldclient.interfaces import (
     AsyncFlagTracker,
     BigSegmentStoreStatusProvider,
     DataSourceStatusProvider,
-    DataStoreStatusProvider
+    DataStoreStatusProvider,
+    EventProcessorMetrics
 )
 from ldclient.migrations import OpTracker, Stage
 from ldclient.plugin import EnvironmentMetadata
@@ -90,6 +100,8 @@ class AsyncLDClient:
 
         self._event_factory_default = EventFactory(False)
         self._event_factory_with_reasons = EventFactory(True)
+        # all_flags_state never sends events, so it uses a factory that tells the evaluator not to create them
+        self._event_factory_no_events = EventFactory(False, enabled=False)
 
         # Build the object graph here (loop-free). start() supplies the loop-bound
         # resources: the HTTP session (created lazily), the data source, the
@@ -263,7 +275,12 @@ class AsyncLDClient:
     def _set_event_processor(self, config):
         if config.offline or not config.send_events:
             self._event_processor = AsyncNullEventProcessor()
+            # Evaluation events would only be discarded, so don't create them.
+            self._event_factory_default = EventFactory(False, enabled=False)
+            self._event_factory_with_reasons = EventFactory(True, enabled=False)
             return None
+        self._event_factory_default = EventFactory(False)
+        self._event_factory_with_reasons = EventFactory(True)
         if not config.event_processor_class:
             diagnostic_id = create_diagnostic_id(config)
             diagnostic_accumulator = None if config.diagnostic_opt_out else _DiagnosticAccumulator(diagnostic_id)
@@ -419,6 +436,55 @@ class AsyncLDClient:
 
         return (await self.__evaluate_with_hooks(key=key, context=context, default_value=default, method="variation_detail", block=evaluate)).evaluation_detail
 
+    async def variations(self, keys: Iterable[str], context: Context, defaults: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+        """Calculates the values of several feature flags for the same context.
+
+        This produces the same values and analytics events as calling :func:`variation()` for each
+        key, and runs any hooks once per flag with a method name of ``"variations"``. However, each
+        flag and segment is read from the data store at most once for the whole batch, and the results
+        of segment matches, prerequisite evaluations and Big Segment queries are reused from one flag
+        to the next.
+
+        :param keys: the unique keys of the feature flags
+        :param context: the evaluation context
+        :param defaults: optional default values, by flag key, to be used for any flag that cannot be
+          evaluated; the default for a flag that is not in this mapping is None
+        :return: a dictionary of flag keys to the variation for the given context, or to the default
+          value for any flag that could not be evaluated
+        """
+        details = await self.__evaluate_batch(keys, context, defaults, self._event_factory_default, "variations")
+        return {key: detail.value for key, detail in details.items()}
+
+    async def variation_details(self, keys: Iterable[str], context: Context, defaults: Optional[Mapping[str, Any]] = None) -> Dict[str, EvaluationDetail]:
+        """Calculates the values of several feature flags for the same context, and returns objects
+        that describe the way each value was determined.
+
+        This is the batch equivalent of :func:`variation_detail()`, in the same way that
+        :func:`variations()` is the batch equivalent of :func:`variation()`. Hooks are run once per
+        flag with a method name of ``"variation_details"``.
+
+        :param keys: the unique keys of the feature flags
+        :param context: the evaluation context
+        :param defaults: optional default values, by flag key, to be used for any flag that cannot be
+          evaluated; the default for a flag that is not in this mapping is None
+        :return: a dictionary of flag keys to :class:`ldclient.evaluation.EvaluationDetail` objects
+        """
+        return await self.__evaluate_batch(keys, context, defaults, self._event_factory_with_reasons, "variation_details")
+
+    async def __evaluate_batch(self, keys: Iterable[str], context: Context, defaults: Optional[Mapping[str, Any]], event_factory: EventFactory, method: str) -> Dict[str, EvaluationDetail]:
+        scope = EvaluationScope()
+        hooks = list(self.__hooks)  # type: List[AsyncHook]
+        results = {}  # type: Dict[str, EvaluationDetail]
+        for key in keys:
+            default = None if defaults is None else defaults.get(key)
+
+            async def evaluate():
+                detail, _ = await self._evaluate_internal(key, context, default, event_factory, scope)
+                return _EvaluationWithHookResult(evaluation_detail=detail)
+
+            results[key] = (await self.__evaluate_with_hooks(key=key, context=context, default_value=default, method=method, block=evaluate, hooks=hooks)).evaluation_detail
+        return results
+
     async def migration_variation(self, key: str, context: Context, default_stage: Stage) -> Tuple[Stage, OpTracker]:
         """
         This method returns the migration stage of the migration feature flag
@@ -449,7 +515,7 @@ class AsyncLDClient:
         hook_result = await self.__evaluate_with_hooks(key=key, context=context, default_value=default_stage.value, method="migration_variation", block=evaluate)
         return hook_result.results['default_stage'], hook_result.results['tracker']
 
-    async def _evaluate_internal(self, key: str, context: Context, default: Any, event_factory) -> Tuple[EvaluationDetail, Optional[FeatureFlag]]:
+    async def _evaluate_internal(self, key: str, context: Context, default: Any, event_factory, scope: Optional[EvaluationScope] = None) -> Tuple[EvaluationDetail, Optional[FeatureFlag]]:
         default = self._config.get_default(key, default)
 
         if self._config.offline:
@@ -461,7 +527,8 @@ class AsyncLDClient:
             else:
                 log.warning("Feature Flag evaluation attempted before client has initialized! Feature store unavailable - returning default: " + str(default) + " for feature key: " + key)
                 reason = error_reason('CLIENT_NOT_READY')
-                self._send_event(event_factory.new_unknown_flag_event(key, context, default, reason))
+                if event_factory.enabled:
+                    self._send_event(event_factory.new_unknown_flag_event(key, context, default, reason))
                 return EvaluationDetail(default, None, reason), None
 
         if not context.valid:
@@ -469,32 +536,41 @@ class AsyncLDClient:
             return EvaluationDetail(default, None, error_reason('USER_NOT_SPECIFIED')), None
 
         try:
-            flag = await self._data_system.store.get(FEATURES, key)
+            if scope is not None and key in scope.flags:
+                flag = scope.flags[key]
+            else:
+                flag = await self._data_system.store.get(FEATURES, key)
+                if scope is not None:
+                    scope.flags[key] = flag
         except Exception as e:
             log.error("Unexpected error while retrieving feature flag \"%s\": %s" % (key, repr(e)))
             log.debug(traceback.format_exc())
             reason = error_reason('EXCEPTION')
-            self._send_event(event_factory.new_unknown_flag_event(key, context, default, reason))
+            if event_factory.enabled:
+                self._send_event(event_factory.new_unknown_flag_event(key, context, default, reason))
             return EvaluationDetail(default, None, reason), None
         if not flag:
             reason = error_reason('FLAG_NOT_FOUND')
-            self._send_event(event_factory.new_unknown_flag_event(key, context, default, reason))
+            if event_factory.enabled:
+                self._send_event(event_factory.new_unknown_flag_event(key, context, default, reason))
             return EvaluationDetail(default, None, reason), None
         else:
             try:
-                result = await self._evaluator.evaluate(flag, context, event_factory)
+                result = await self._evaluator.evaluate(flag, context, event_factory, scope)
                 for event in result.events or []:
                     self._send_event(event)
                 detail = result.detail
                 if detail.is_default_value():
                     detail = EvaluationDetail(default, None, detail.reason)
-                self._send_event(event_factory.new_eval_event(flag, context, detail, default))
+                if event_factory.enabled:
+                    self._send_event(event_factory.new_eval_event(flag, context, detail, default))
                 return detail, flag
             except Exception as e:
                 log.error("Unexpected error while evaluating feature flag \"%s\": %s" % (key, repr(e)))
                 log.debug(traceback.format_exc())
                 reason = error_reason('EXCEPTION')
-                self._send_event(event_factory.new_default_event(flag, context, default, reason))
+                if event_factory.enabled:
+                    self._send_event(event_factory.new_default_event(flag, context, default, reason))
                 return EvaluationDetail(default, None, reason), flag
 
     async def all_flags_state(self, context: Context, **kwargs) -> FeatureFlagsState:
@@ -549,11 +625,18 @@ class AsyncLDClient:
             log.error("Unable to read flags for all_flag_state: %s" % repr(e))
             return FeatureFlagsState(False)
 
+        # Segment matches and prerequisite results are the same for every flag that uses them, so
+        # they are shared across this call; the flags we just read also serve prerequisite lookups.
+        scope = EvaluationScope()
+        for key, flag in flags_map.items():
+            if isinstance(flag, FeatureFlag):
+                scope.flags[key] = flag
+
         for key, flag in flags_map.items():
             if client_only and not flag.get('clientSide', False):
                 continue
             try:
-                result = await self._evaluator.evaluate(flag, context, self._event_factory_default)
+                result = await self._evaluator.evaluate(flag, context, self._event_factory_no_events, scope)
                 detail = result.detail
                 prerequisites = result.prerequisites
             except Exception as e:
@@ -607,7 +690,9 @@ class AsyncLDClient:
 
         self.__hooks.append(hook)
 
-    async def __evaluate_with_hooks(self, key: str, context: Context, default_value: Any, method: str, block: Callable[[], Any]) -> _EvaluationWithHookResult:
+    async def __evaluate_with_hooks(
+        self, key: str, context: Context, default_value: Any, method: str, block: Callable[[], Any], hooks: Optional[List[AsyncHook]] = None
+    ) -> _EvaluationWithHookResult:
         """
         # evaluate_with_hook will run the provided block, wrapping it with evaluation hook support.
         #
@@ -616,10 +701,12 @@ class AsyncLDClient:
         # :param default:
         # :param method:
         # :param block:
+        # :param hooks: a snapshot of the hooks to run, if the caller already took one
         # :return:
         """
         # Snapshot the hook list to ensure hooks added during evaluation don't get called for the current evaluation.
-        hooks = list(self.__hooks)  # type: List[AsyncHook]
+        if hooks is None:
+            hooks = list(self.__hooks)
 
         if not hooks:
             return await block()
@@ -650,6 +737,17 @@ class AsyncLDClient:
             log.error(f"An error occurred in {method} of the hook {hook_name}: #{e}")
             return {}
 
+    def get_event_metrics(self) -> Optional[EventProcessorMetrics]:
+        """
+        Returns a snapshot of the analytics event processor's internal metrics, such as how many
+        events were dropped and how long it took to deliver them, or None if events are disabled or
+        a custom event processor does not provide metrics.
+
+        Most values in :class:`ldclient.interfaces.EventProcessorMetrics` are totals since the client
+        started, so an application can poll this method and report them to its own metrics system.
+        """
+        return self._event_processor.get_metrics()
+
     @property
     def big_segment_store_status_provider(self) -> BigSegmentStoreStatusProvider:
         """
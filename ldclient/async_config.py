@@ -139,6 +139,9 @@ class AsyncConfig(DataSourceBuilderConfig, PrivateAttributesConfig):
         omit_anonymous_contexts: bool = False,
         payload_filter_key: Optional[str] = None,
         datasystem_config: Optional[DataSystemConfig] = None,
+        events_max_payload_size: Optional[int] = None,
+        events_flush_high_water_ratio: Optional[float] = 0.5,
+        context_keys_false_positive_rate: Optional[float] = None,
     ):
         """
         :param sdk_key: The SDK key for your LaunchDarkly account. This is always required.
@@ -210,6 +213,20 @@ class AsyncConfig(DataSourceBuilderConfig, PrivateAttributesConfig):
         :param omit_anonymous_contexts: Sets whether anonymous contexts should be omitted from index and identify events.
         :param payload_filter_key: The payload filter is used to selectively limited the flags and segments delivered in the data source payload.
         :param datasystem_config: Configuration for the upcoming enhanced data system design. This is experimental and should not be set without direction from LaunchDarkly support.
+        :param events_max_payload_size: The maximum size, in bytes of uncompressed JSON, of a single analytics
+          events request. When a flush produces more than this, the events are split across several requests.
+          An event that is larger than this by itself is still sent, in a request of its own. By default, there
+          is no limit.
+        :param events_flush_high_water_ratio: When the events buffer is at least this full, as a fraction of
+          ``events_max_pending``, or holds about ``events_max_payload_size`` bytes of events, it is flushed without
+          waiting for ``flush_interval``. If every flush worker is busy, the buffer is instead kept until one is
+          free, and may grow to twice ``events_max_pending`` before events are dropped. Set this to None to flush
+          only at ``flush_interval`` or when ``flush()`` is called. By default, this is 0.5.
+        :param context_keys_false_positive_rate: If set, the event processor remembers context keys in a
+          fixed-size probabilistic filter instead of an exact cache, so that ``context_keys_capacity`` can be
+          very large without using much memory; about 1.2 MB per million keys at a rate of 0.01. A context that
+          was not seen before is mistaken for one that was with about this probability, in which case no index
+          event is sent for it. It must be between 0 and 1. By default, an exact cache is used.
         """
         self.__sdk_key = validate_sdk_key_format(sdk_key, log)
 
@@ -235,6 +252,7 @@ class AsyncConfig(DataSourceBuilderConfig, PrivateAttributesConfig):
         self.__offline = offline
         self.__context_keys_capacity = context_keys_capacity
         self.__context_keys_flush_interval = context_keys_flush_interval
+        self.__context_keys_false_positive_rate = context_keys_false_positive_rate if context_keys_false_positive_rate is not None and 0 < context_keys_false_positive_rate < 1 else None
         self.__diagnostic_opt_out = diagnostic_opt_out
         self.__diagnostic_recording_interval = max(diagnostic_recording_interval, 60)
         self.__wrapper_name = wrapper_name
@@ -250,6 +268,8 @@ class AsyncConfig(DataSourceBuilderConfig, PrivateAttributesConfig):
         self._data_source_update_sink: Optional[AsyncDataSourceUpdateSink] = None
         self.__instance_id: Optional[str] = None
         self._datasystem_config = datasystem_config
+        self.__events_max_payload_size = events_max_payload_size if events_max_payload_size is not None and events_max_payload_size > 0 else None
+        self.__events_flush_high_water_ratio = events_flush_high_water_ratio if events_flush_high_water_ratio is not None and 0 < events_flush_high_water_ratio <= 1 else None
 
     # for internal use only - probably should be part of the client logic
     def get_default(self, key, default):
@@ -352,6 +372,14 @@ class AsyncConfig(DataSourceBuilderConfig, PrivateAttributesConfig):
     def context_keys_flush_interval(self) -> float:
         return self.__context_keys_flush_interval
 
+    @property
+    def context_keys_false_positive_rate(self) -> Optional[float]:
+        """
+        The false positive rate of the probabilistic filter used to remember context keys, or None if an
+        exact cache is used.
+        """
+        return self.__context_keys_false_positive_rate
+
     @property
     def diagnostic_opt_out(self) -> bool:
         return self.__diagnostic_opt_out
@@ -415,6 +443,22 @@ class AsyncConfig(DataSourceBuilderConfig, PrivateAttributesConfig):
     def enable_event_compression(self) -> bool:
         return self.__enable_event_compression
 
+    @property
+    def events_max_payload_size(self) -> Optional[int]:
+        """
+        The maximum size, in bytes of uncompressed JSON, of a single analytics events request, or None if
+        there is no limit.
+        """
+        return self.__events_max_payload_size
+
+    @property
+    def events_flush_high_water_ratio(self) -> Optional[float]:
+        """
+        The fraction of ``events_max_pending`` at which the events buffer is flushed early, or None if it is
+        only flushed at ``flush_interval``.
+        """
+        return self.__events_flush_high_water_ratio
+
     @property
     def omit_anonymous_contexts(self) -> bool:
         """
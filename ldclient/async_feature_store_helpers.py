@@ -2,14 +2,28 @@
 This submodule contains support code for writing async feature store implementations.
 """
 
+import asyncio
 import inspect
-from typing import Any, Dict, Mapping, Optional
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple
+)
 
 from ldclient.feature_store import CacheConfig
 from ldclient.feature_store_helpers import (
+    _NOOP_CACHE,
     _CachingStoreWrapperBase,
     _ensure_encoded
 )
+from ldclient.impl.dependency_tracker import KindAndKey
+from ldclient.impl.util import log
 from ldclient.interfaces import (
     AsyncFeatureStore,
     AsyncFeatureStoreCore,
@@ -34,7 +48,9 @@ class AsyncCachingStoreWrapper(_CachingStoreWrapperBase, DiagnosticDescription,
         before upgrading.
 
     The cache is a plain in-memory dict, which is safe for concurrent access within a single asyncio
-    event loop because its reads and writes never suspend between one another.
+    event loop because its reads and writes never suspend between one another. Concurrent cache misses
+    for the same entry share a single query to the core. Stale entries, and the proactively refreshed
+    sets of all items, are refreshed by tasks on the event loop that is using the wrapper.
     """
 
     _core: AsyncFeatureStoreCore
@@ -47,7 +63,11 @@ class AsyncCachingStoreWrapper(_CachingStoreWrapperBase, DiagnosticDescription,
         """
         self._core = core
         self._has_available_method = callable(getattr(core, 'is_available', None))
+        self._has_get_many_method = callable(getattr(core, 'get_many_internal', None))
         super().__init__(cache_config)
+        self._refresh_all_interval = cache_config.expiration / 2 if cache_config.refresh_all_proactively else None
+        # started on first use, since there may be no running event loop yet
+        self._refresh_all_task = None  # type: Optional[asyncio.Task]
 
     async def is_available(self) -> bool:
         """Tests whether the underlying store seems to be reachable.
@@ -62,22 +82,39 @@ class AsyncCachingStoreWrapper(_CachingStoreWrapperBase, DiagnosticDescription,
         await self._core.init_internal(all_data)
         self._cache_init(all_data)
         self._inited = True
+        self._start_refresh_all_task()
 
     async def get(self, kind: VersionedDataKind, key: str) -> Optional[Any]:
         """ """
         hit, value = self._cache_get_item(kind, key)
         if hit:
             return value
-        encoded_item = await self._core.get_internal(kind, key)
-        return self._cache_put_item(kind, key, encoded_item)
+        return await self._single_flight(self._item_cache_key(kind, key), lambda: self._load_item(kind, key))
+
+    async def get_many(self, kind: VersionedDataKind, keys: Iterable[str]) -> Dict[str, Any]:
+        """Returns a dictionary of the given keys to their items, or to None if an item is missing or
+        deleted. The items that are not cached are read from the core together, with its
+        ``get_many_internal`` method if it has one.
+        """
+        results = {}
+        missing = []
+        for key in keys:
+            hit, value = self._cache_get_item(kind, key)
+            if hit:
+                results[key] = value
+            else:
+                missing.append(key)
+        if missing:
+            results.update(await self._load_many(kind, missing))
+        return results
 
     async def all(self, kind: VersionedDataKind) -> Dict[str, Any]:
         """ """
+        self._start_refresh_all_task()
         hit, value = self._cache_get_all(kind)
         if hit:
             return value
-        encoded_items = await self._core.get_all_internal(kind)
-        return self._cache_put_all(kind, encoded_items)
+        return await self._single_flight(self._all_cache_key(kind), lambda: self._load_all(kind))
 
     async def delete(self, kind: VersionedDataKind, key: str, version: int) -> bool:
         """ """
@@ -104,6 +141,8 @@ class AsyncCachingStoreWrapper(_CachingStoreWrapperBase, DiagnosticDescription,
 
     async def close(self) -> None:
         """Releases the cache and closes the underlying core if it supports it."""
+        if self._refresh_all_task is not None:
+            self._refresh_all_task.cancel()
         self.disable_cache()
         core_close = getattr(self._core, "close", None)
         if callable(core_close):
@@ -116,3 +155,97 @@ class AsyncCachingStoreWrapper(_CachingStoreWrapperBase, DiagnosticDescription,
         if callable(describe):
             return describe(config)
         return "custom"
+
+    async def _load_item(self, kind: VersionedDataKind, key: str) -> Optional[Any]:
+        # Another query may have filled the cache between our miss and the start of this one.
+        hit, value = self._cache_get_item(kind, key, allow_stale=False)
+        if hit:
+            return value
+        encoded_item = await self._core.get_internal(kind, key)
+        item = self._cache_put_item(kind, key, encoded_item)
+        if self._should_load_dependencies():
+            await self._load_dependencies(kind, key, item)
+        return item
+
+    async def _load_many(self, kind: VersionedDataKind, keys: List[str]) -> Dict[str, Any]:
+        if self._has_get_many_method:
+            encoded_items = await self._core.get_many_internal(kind, keys)  # type: ignore
+        else:
+            encoded_items = {key: await self._core.get_internal(kind, key) for key in keys}
+        return {key: self._cache_put_item(kind, key, encoded_items.get(key)) for key in keys}
+
+    async def _load_dependencies(self, kind: VersionedDataKind, key: str, item: Any) -> None:
+        """Loads the prerequisites and segments that an item depends on into the cache; see
+        :func:`ldclient.feature_store_helpers.CachingStoreWrapper._load_dependencies()`.
+        """
+        try:
+            seen = {KindAndKey(kind=kind, key=key)}
+            pending = self._next_dependencies([(kind, item)], seen)
+            while pending:
+                loaded = []  # type: List[Tuple[VersionedDataKind, Any]]
+                for dependency_kind, keys in pending.items():
+                    cached, missing = self._split_cached_dependencies(dependency_kind, keys)
+                    if missing:
+                        cached.extend((await self._load_many(dependency_kind, missing)).values())
+                    loaded.extend((dependency_kind, i) for i in cached)
+                pending = self._next_dependencies(loaded, seen)
+        except Exception as e:
+            # They will be read individually, if they are needed.
+            log.warning("Unable to load dependencies of %s from persistent store: %s", key, e)
+
+    async def _load_all(self, kind: VersionedDataKind) -> Dict[str, Any]:
+        hit, value = self._cache_get_all(kind, allow_stale=False)
+        if hit:
+            return value
+        encoded_items = await self._core.get_all_internal(kind)
+        return self._cache_put_all(kind, encoded_items)
+
+    async def _single_flight(self, flight_key: str, load: Callable[[], Awaitable[Any]]) -> Any:
+        """Awaits load, unless another task is already loading the same cache entry, in which case it
+        awaits that task's result instead.
+
+        The query runs in its own task, and each caller awaits it through a shield, so cancelling one
+        caller does not cancel the query for the others.
+        """
+        return await asyncio.shield(self._start_flight(flight_key, load))
+
+    def _start_flight(self, flight_key: str, load: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        flight = self._flights.get(flight_key)
+        if flight is None:
+            flight = asyncio.ensure_future(load())
+            self._flights[flight_key] = flight
+            flight.add_done_callback(lambda f: self._end_flight(flight_key, f))
+        return flight
+
+    def _end_flight(self, flight_key: str, flight: asyncio.Future):
+        if self._flights.get(flight_key) is flight:
+            del self._flights[flight_key]
+        if not flight.cancelled():
+            flight.exception()  # every caller may have been cancelled; don't report the error as unretrieved
+
+    def _schedule_refresh(self, cache_key, load):
+        if cache_key not in self._flights:
+            self._start_flight(cache_key, load).add_done_callback(self._log_refresh_error)
+
+    def _start_refresh_all_task(self):
+        if self._refresh_all_interval is not None and self._refresh_all_task is None:
+            self._refresh_all_task = asyncio.ensure_future(self._refresh_all_kinds())
+
+    async def _refresh_all_kinds(self):
+        while True:
+            await asyncio.sleep(self._refresh_all_interval)
+            if self._cache is _NOOP_CACHE:
+                continue
+            for kind in list(self._all_kinds.values()):
+                flight = self._start_flight(self._all_cache_key(kind), lambda: self._fetch_all(kind))
+                await asyncio.wait([flight])
+                self._log_refresh_error(flight)
+
+    async def _fetch_all(self, kind: VersionedDataKind) -> Dict[str, Any]:
+        encoded_items = await self._core.get_all_internal(kind)
+        return self._cache_put_all(kind, encoded_items)
+
+    @staticmethod
+    def _log_refresh_error(flight: asyncio.Future):
+        if not flight.cancelled() and flight.exception() is not None:
+            log.warning("Unable to refresh cached data from persistent store: %s", flight.exception())
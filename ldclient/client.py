@@ -4,7 +4,16 @@ This submodule contains the client class that provides most of the SDK functiona
 
 import threading
 import traceback
-from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple
+)
 from uuid import uuid4
 
 from ldclient.config import Config
@@ -27,7 +36,7 @@ from ldclient.impl.datasource.polling import PollingUpdateProcessor
 from ldclient.impl.datasource.streaming import StreamingUpdateProcessor
 from ldclient.impl.datasystem import DataAvailability, DataSystem
 from ldclient.impl.datasystem.fdv2 import FDv2
-from ldclient.impl.evaluator import Evaluator, error_reason
+from ldclient.impl.evaluator import EvaluationScope, Evaluator, error_reason
 from ldclient.impl.events.diagnostics import (
     _DiagnosticAccumulator,
     create_diagnostic_id
@@ -46,6 +55,8 @@ from ldclient.interfaces import (
     DataStoreStatus,
     DataStoreStatusProvider,
     DataStoreUpdateSink,
+    EventProcessor,
+    EventProcessorMetrics,
     FeatureStore,
     FlagTracker
 )
@@ -196,9 +207,12 @@ class LDClient:
         self._config._instance_id = str(uuid4())
         self._config._validate()
 
-        self._event_processor = None
+        self._event_processor: EventProcessor = NullEventProcessor()  # replaced in __start_up
+        self._summarize_evaluation = None
         self._event_factory_default = EventFactory(False)
         self._event_factory_with_reasons = EventFactory(True)
+        # all_flags_state never sends events, so it uses a factory that tells the evaluator not to create them
+        self._event_factory_no_events = EventFactory(False, enabled=False)
 
         self.__start_up(start_wait)
 
@@ -222,6 +236,10 @@ class LDClient:
         that any listener or hook integrations be added postfork unless you are
         certain it can survive the forking process.
 
+        If :attr:`ldclient.config.Config.events_aggregator_socket` is set and the client was started
+        before the fork, the parent process keeps delivering analytics events, and a re-initialized
+        client forwards its events to it.
+
         :param start_wait: the number of seconds to wait for a successful connection to LaunchDarkly
         """
         self.__start_up(start_wait)
@@ -301,13 +319,22 @@ class LDClient:
                 log.error("Error registering plugin %s: %s", plugin.metadata.name, e)
 
     def _set_event_processor(self, config):
+        self._summarize_evaluation = None
         if config.offline or not config.send_events:
             self._event_processor = NullEventProcessor()
+            # Evaluation events would only be discarded, so don't create them.
+            self._event_factory_default = EventFactory(False, enabled=False)
+            self._event_factory_with_reasons = EventFactory(True, enabled=False)
             return None
+        self._event_factory_default = EventFactory(False)
+        self._event_factory_with_reasons = EventFactory(True)
         if not config.event_processor_class:
             diagnostic_id = create_diagnostic_id(config)
             diagnostic_accumulator = None if config.diagnostic_opt_out else _DiagnosticAccumulator(diagnostic_id)
-            self._event_processor = DefaultEventProcessor(config, diagnostic_accumulator=diagnostic_accumulator)
+            event_processor = DefaultEventProcessor(config, diagnostic_accumulator=diagnostic_accumulator)
+            if event_processor.summarizes_evaluations():
+                self._summarize_evaluation = event_processor.summarize_evaluation
+            self._event_processor = event_processor
             return diagnostic_accumulator
         self._event_processor = config.event_processor_class(config)
         return None
@@ -494,6 +521,55 @@ class LDClient:
 
         return self.__evaluate_with_hooks(key=key, context=context, default_value=default, method="variation_detail", block=evaluate).evaluation_detail
 
+    def variations(self, keys: Iterable[str], context: Context, defaults: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+        """Calculates the values of several feature flags for the same context.
+
+        This produces the same values and analytics events as calling :func:`variation()` for each
+        key, and runs any hooks once per flag with a method name of ``"variations"``. However, each
+        flag and segment is read from the data store at most once for the whole batch, and the results
+        of segment matches, prerequisite evaluations and Big Segment queries are reused from one flag
+        to the next.
+
+        :param keys: the unique keys of the feature flags
+        :param context: the evaluation context
+        :param defaults: optional default values, by flag key, to be used for any flag that cannot be
+          evaluated; the default for a flag that is not in this mapping is None
+        :return: a dictionary of flag keys to the variation for the given context, or to the default
+          value for any flag that could not be evaluated
+        """
+        details = self.__evaluate_batch(keys, context, defaults, self._event_factory_default, "variations")
+        return {key: detail.value for key, detail in details.items()}
+
+    def variation_details(self, keys: Iterable[str], context: Context, defaults: Optional[Mapping[str, Any]] = None) -> Dict[str, EvaluationDetail]:
+        """Calculates the values of several feature flags for the same context, and returns objects
+        that describe the way each value was determined.
+
+        This is the batch equivalent of :func:`variation_detail()`, in the same way that
+        :func:`variations()` is the batch equivalent of :func:`variation()`. Hooks are run once per
+        flag with a method name of ``"variation_details"``.
+
+        :param keys: the unique keys of the feature flags
+        :param context: the evaluation context
+        :param defaults: optional default values, by flag key, to be used for any flag that cannot be
+          evaluated; the default for a flag that is not in this mapping is None
+        :return: a dictionary of flag keys to :class:`ldclient.evaluation.EvaluationDetail` objects
+        """
+        return self.__evaluate_batch(keys, context, defaults, self._event_factory_with_reasons, "variation_details")
+
+    def __evaluate_batch(self, keys: Iterable[str], context: Context, defaults: Optional[Mapping[str, Any]], event_factory: EventFactory, method: str) -> Dict[str, EvaluationDetail]:
+        scope = EvaluationScope()
+        hooks = self.__get_hooks()
+        results = {}  # type: Dict[str, EvaluationDetail]
+        for key in keys:
+            default = None if defaults is None else defaults.get(key)
+
+            def evaluate():
+                detail, _ = self._evaluate_internal(key, context, default, event_factory, scope)
+                return _EvaluationWithHookResult(evaluation_detail=detail)
+
+            results[key] = self.__evaluate_with_hooks(key=key, context=context, default_value=default, method=method, block=evaluate, hooks=hooks).evaluation_detail
+        return results
+
     def migration_variation(self, key: str, context: Context, default_stage: Stage) -> Tuple[Stage, OpTracker]:
         """
         This method returns the migration stage of the migration feature flag
@@ -524,7 +600,7 @@ class LDClient:
         hook_result = self.__evaluate_with_hooks(key=key, context=context, default_value=default_stage.value, method="migration_variation", block=evaluate)
         return hook_result.results['default_stage'], hook_result.results['tracker']
 
-    def _evaluate_internal(self, key: str, context: Context, default: Any, event_factory) -> Tuple[EvaluationDetail, Optional[FeatureFlag]]:
+    def _evaluate_internal(self, key: str, context: Context, default: Any, event_factory, scope: Optional[EvaluationScope] = None) -> Tuple[EvaluationDetail, Optional[FeatureFlag]]:
         default = self._config.get_default(key, default)
 
         if self._config.offline:
@@ -536,7 +612,8 @@ class LDClient:
             else:
                 log.warning("Feature Flag evaluation attempted before client has initialized! Feature store unavailable - returning default: " + str(default) + " for feature key: " + key)
                 reason = error_reason('CLIENT_NOT_READY')
-                self._send_event(event_factory.new_unknown_flag_event(key, context, default, reason))
+                if event_factory.enabled:
+                    self._send_event(event_factory.new_unknown_flag_event(key, context, default, reason))
                 return EvaluationDetail(default, None, reason), None
 
         if not context.valid:
@@ -544,32 +621,41 @@ class LDClient:
             return EvaluationDetail(default, None, error_reason('USER_NOT_SPECIFIED')), None
 
         try:
-            flag = _get_store_item(self._data_system.store, FEATURES, key)
+            if scope is not None and key in scope.flags:
+                flag = scope.flags[key]
+            else:
+                flag = _get_store_item(self._data_system.store, FEATURES, key)
+                if scope is not None:
+                    scope.flags[key] = flag
         except Exception as e:
             log.error("Unexpected error while retrieving feature flag \"%s\": %s" % (key, repr(e)))
             log.debug(traceback.format_exc())
             reason = error_reason('EXCEPTION')
-            self._send_event(event_factory.new_unknown_flag_event(key, context, default, reason))
+            if event_factory.enabled:
+                self._send_event(event_factory.new_unknown_flag_event(key, context, default, reason))
             return EvaluationDetail(default, None, reason), None
         if not flag:
             reason = error_reason('FLAG_NOT_FOUND')
-            self._send_event(event_factory.new_unknown_flag_event(key, context, default, reason))
+            if event_factory.enabled:
+                self._send_event(event_factory.new_unknown_flag_event(key, context, default, reason))
             return EvaluationDetail(default, None, reason), None
         else:
             try:
-                result = self._evaluator.evaluate(flag, context, event_factory)
+                result = self._evaluator.evaluate(flag, context, event_factory, scope)
                 for event in result.events or []:
                     self._send_event(event)
                 detail = result.detail
                 if detail.is_default_value():
                     detail = EvaluationDetail(default, None, detail.reason)
-                self._send_event(event_factory.new_eval_event(flag, context, detail, default))
+                if event_factory.enabled and (self._summarize_evaluation is None or not self._summarize_evaluation(flag, context, detail, default)):
+                    self._send_event(event_factory.new_eval_event(flag, context, detail, default))
                 return detail, flag
             except Exception as e:
                 log.error("Unexpected error while evaluating feature flag \"%s\": %s" % (key, repr(e)))
                 log.debug(traceback.format_exc())
                 reason = error_reason('EXCEPTION')
-                self._send_event(event_factory.new_default_event(flag, context, default, reason))
+                if event_factory.enabled:
+                    self._send_event(event_factory.new_default_event(flag, context, default, reason))
                 return EvaluationDetail(default, None, reason), flag
 
     def all_flags_state(self, context: Context, **kwargs) -> FeatureFlagsState:
@@ -624,11 +710,18 @@ class LDClient:
             log.error("Unable to read flags for all_flag_state: %s" % repr(e))
             return FeatureFlagsState(False)
 
+        # Segment matches and prerequisite results are the same for every flag that uses them, so
+        # they are shared across this call; the flags we just read also serve prerequisite lookups.
+        scope = EvaluationScope()
+        for key, flag in flags_map.items():
+            if isinstance(flag, FeatureFlag):
+                scope.flags[key] = flag
+
         for key, flag in flags_map.items():
             if client_only and not flag.get('clientSide', False):
                 continue
             try:
-                result = self._evaluator.evaluate(flag, context, self._event_factory_default)
+                result = self._evaluator.evaluate(flag, context, self._event_factory_no_events, scope)
                 detail = result.detail
                 prerequisites = result.prerequisites
             except Exception as e:
@@ -681,7 +774,15 @@ class LDClient:
         with self.__hooks_lock.write():
             self.__hooks.append(hook)
 
-    def __evaluate_with_hooks(self, key: str, context: Context, default_value: Any, method: str, block: Callable[[], _EvaluationWithHookResult]) -> _EvaluationWithHookResult:
+    def __get_hooks(self) -> List[Hook]:
+        with self.__hooks_lock.read():
+            if len(self.__hooks) == 0:
+                return []
+            return self.__hooks.copy()
+
+    def __evaluate_with_hooks(
+        self, key: str, context: Context, default_value: Any, method: str, block: Callable[[], _EvaluationWithHookResult], hooks: Optional[List[Hook]] = None
+    ) -> _EvaluationWithHookResult:
         """
         # evaluate_with_hook will run the provided block, wrapping it with evaluation hook support.
         #
@@ -690,14 +791,13 @@ class LDClient:
         # :param default:
         # :param method:
         # :param block:
+        # :param hooks: a snapshot of the hooks to run, if the caller already took one
         # :return:
         """
-        hooks = []  # type: List[Hook]
-        with self.__hooks_lock.read():
-            if len(self.__hooks) == 0:
-                return block()
-
-            hooks = self.__hooks.copy()
+        if hooks is None:
+            hooks = self.__get_hooks()
+        if len(hooks) == 0:
+            return block()
 
         series_context = EvaluationSeriesContext(key=key, context=context, default_value=default_value, method=method, environment_id=self._data_system.environment_id)
         hook_data = self.__execute_before_evaluation(hooks, series_context)
@@ -722,6 +822,17 @@ class LDClient:
             log.error(f"An error occurred in {method} of the hook {hook_name}: #{e}")
             return {}
 
+    def get_event_metrics(self) -> Optional[EventProcessorMetrics]:
+        """
+        Returns a snapshot of the analytics event processor's internal metrics, such as how many
+        events were dropped and how long it took to deliver them, or None if events are disabled or
+        a custom event processor does not provide metrics.
+
+        Most values in :class:`ldclient.interfaces.EventProcessorMetrics` are totals since the client
+        started, so an application can poll this method and report them to its own metrics system.
+        """
+        return self._event_processor.get_metrics()
+
     @property
     def big_segment_store_status_provider(self) -> BigSegmentStoreStatusProvider:
         """
@@ -322,6 +322,13 @@ class Config(DataSourceBuilderConfig, PrivateAttributesConfig):
         omit_anonymous_contexts: bool = False,
         payload_filter_key: Optional[str] = None,
         datasystem_config: Optional[DataSystemConfig] = None,
+        events_summary_shards: int = 0,
+        events_max_payload_size: Optional[int] = None,
+        events_flush_high_water_ratio: Optional[float] = 0.5,
+        events_spool_dir: Optional[str] = None,
+        events_spool_max_size: int = 64 * 1024 * 1024,
+        context_keys_false_positive_rate: Optional[float] = None,
+        events_aggregator_socket: Optional[str] = None,
     ):
         """
         :param sdk_key: The SDK key for your LaunchDarkly account. This is always required.
@@ -393,6 +400,40 @@ class Config(DataSourceBuilderConfig, PrivateAttributesConfig):
         :param omit_anonymous_contexts: Sets whether anonymous contexts should be omitted from index and identify events.
         :param payload_filter_key: The payload filter is used to selectively limited the flags and segments delivered in the data source payload.
         :param datasystem_config: Configuration for the upcoming enhanced data system design. This is experimental and should not be set without direction from LaunchDarkly support.
+        :param events_summary_shards: If greater than zero, evaluations that only need to be counted in the
+          summary of flag evaluations are counted on the application thread that produced them, in this many
+          independently locked shards that are merged when events are flushed, instead of being queued for the
+          event processor thread. This reduces the per-evaluation cost and keeps such evaluations from filling
+          the event queue in applications that evaluate flags at a very high rate. By default, this is zero.
+        :param events_max_payload_size: The maximum size, in bytes of uncompressed JSON, of a single analytics
+          events request. When a flush produces more than this, the events are split across several requests,
+          which are sent concurrently where possible. An event that is larger than this by itself is still sent,
+          in a request of its own. By default, there is no limit.
+        :param events_flush_high_water_ratio: When the events buffer is at least this full, as a fraction of
+          ``events_max_pending``, or holds about ``events_max_payload_size`` bytes of events, it is flushed without
+          waiting for ``flush_interval``. If every flush worker is busy, the buffer is instead kept until one is
+          free, and may grow to twice ``events_max_pending`` before events are dropped. Set this to None to flush
+          only at ``flush_interval`` or when ``flush()`` is called. By default, this is 0.5.
+        :param events_spool_dir: If set, analytics events that cannot be delivered because LaunchDarkly is
+          unreachable are written to files in this directory instead of being discarded, and are sent when
+          delivery succeeds again, including by a later process that uses the same directory. The directory
+          should not be shared by two SDK instances at the same time. By default, undeliverable events are
+          discarded.
+        :param events_spool_max_size: The maximum total size, in bytes, of the files in ``events_spool_dir``.
+          When it is reached, the oldest undelivered events are discarded. The default is 64 MiB.
+        :param context_keys_false_positive_rate: If set, the event processor remembers context keys in a
+          fixed-size probabilistic filter instead of an exact cache, so that ``context_keys_capacity`` can be
+          very large without using much memory; about 1.2 MB per million keys at a rate of 0.01. A context that
+          was not seen before is mistaken for one that was with about this probability, in which case no index
+          event is sent for it. It must be between 0 and 1. By default, an exact cache is used.
+        :param events_aggregator_socket: The path of a Unix domain socket through which the processes of a
+          prefork server, such as gunicorn or uWSGI workers, can share the delivery of analytics events. The
+          first process to start its client with this option becomes the aggregator: the others forward their
+          events to it at each flush, and it merges their flag evaluation summaries, sends the details of each
+          context only once, and delivers all of the events and diagnostics. If the aggregator cannot be
+          reached, a process delivers its own events. The path must be in a writable directory and short
+          enough for a socket address. This is not supported on Windows. By default, each process delivers its
+          own events.
         """
         self.__sdk_key = validate_sdk_key_format(sdk_key, log)
 
@@ -418,6 +459,7 @@ class Config(DataSourceBuilderConfig, PrivateAttributesConfig):
         self.__offline = offline
         self.__context_keys_capacity = context_keys_capacity
         self.__context_keys_flush_interval = context_keys_flush_interval
+        self.__context_keys_false_positive_rate = context_keys_false_positive_rate if context_keys_false_positive_rate is not None and 0 < context_keys_false_positive_rate < 1 else None
         self.__diagnostic_opt_out = diagnostic_opt_out
         self.__diagnostic_recording_interval = max(diagnostic_recording_interval, 60)
         self.__wrapper_name = wrapper_name
@@ -433,6 +475,12 @@ class Config(DataSourceBuilderConfig, PrivateAttributesConfig):
         self._data_source_update_sink: Optional[DataSourceUpdateSink] = None
         self._instance_id: Optional[str] = None
         self._datasystem_config = datasystem_config
+        self.__events_summary_shards = max(events_summary_shards, 0)
+        self.__events_max_payload_size = events_max_payload_size if events_max_payload_size is not None and events_max_payload_size > 0 else None
+        self.__events_flush_high_water_ratio = events_flush_high_water_ratio if events_flush_high_water_ratio is not None and 0 < events_flush_high_water_ratio <= 1 else None
+        self.__events_spool_dir = events_spool_dir
+        self.__events_spool_max_size = events_spool_max_size
+        self.__events_aggregator_socket = events_aggregator_socket
 
     def copy_with_new_sdk_key(self, new_sdk_key: str) -> 'Config':
         """Returns a new ``Config`` instance that is the same as this one, except for having a different SDK key.
@@ -573,6 +621,53 @@ class Config(DataSourceBuilderConfig, PrivateAttributesConfig):
     def flush_interval(self) -> float:
         return self.__flush_interval
 
+    @property
+    def events_summary_shards(self) -> int:
+        """
+        The number of shards used to count summary-only evaluations on application threads, or zero if
+        they are queued for the event processor thread like other events.
+        """
+        return self.__events_summary_shards
+
+    @property
+    def events_max_payload_size(self) -> Optional[int]:
+        """
+        The maximum size, in bytes of uncompressed JSON, of a single analytics events request, or None if
+        there is no limit.
+        """
+        return self.__events_max_payload_size
+
+    @property
+    def events_flush_high_water_ratio(self) -> Optional[float]:
+        """
+        The fraction of ``events_max_pending`` at which the events buffer is flushed early, or None if it is
+        only flushed at ``flush_interval``.
+        """
+        return self.__events_flush_high_water_ratio
+
+    @property
+    def events_spool_dir(self) -> Optional[str]:
+        """
+        The directory in which undeliverable analytics events are kept until they can be sent, or None if
+        they are discarded.
+        """
+        return self.__events_spool_dir
+
+    @property
+    def events_spool_max_size(self) -> int:
+        """
+        The maximum total size, in bytes, of the undeliverable analytics events kept in ``events_spool_dir``.
+        """
+        return self.__events_spool_max_size
+
+    @property
+    def events_aggregator_socket(self) -> Optional[str]:
+        """
+        The path of the socket through which processes share the delivery of analytics events, or None if
+        each process delivers its own.
+        """
+        return self.__events_aggregator_socket
+
     @property
     def private_attributes(self) -> List[str]:
         return list(self.__private_attributes)
@@ -593,6 +688,14 @@ class Config(DataSourceBuilderConfig, PrivateAttributesConfig):
     def context_keys_flush_interval(self) -> float:
         return self.__context_keys_flush_interval
 
+    @property
+    def context_keys_false_positive_rate(self) -> Optional[float]:
+        """
+        The false positive rate of the probabilistic filter used to remember context keys, or None if an
+        exact cache is used.
+        """
+        return self.__context_keys_false_positive_rate
+
     @property
     def diagnostic_opt_out(self) -> bool:
         return self.__diagnostic_opt_out
@@ -6,10 +6,11 @@ received from LaunchDarkly. This submodule does not include specific integration
 storage systems; those are in :class:`ldclient.integrations`.
 """
 
-from collections import OrderedDict, defaultdict
-from typing import Any, Callable
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
 
-from ldclient.impl.rwlock import ReadWriteLock
+from ldclient.impl.in_memory_snapshot import EMPTY_SNAPSHOT, InMemorySnapshot
 from ldclient.impl.util import log
 from ldclient.interfaces import DiagnosticDescription, FeatureStore
 from ldclient.versioned_data_kind import VersionedDataKind
@@ -30,16 +31,26 @@ class CacheConfig:
     DEFAULT_EXPIRATION = 15.0
     DEFAULT_CAPACITY = 1000
 
-    def __init__(self, expiration: float = DEFAULT_EXPIRATION, capacity: int = DEFAULT_CAPACITY):
+    def __init__(self, expiration: float = DEFAULT_EXPIRATION, capacity: int = DEFAULT_CAPACITY, max_staleness: Optional[float] = None, refresh_all_proactively: bool = False):
         """Constructs an instance of CacheConfig.
 
         :param expiration: the cache TTL, in seconds. Items will be evicted from the cache after
           this amount of time from the time when they were originally cached. If the time is less than or
           equal to zero, caching is disabled.
         :param capacity: the maximum number of items that can be in the cache at a time
+        :param max_staleness: if set to a time in seconds that is greater than ``expiration``, a cached
+          item that is older than ``expiration`` is still returned, and is refreshed from the store in
+          the background, instead of making the caller wait for the store. Items are only evicted once
+          they are older than this. If not set, expired items are evicted and must be read from the
+          store before they are returned.
+        :param refresh_all_proactively: if True, the cached set of all flags (and of all segments) is
+          refreshed from the store in the background before it expires, so that operations such as
+          :func:`ldclient.client.LDClient.all_flags_state()` do not wait for the store.
         """
         self._expiration = expiration
         self._capacity = capacity
+        self._max_staleness = max_staleness if max_staleness is not None and max_staleness > expiration else None
+        self._refresh_all_proactively = refresh_all_proactively
 
     @staticmethod
     def default() -> 'CacheConfig':
@@ -68,15 +79,32 @@ class CacheConfig:
         """Returns the configured maximum number of cacheable items."""
         return self._capacity
 
+    @property
+    def max_staleness(self) -> Optional[float]:
+        """Returns how long, in seconds, an expired item can still be returned while it is refreshed in
+        the background, or None if expired items are not returned.
+        """
+        return self._max_staleness if self.enabled else None
+
+    @property
+    def refresh_all_proactively(self) -> bool:
+        """Returns True if the cached sets of all items are refreshed in the background before they expire."""
+        return self._refresh_all_proactively and self.enabled
+
 
 class InMemoryFeatureStore(FeatureStore, DiagnosticDescription):
-    """The default feature store implementation, which holds all data in a thread-safe data structure in memory."""
+    """The default feature store implementation, which holds all data in a thread-safe data structure in memory.
+
+    Reads never take a lock: every update builds a new immutable snapshot of the data and then
+    replaces the reference to the current one, so a reader always sees a complete, consistent
+    snapshot. The mapping passed to the callback of :func:`all()` is a read-only view.
+    """
 
     def __init__(self):
         """Constructs an instance of InMemoryFeatureStore."""
-        self._lock = ReadWriteLock()
+        self._write_lock = threading.Lock()
         self._initialized = False
-        self._items = defaultdict(dict)
+        self._snapshot = EMPTY_SNAPSHOT
 
     def is_monitoring_enabled(self) -> bool:
         return False
@@ -86,22 +114,11 @@ class InMemoryFeatureStore(FeatureStore, DiagnosticDescription):
 
     def get(self, kind: VersionedDataKind, key: str, callback: Callable[[Any], Any] = lambda x: x) -> Any:
         """ """
-        with self._lock.read():
-            itemsOfKind = self._items[kind]
-            item = itemsOfKind.get(key)
-            if item is None:
-                log.debug("Attempted to get missing key %s in '%s', returning None", key, kind.namespace)
-                return callback(None)
-            if 'deleted' in item and item['deleted']:
-                log.debug("Attempted to get deleted key %s in '%s', returning None", key, kind.namespace)
-                return callback(None)
-            return callback(item)
+        return callback(self._snapshot.get(kind, key))
 
     def all(self, kind, callback):
         """ """
-        with self._lock.read():
-            itemsOfKind = self._items[kind]
-            return callback(dict((k, i) for k, i in itemsOfKind.items() if ('deleted' not in i) or not i['deleted']))
+        return callback(self._snapshot.all(kind))
 
     def init(self, all_data):
         """ """
@@ -111,9 +128,9 @@ class InMemoryFeatureStore(FeatureStore, DiagnosticDescription):
             for key, item in items.items():
                 items_decoded[key] = kind.decode(item)
             all_decoded[kind] = items_decoded
-        with self._lock.write():
-            self._items.clear()
-            self._items.update(all_decoded)
+        snapshot = InMemorySnapshot.from_items(all_decoded)
+        with self._write_lock:
+            self._snapshot = snapshot
             self._initialized = True
             for k in all_data:
                 log.debug("Initialized '%s' store with %d items", k.namespace, len(all_data[k]))
@@ -121,29 +138,25 @@ class InMemoryFeatureStore(FeatureStore, DiagnosticDescription):
     # noinspection PyShadowingNames
     def delete(self, kind, key: str, version: int):
         """ """
-        with self._lock.write():
-            itemsOfKind = self._items[kind]
-            i = itemsOfKind.get(key)
+        with self._write_lock:
+            i = self._snapshot.get_including_deleted(kind, key)
             if i is None or i['version'] < version:
-                i = {'deleted': True, 'version': version}
-                itemsOfKind[key] = i
+                self._snapshot = self._snapshot.with_items({kind: {key: {'deleted': True, 'version': version}}})
 
     def upsert(self, kind, item):
         """ """
         decoded_item = kind.decode(item)
         key = item['key']
-        with self._lock.write():
-            itemsOfKind = self._items[kind]
-            i = itemsOfKind.get(key)
+        with self._write_lock:
+            i = self._snapshot.get_including_deleted(kind, key)
             if i is None or i['version'] < item['version']:
-                itemsOfKind[key] = decoded_item
+                self._snapshot = self._snapshot.with_items({kind: {key: decoded_item}})
                 log.debug("Updated %s in '%s' to version %d", key, kind.namespace, item['version'])
 
     @property
     def initialized(self) -> bool:
         """ """
-        with self._lock.read():
-            return self._initialized
+        return self._initialized
 
     def describe_configuration(self, config):
         return 'memory'
@@ -2,11 +2,25 @@
 This submodule contains support code for writing feature store implementations.
 """
 
-from typing import Any, Dict, Mapping
+from threading import Event, Lock
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple
+)
 
 from expiringdict import ExpiringDict
 
 from ldclient.feature_store import CacheConfig
+from ldclient.impl.dependency_tracker import DependencyTracker, KindAndKey
+from ldclient.impl.fixed_thread_pool import FixedThreadPool
+from ldclient.impl.repeating_task import RepeatingTask
 from ldclient.impl.util import log
 from ldclient.interfaces import (
     DiagnosticDescription,
@@ -35,8 +49,8 @@ class _NoopCache:
 
     __slots__ = ()
 
-    def get(self, key, default=None):
-        return default
+    def get(self, key, default=None, with_age=False):
+        return (default, None) if with_age else default
 
     def __setitem__(self, key, value):
         pass
@@ -50,6 +64,20 @@ class _NoopCache:
 
 _NOOP_CACHE = _NoopCache()
 
+# The number of threads that refresh stale cache entries in the background
+_REFRESH_THREADS = 2
+
+
+class _Flight:
+    """A core query that one thread is making on behalf of every thread that missed the same cache entry."""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self) -> None:
+        self.done: Event = Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
 
 class _CachingStoreWrapperBase:
     """Provides common cache methods for a feature store wrapper. Subclass it to reuse the cache
@@ -59,6 +87,10 @@ class _CachingStoreWrapperBase:
     _cache: Any
     _inited: bool
     _has_available_method: bool
+    _has_get_many_method: bool
+    _flights: Dict[str, Any]
+    _stale_after: Optional[float]
+    _all_kinds: Dict[str, VersionedDataKind]
 
     def __init__(self, cache_config: CacheConfig):
         """Sets up the cache from the caching parameters.
@@ -66,10 +98,21 @@ class _CachingStoreWrapperBase:
         :param cache_config: the caching parameters
         """
         if cache_config.enabled:
-            self._cache = ExpiringDict(max_len=cache_config.capacity, max_age_seconds=cache_config.expiration)
+            # Entries are kept until they are too stale to return at all; _cache_lookup tells
+            # whether one that is still kept has expired and should be refreshed.
+            max_age = cache_config.max_staleness or cache_config.expiration
+            self._cache = ExpiringDict(max_len=cache_config.capacity, max_age_seconds=max_age)
         else:
             self._cache = _NOOP_CACHE
+        self._stale_after = cache_config.expiration if cache_config.max_staleness is not None else None
         self._inited = False
+        # Core queries in progress, by cache key, so that concurrent cache misses for the same entry
+        # share one query instead of each making their own.
+        self._flights = {}
+        # Serializes the copy-on-write updates of the cached sets of all items
+        self._all_items_lock = Lock()
+        # The kinds whose set of all items has been cached, by namespace, for refresh_all_proactively
+        self._all_kinds = {}
 
     def is_monitoring_enabled(self) -> bool:
         return self._has_available_method
@@ -94,16 +137,32 @@ class _CachingStoreWrapperBase:
     # The methods below hold the cache logic that both wrappers share. They do no I/O; each one is
     # the pre-work or post-work that surrounds a single core call in a wrapper method.
 
-    def _cache_get_item(self, kind, key):
+    def _cache_lookup(self, cache_key):
+        """Looks up a cache entry. Returns an ``(entry, stale)`` pair, where ``entry`` is None if there is
+        no entry, and ``stale`` is True if the entry has expired but can still be returned while it is
+        refreshed.
+        """
+        if self._stale_after is None:
+            return (self._cache.get(cache_key), False)
+        entry, age = self._cache.get(cache_key, with_age=True)
+        return (entry, entry is not None and age >= self._stale_after)
+
+    def _cache_get_item(self, kind, key, allow_stale=True):
         """Looks up a single item in the cache.
 
         Returns a ``(hit, value)`` pair. ``hit`` is True if the item was in the cache. ``value`` is
-        the item to return, which is None if the cached entry is missing or deleted.
+        the item to return, which is None if the cached entry is missing or deleted. A stale entry is
+        a hit, and is scheduled for refresh, unless ``allow_stale`` is False.
         """
-        cached_item = self._cache.get(self._item_cache_key(kind, key))
+        cache_key = self._item_cache_key(kind, key)
+        cached_item, stale = self._cache_lookup(cache_key)
         # note, cached items are wrapped in an array so we can cache None values
         if cached_item is None:
             return (False, None)
+        if stale:
+            if not allow_stale:
+                return (False, None)
+            self._schedule_refresh(cache_key, lambda: self._load_item(kind, key))
         item = cached_item[0]
         return (True, None if _is_deleted(item) else item)
 
@@ -116,16 +175,23 @@ class _CachingStoreWrapperBase:
         self._cache[self._item_cache_key(kind, key)] = [item]
         return None if _is_deleted(item) else item
 
-    def _cache_get_all(self, kind):
+    def _cache_get_all(self, kind, allow_stale=True):
         """Looks up the full set of items of a kind in the cache.
 
         Returns a ``(hit, value)`` pair. ``hit`` is True if the set was in the cache, in which case
-        ``value`` is the cached dict of items.
+        ``value`` is the cached dict of items. A stale set is a hit, and is scheduled for refresh,
+        unless ``allow_stale`` is False.
         """
-        cached_items = self._cache.get(self._all_cache_key(kind))
+        cache_key = self._all_cache_key(kind)
+        cached_items, stale = self._cache_lookup(cache_key)
+        # note, the set is wrapped in an array so that upserts can replace it without resetting its age
         if cached_items is None:
             return (False, None)
-        return (True, cached_items)
+        if stale:
+            if not allow_stale:
+                return (False, None)
+            self._schedule_refresh(cache_key, lambda: self._load_all(kind))
+        return (True, cached_items[0])
 
     def _cache_put_all(self, kind, encoded_items):
         """Decodes all items fetched from the core, drops deleted ones, caches the result, and returns it."""
@@ -134,7 +200,8 @@ class _CachingStoreWrapperBase:
             for key, item in encoded_items.items():
                 all_items[key] = kind.decode(item)
         items = self._items_if_not_deleted(all_items)
-        self._cache[self._all_cache_key(kind)] = items
+        self._cache[self._all_cache_key(kind)] = [items]
+        self._all_kinds[kind.namespace] = kind
         return items
 
     def _cache_init(self, all_encoded_data):
@@ -150,19 +217,69 @@ class _CachingStoreWrapperBase:
                 cache[self._item_cache_key(kind, key)] = [decoded_item]  # note array wrapper
                 if not _is_deleted(decoded_item):
                     decoded_items[key] = decoded_item
-            cache[self._all_cache_key(kind)] = decoded_items
+            cache[self._all_cache_key(kind)] = [decoded_items]  # note array wrapper
+            self._all_kinds[kind.namespace] = kind
 
     def _cache_put_upsert(self, kind, new_state):
         """Updates the cache after an upsert.
 
-        Caches the item the core returned and drops the now-stale all-items entry. Returns the
-        decoded item.
+        Caches the item the core returned, and puts it in a copy of the cached set of all items if
+        there is one (or removes it from the copy if it is deleted). The set keeps its age, so it is
+        still reloaded from the core when it expires. Returns the decoded item.
         """
         new_decoded_item = kind.decode(new_state)
-        self._cache[self._item_cache_key(kind, new_decoded_item.get('key'))] = [new_decoded_item]
-        self._cache.pop(self._all_cache_key(kind), None)
+        key = new_decoded_item.get('key')
+        self._cache[self._item_cache_key(kind, key)] = [new_decoded_item]
+        with self._all_items_lock:
+            cached_items, _ = self._cache_lookup(self._all_cache_key(kind))
+            if cached_items is not None:
+                # The dict is replaced rather than modified, since callers may still be using the old one.
+                items = dict(cached_items[0])
+                if _is_deleted(new_decoded_item):
+                    items.pop(key, None)
+                else:
+                    items[key] = new_decoded_item
+                cached_items[0] = items
         return new_decoded_item
 
+    def _should_load_dependencies(self) -> bool:
+        # Without a cache, the dependencies would be read again when they are evaluated; and without
+        # get_many_internal, reading them ahead of time would take as many queries as reading them then.
+        return self._has_get_many_method and self._cache is not _NOOP_CACHE
+
+    def _split_cached_dependencies(self, kind: VersionedDataKind, keys: List[str]) -> Tuple[List[Any], List[str]]:
+        """Returns the items of the given keys that are cached and not stale, and the keys of the others,
+        which are the ones that need to be read from the core.
+        """
+        cached = []
+        missing = []
+        for key in keys:
+            hit, value = self._cache_get_item(kind, key, allow_stale=False)
+            if hit:
+                cached.append(value)
+            else:
+                missing.append(key)
+        return cached, missing
+
+    @staticmethod
+    def _next_dependencies(loaded: Iterable[Tuple[VersionedDataKind, Any]], seen: Set[KindAndKey]) -> Dict[VersionedDataKind, List[str]]:
+        """Returns the keys of the prerequisites and segments that the loaded items depend on, grouped
+        by kind, leaving out the ones that are in ``seen``, and adds them to ``seen``.
+        """
+        pending = {}  # type: Dict[VersionedDataKind, List[str]]
+        for kind, item in loaded:
+            for dependency in DependencyTracker.compute_dependencies_from(kind, item):
+                if dependency not in seen:
+                    seen.add(dependency)
+                    pending.setdefault(dependency.kind, []).append(dependency.key)
+        return pending
+
+    def _schedule_refresh(self, cache_key, load):
+        """Starts refreshing a stale cache entry in the background by calling load, unless a query for
+        the entry is already in progress. Implemented by each wrapper.
+        """
+        pass
+
     @staticmethod
     def _item_cache_key(kind, key):
         return "{0}:{1}".format(kind.namespace, key)
@@ -202,7 +319,18 @@ class CachingStoreWrapper(_CachingStoreWrapperBase, DiagnosticDescription, Featu
         """
         self._core = core
         self._has_available_method = callable(getattr(core, 'is_available', None))
+        self._has_get_many_method = callable(getattr(core, 'get_many_internal', None))
+        self._flights_lock = Lock()
         super().__init__(cache_config)
+        self._refresh_pool = None  # type: Optional[FixedThreadPool]
+        if self._stale_after is not None:
+            self._refresh_pool = FixedThreadPool(_REFRESH_THREADS, "ldclient.store.refresh")
+        self._refresh_all_task = None  # type: Optional[RepeatingTask]
+        if cache_config.refresh_all_proactively:
+            # Refreshing at half the TTL means the sets are refreshed before they expire.
+            interval = cache_config.expiration / 2
+            self._refresh_all_task = RepeatingTask("ldclient.store.refresh-all", interval, interval, self._refresh_all_kinds)
+            self._refresh_all_task.start()
 
     def is_available(self) -> bool:
         # We know is_available exists since we are checking _has_available_method
@@ -219,16 +347,31 @@ class CachingStoreWrapper(_CachingStoreWrapperBase, DiagnosticDescription, Featu
         hit, value = self._cache_get_item(kind, key)
         if hit:
             return callback(value)
-        encoded_item = self._core.get_internal(kind, key)  # currently FeatureStoreCore returns dicts
-        return callback(self._cache_put_item(kind, key, encoded_item))
+        return callback(self._single_flight(self._item_cache_key(kind, key), lambda: self._load_item(kind, key)))
+
+    def get_many(self, kind, keys, callback=lambda x: x):
+        """Returns a dictionary of the given keys to their items, or to None if an item is missing or
+        deleted. The items that are not cached are read from the core together, with its
+        ``get_many_internal`` method if it has one.
+        """
+        results = {}
+        missing = []
+        for key in keys:
+            hit, value = self._cache_get_item(kind, key)
+            if hit:
+                results[key] = value
+            else:
+                missing.append(key)
+        if missing:
+            results.update(self._load_many(kind, missing))
+        return callback(results)
 
     def all(self, kind, callback=lambda x: x):
         """ """
         hit, value = self._cache_get_all(kind)
         if hit:
             return callback(value)
-        encoded_items = self._core.get_all_internal(kind)
-        return callback(self._cache_put_all(kind, encoded_items))
+        return callback(self._single_flight(self._all_cache_key(kind), lambda: self._load_all(kind)))
 
     def delete(self, kind, key, version):
         """ """
@@ -246,8 +389,8 @@ class CachingStoreWrapper(_CachingStoreWrapperBase, DiagnosticDescription, Featu
         """ """
         if self._inited:
             return True
-        result = self._cache.get(CachingStoreWrapper.__INITED_CACHE_KEY__)
-        if result is None:
+        result, stale = self._cache_lookup(CachingStoreWrapper.__INITED_CACHE_KEY__)
+        if result is None or stale:
             result = bool(self._core.initialized_internal())
             self._cache[CachingStoreWrapper.__INITED_CACHE_KEY__] = result
         if result:
@@ -256,6 +399,10 @@ class CachingStoreWrapper(_CachingStoreWrapperBase, DiagnosticDescription, Featu
 
     def close(self) -> None:
         """Release the cache and close the underlying core if it supports it."""
+        if self._refresh_all_task is not None:
+            self._refresh_all_task.stop()
+        if self._refresh_pool is not None:
+            self._refresh_pool.stop()
         self.disable_cache()
         if hasattr(self._core, "close"):
             self._core.close()  # type: ignore
@@ -265,3 +412,96 @@ class CachingStoreWrapper(_CachingStoreWrapperBase, DiagnosticDescription, Featu
         if callable(describe):
             return describe(config)
         return "custom"
+
+    def _load_item(self, kind, key):
+        # Another query may have filled the cache between our miss and the start of this one.
+        hit, value = self._cache_get_item(kind, key, allow_stale=False)
+        if hit:
+            return value
+        encoded_item = self._core.get_internal(kind, key)  # currently FeatureStoreCore returns dicts
+        item = self._cache_put_item(kind, key, encoded_item)
+        if self._should_load_dependencies():
+            self._load_dependencies(kind, key, item)
+        return item
+
+    def _load_many(self, kind, keys):
+        if self._has_get_many_method:
+            encoded_items = self._core.get_many_internal(kind, keys)  # type: ignore
+        else:
+            encoded_items = {key: self._core.get_internal(kind, key) for key in keys}
+        return {key: self._cache_put_item(kind, key, encoded_items.get(key)) for key in keys}
+
+    def _load_dependencies(self, kind, key, item):
+        """Loads the prerequisites and segments that an item depends on, directly or indirectly, into
+        the cache, so that evaluating it does not read them from the core one at a time. Each level of
+        the dependency graph takes one read per kind, for the dependencies that are not already cached
+        and fresh; the cached ones are still followed to find the next level.
+        """
+        try:
+            seen = {KindAndKey(kind=kind, key=key)}
+            pending = self._next_dependencies([(kind, item)], seen)
+            while pending:
+                loaded = []  # type: List[Tuple[VersionedDataKind, Any]]
+                for dependency_kind, keys in pending.items():
+                    cached, missing = self._split_cached_dependencies(dependency_kind, keys)
+                    if missing:
+                        cached.extend(self._load_many(dependency_kind, missing).values())
+                    loaded.extend((dependency_kind, i) for i in cached)
+                pending = self._next_dependencies(loaded, seen)
+        except Exception as e:
+            # They will be read individually, if they are needed.
+            log.warning("Unable to load dependencies of %s from persistent store: %s", key, e)
+
+    def _load_all(self, kind):
+        hit, value = self._cache_get_all(kind, allow_stale=False)
+        if hit:
+            return value
+        encoded_items = self._core.get_all_internal(kind)
+        return self._cache_put_all(kind, encoded_items)
+
+    def _single_flight(self, flight_key: str, load: Callable[[], Any]) -> Any:
+        """Calls load, unless another thread is already loading the same cache entry, in which case it
+        waits for and returns that thread's result (or raises its error) instead.
+        """
+        flight: _Flight
+        with self._flights_lock:
+            existing = self._flights.get(flight_key)
+            leader = existing is None
+            if existing is None:
+                flight = _Flight()
+                self._flights[flight_key] = flight
+            else:
+                flight = existing
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = load()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[flight_key]
+            flight.done.set()
+        return flight.result
+
+    def _schedule_refresh(self, cache_key, load):
+        pool = self._refresh_pool
+        if pool is not None and cache_key not in self._flights:
+            # If all the refresh threads are busy, a later read of the stale entry will try again.
+            pool.execute(lambda: self._refresh(cache_key, load))
+
+    def _refresh_all_kinds(self):
+        if self._cache is _NOOP_CACHE:
+            return
+        for kind in list(self._all_kinds.values()):
+            self._refresh(self._all_cache_key(kind), lambda: self._cache_put_all(kind, self._core.get_all_internal(kind)))
+
+    def _refresh(self, cache_key, load):
+        try:
+            self._single_flight(cache_key, load)
+        except Exception as e:
+            log.warning("Unable to refresh cached data from persistent store: %s", e)
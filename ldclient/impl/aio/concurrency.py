@@ -95,6 +95,9 @@ class AsyncQueue:
     def empty(self) -> bool:
         return self._queue.empty()
 
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
 
 # The handle type returned by spawn_handle.
 TaskHandle = asyncio.Task
@@ -259,10 +262,13 @@ class BoundedTaskSet:
     """Runs up to ``limit`` coroutines concurrently as background tasks. When the
     limit is reached, ``try_run`` rejects new work (returning False) rather than
     queuing it, so callers can apply their own backpressure. ``wait`` awaits the
-    tasks currently in flight; ``stop`` prevents any further work from being accepted."""
+    tasks currently in flight; ``stop`` prevents any further work from being accepted.
+    If ``done_fn`` is given, it is called after each task, once the task no longer
+    counts against the limit."""
 
-    def __init__(self, limit: int):
+    def __init__(self, limit: int, done_fn: Optional[Callable[[], None]] = None):
         self._limit = limit
+        self._done_fn = done_fn
         self._tasks: Set[asyncio.Task] = set()
         self._accepting = True
 
@@ -276,6 +282,10 @@ class BoundedTaskSet:
         self._tasks.add(task)
         return True
 
+    def has_capacity(self) -> bool:
+        """Returns True if ``try_run`` would start a task now."""
+        return self._accepting and len(self._tasks) < self._limit
+
     async def _run(self, job: Callable[[], Coroutine]) -> None:
         try:
             await job()
@@ -285,6 +295,8 @@ class BoundedTaskSet:
             task = asyncio.current_task()
             if task is not None:
                 self._tasks.discard(task)
+            if self._done_fn is not None:
+                self._done_fn()
 
     async def wait(self) -> None:
         """Waits for the tasks currently running to complete. This does not stop
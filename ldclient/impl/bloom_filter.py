@@ -0,0 +1,77 @@
+import math
+from hashlib import blake2b
+
+
+class RotatingBloomFilter:
+    """A fixed-size, probabilistic set of string keys that forgets the oldest keys over time, as an
+    alternative to SimpleLRUCache when an exact cache of that many keys would take too much memory.
+
+    Keys are added to the current of two Bloom filters, each sized for half of the capacity. When the
+    current filter is full, the previous one is discarded and the current one takes its place, so the
+    most recent capacity/2 to capacity keys are remembered. A key that was never added is reported as
+    present with a probability of about false_positive_rate; a key that is still remembered is never
+    reported as absent. Not thread-safe, although a concurrent membership test gets a stale answer
+    rather than an error.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        self.capacity = capacity
+        self._keys_per_filter = max(1, capacity // 2)
+        # A key can be a false positive in either filter, so each one gets half of the allowed rate.
+        rate = false_positive_rate / 2
+        # A prime number of bits keeps double hashing from mapping different keys to the same bits.
+        self._bit_count = _next_prime(max(8, int(math.ceil(-self._keys_per_filter * math.log(rate) / (math.log(2) ** 2)))))
+        self._hash_count = max(1, int(round(self._bit_count / self._keys_per_filter * math.log(2))))
+        self._current = bytearray((self._bit_count + 7) // 8)
+        self._previous = bytearray(len(self._current))
+        self._current_count = 0
+
+    def __contains__(self, key):
+        positions = self._positions(key)
+        return self._test(self._current, positions) or self._test(self._previous, positions)
+
+    def put(self, key, value=True):
+        """Adds a key, and returns true if it was (probably) already present. The value is ignored; it
+        is only accepted for compatibility with SimpleLRUCache.
+        """
+        positions = self._positions(key)
+        if self._test(self._current, positions):
+            return True
+        found = self._test(self._previous, positions)
+        # A key that is only in the previous filter is added again, so that it is not forgotten at the
+        # next rotation while it is still in use.
+        if self._current_count >= self._keys_per_filter:
+            self._previous = self._current
+            self._current = bytearray(len(self._previous))
+            self._current_count = 0
+        current = self._current
+        for p in positions:
+            current[p >> 3] |= 1 << (p & 7)
+        self._current_count += 1
+        return found
+
+    def clear(self):
+        self._current = bytearray(len(self._current))
+        self._previous = bytearray(len(self._current))
+        self._current_count = 0
+
+    def _positions(self, key):
+        digest = blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        m = self._bit_count
+        return [(h1 + i * h2) % m for i in range(self._hash_count)]
+
+    @staticmethod
+    def _test(bits, positions):
+        for p in positions:
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+
+def _next_prime(n):
+    while True:
+        if n % 2 != 0 and all(n % d != 0 for d in range(3, math.isqrt(n) + 1, 2)):
+            return n
+        n += 1
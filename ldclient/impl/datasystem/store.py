@@ -7,13 +7,12 @@ ChangeSet applications and flag change notifications.
 """
 
 import threading
-from collections import defaultdict
 from typing import Any, Callable, Dict, List, Optional, Set
 
 from ldclient.impl.dependency_tracker import DependencyTracker, KindAndKey
+from ldclient.impl.in_memory_snapshot import EMPTY_SNAPSHOT, InMemorySnapshot
 from ldclient.impl.listeners import Listeners
 from ldclient.impl.model.entity import ModelEntity
-from ldclient.impl.rwlock import ReadWriteLock
 from ldclient.impl.util import log
 from ldclient.interfaces import (
     Change,
@@ -40,9 +39,10 @@ class InMemoryFeatureStore(ReadOnlyStore):
 
     def __init__(self):
         """Constructs an instance of InMemoryFeatureStore."""
-        self._lock = ReadWriteLock()
+        # Readers never lock; writers build a new immutable snapshot and replace the reference.
+        self._write_lock = threading.Lock()
         self._initialized = False
-        self._items = defaultdict(dict)
+        self._snapshot = EMPTY_SNAPSHOT
 
     def get(
         self,
@@ -50,35 +50,10 @@ class InMemoryFeatureStore(ReadOnlyStore):
         key: str,
         callback: Callable[[Any], Any] = lambda x: x,
     ) -> Any:
-        with self._lock.read():
-            items_of_kind = self._items[kind]
-            item = items_of_kind.get(key)
-            if item is None:
-                log.debug(
-                    "Attempted to get missing key %s in '%s', returning None",
-                    key,
-                    kind.namespace,
-                )
-                return callback(None)
-            if "deleted" in item and item["deleted"]:
-                log.debug(
-                    "Attempted to get deleted key %s in '%s', returning None",
-                    key,
-                    kind.namespace,
-                )
-                return callback(None)
-            return callback(item)
+        return callback(self._snapshot.get(kind, key))
 
     def all(self, kind: VersionedDataKind, callback: Callable[[Any], Any] = lambda x: x) -> Any:
-        with self._lock.read():
-            items_of_kind = self._items[kind]
-            return callback(
-                dict(
-                    (k, i)
-                    for k, i in items_of_kind.items()
-                    if ("deleted" not in i) or not i["deleted"]
-                )
-            )
+        return callback(self._snapshot.all(kind))
 
     def set_basis(self, collections: Collections) -> bool:
         """
@@ -89,9 +64,9 @@ class InMemoryFeatureStore(ReadOnlyStore):
             return False
 
         try:
-            with self._lock.write():
-                self._items.clear()
-                self._items.update(all_decoded)
+            snapshot = InMemorySnapshot.from_items(all_decoded)
+            with self._write_lock:
+                self._snapshot = snapshot
                 self._initialized = True
         except Exception as e:
             log.error("Failed applying set_basis", exc_info=e)
@@ -108,14 +83,13 @@ class InMemoryFeatureStore(ReadOnlyStore):
             return False
 
         try:
-            with self._lock.write():
-                for kind, kind_data in all_decoded.items():
-                    items_of_kind = self._items[kind]
-                    for key, item in kind_data.items():
-                        items_of_kind[key] = item
-                        log.debug(
-                            "Updated %s in '%s' to version %d", key, kind.namespace, item["version"]
-                        )
+            with self._write_lock:
+                self._snapshot = self._snapshot.with_items(all_decoded)
+            for kind, kind_data in all_decoded.items():
+                for key, item in kind_data.items():
+                    log.debug(
+                        "Updated %s in '%s' to version %d", key, kind.namespace, item["version"]
+                    )
         except Exception as e:
             log.error("Failed applying apply_delta", exc_info=e)
             return False
@@ -142,8 +116,7 @@ class InMemoryFeatureStore(ReadOnlyStore):
         """
         Indicates whether the store has been initialized with data.
         """
-        with self._lock.read():
-            return self._initialized
+        return self._initialized
 
 
 class Store:
@@ -6,6 +6,8 @@ from ldclient.evaluation import BigSegmentsStatus, EvaluationDetail
 from ldclient.impl.evaluator_common import (
     EvalResult,
     EvaluationException,
+    EvaluationScope,
+    PrerequisiteResult,
     _bucket_context,
     _context_key_is_in_target_list,
     _get_context_value_by_attr_ref,
@@ -54,8 +56,16 @@ class Evaluator:
         self.__get_big_segments_membership = get_big_segments_membership
         self.__logger = logger
 
-    def evaluate(self, flag: FeatureFlag, context: Context, event_factory: EventFactory) -> EvalResult:
-        state = EvalResult()
+    def evaluate(self, flag: FeatureFlag, context: Context, event_factory: EventFactory, scope: Optional[EvaluationScope] = None) -> EvalResult:
+        """
+        :param flag: the flag to evaluate
+        :param context: the evaluation context
+        :param event_factory: produces the events for any prerequisite flags
+        :param scope: if provided, segment matches, prerequisite results, store reads and Big Segment
+            queries are cached in this object and reused by later evaluations that use the same scope;
+            the caller must only share a scope between evaluations for the same context and event factory
+        """
+        state = EvalResult(scope)
         state.original_flag_key = flag.key
         try:
             state.detail = self._evaluate(flag, context, state, event_factory)
@@ -92,7 +102,7 @@ class Evaluator:
     def _check_prerequisites(self, flag: FeatureFlag, context: Context, state: EvalResult, event_factory: EventFactory) -> Optional[dict]:
         failed_prereq = None
         prereq_res = None
-        if flag.prerequisites.count == 0:
+        if len(flag.prerequisites) == 0:
             return None
 
         try:
@@ -111,22 +121,21 @@ class Evaluator:
                 if prereq_key == state.original_flag_key or (state.prereq_stack is not None and prereq.key in state.prereq_stack):
                     raise EvaluationException(('prerequisite relationship to "%s" caused a circular reference;' + ' this is probably a temporary condition due to an incomplete update') % prereq_key)
 
-                prereq_flag = self.__get_flag(prereq_key)
+                prereq_flag = self._get_flag(prereq_key, state)
                 state.record_prerequisite(prereq_key)
 
                 if prereq_flag is None:
                     log.warning("Missing prereq flag: " + prereq_key)
                     failed_prereq = prereq
                 else:
-                    state.depth += 1
-                    prereq_res = self._evaluate(prereq_flag, context, state, event_factory)
-                    state.depth -= 1
+                    prereq_res = self._evaluate_prerequisite(prereq_flag, context, state, event_factory)
                     # Note that if the prerequisite flag is off, we don't consider it a match no matter what its
                     # off variation was. But we still need to evaluate it in order to generate an event.
                     if (not prereq_flag.on) or prereq_res.variation_index != prereq.variation:
                         failed_prereq = prereq
-                    event = event_factory.new_eval_event(prereq_flag, context, prereq_res, None, flag)
-                    state.add_event(event)
+                    if event_factory.enabled:
+                        event = event_factory.new_eval_event(prereq_flag, context, prereq_res, None, flag)
+                        state.add_event(event)
                 if failed_prereq:
                     return {'kind': 'PREREQUISITE_FAILED', 'prerequisiteKey': failed_prereq.key}
             return None
@@ -134,6 +143,33 @@ class Evaluator:
             if state.prereq_stack is not None and len(state.prereq_stack) != 0:
                 state.prereq_stack.pop()
 
+    def _evaluate_prerequisite(self, prereq_flag: FeatureFlag, context: Context, state: EvalResult, event_factory: EventFactory) -> EvaluationDetail:
+        scope = state.scope
+        cache_key = (prereq_flag.key, prereq_flag.version)
+        if scope is not None:
+            cached = scope.prerequisite_results.get(cache_key)
+            if cached is not None:
+                for event in cached.events:
+                    state.add_event(event)
+                if cached.big_segments_status is not None:
+                    state.big_segments_status = cached.big_segments_status
+                return cached.detail
+
+        events_before = 0 if state.events is None else len(state.events)
+        saved_big_segments_status = state.big_segments_status
+        state.big_segments_status = None
+        state.depth += 1
+        prereq_res = self._evaluate(prereq_flag, context, state, event_factory)
+        state.depth -= 1
+        produced_big_segments_status = state.big_segments_status
+        if produced_big_segments_status is None:
+            state.big_segments_status = saved_big_segments_status
+
+        if scope is not None:
+            events = [] if state.events is None else state.events[events_before:]
+            scope.prerequisite_results[cache_key] = PrerequisiteResult(prereq_res, events, produced_big_segments_status)
+        return prereq_res
+
     def _rule_matches_context(self, rule: FlagRule, context: Context, state: EvalResult) -> bool:
         for clause in rule.clauses:
             if not self._clause_matches_context(clause, context, state):
@@ -143,7 +179,7 @@ class Evaluator:
     def _clause_matches_context(self, clause: Clause, context: Context, state: EvalResult) -> bool:
         if clause.op == 'segmentMatch':
             for seg_key in clause.values:
-                segment = self.__get_segment(seg_key)
+                segment = self._get_segment(seg_key, state)
                 if segment is not None and self._segment_matches_context(segment, context, state):
                     return _maybe_negate(clause, True)
             return _maybe_negate(clause, False)
@@ -151,9 +187,9 @@ class Evaluator:
         attr = clause.attribute
         if attr is None:
             return False
-        if attr.depth == 1 and attr[0] == 'kind':
+        if clause.matches_kind_attribute:
             return _maybe_negate(clause, _match_clause_by_kind(clause, context))
-        actual_context = context.get_individual_context(clause.context_kind or Context.DEFAULT_KIND)
+        actual_context = context.get_individual_context(clause.match_context_kind)
         if actual_context is None:
             return False
         context_value = _get_context_value_by_attr_ref(actual_context, attr)
@@ -171,6 +207,30 @@ class Evaluator:
     def _segment_matches_context(self, segment: Segment, context: Context, state: EvalResult) -> bool:
         if state.segment_stack is not None and segment.key in state.segment_stack:
             raise EvaluationException(('segment rule referencing segment "%s" caused a circular reference;' + ' this is probably a temporary condition due to an incomplete update') % segment.key)
+        scope = state.scope
+        if scope is None:
+            return self._segment_matches_context_uncached(segment, context, state)
+
+        # A segment that was already matched successfully within this scope cannot be part of a
+        # circular reference from here either: recomputing it would take exactly the same path.
+        cache_key = (segment.key, segment.version)
+        cached = scope.segment_matches.get(cache_key)
+        if cached is not None:
+            matched, big_segments_status = cached
+            if big_segments_status is not None:
+                state.big_segments_status = big_segments_status
+            return matched
+
+        saved_big_segments_status = state.big_segments_status
+        state.big_segments_status = None
+        matched = self._segment_matches_context_uncached(segment, context, state)
+        produced_big_segments_status = state.big_segments_status
+        if produced_big_segments_status is None:
+            state.big_segments_status = saved_big_segments_status
+        scope.segment_matches[cache_key] = (matched, produced_big_segments_status)
+        return matched
+
+    def _segment_matches_context_uncached(self, segment: Segment, context: Context, state: EvalResult) -> bool:
         if segment.unbounded:
             return self._big_segment_match_context(segment, context, state)
         return self._simple_segment_match_context(segment, context, state, True)
@@ -180,14 +240,14 @@ class Evaluator:
             if _context_key_is_in_target_list(context, None, segment.included):
                 return True
             for t in segment.included_contexts:
-                if _context_key_is_in_target_list(context, t.context_kind, t.values):
+                if _context_key_is_in_target_list(context, t.match_context_kind, t.values):
                     return True
             if _context_key_is_in_target_list(context, None, segment.excluded):
                 return False
             for t in segment.excluded_contexts:
-                if _context_key_is_in_target_list(context, t.context_kind, t.values):
+                if _context_key_is_in_target_list(context, t.match_context_kind, t.values):
                     return False
-        if segment.rules.count != 0:
+        if len(segment.rules) != 0:
             # Evaluating rules means we might be doing recursive segment matches, so we'll push the current
             # segment key onto the stack for cycle detection.
             if state.segment_stack is None:
@@ -212,7 +272,7 @@ class Evaluator:
             return True
 
         # All of the clauses are met. See if the context buckets in
-        bucket = _bucket_context(None, context, rule.rollout_context_kind, segment_key, salt, rule.bucket_by)
+        bucket = _bucket_context(None, context, rule.match_rollout_context_kind, segment_key, salt, rule.bucket_by)
         weight = rule.weight / 100000.0
         return bucket < weight
 
@@ -228,24 +288,21 @@ class Evaluator:
 
         # A big segment can only apply to one context kind, so if we don't have a key for that kind,
         # we don't need to bother querying the data.
-        match_context = context.get_individual_context(segment.unbounded_context_kind or Context.DEFAULT_KIND)
+        match_context = context.get_individual_context(segment.match_unbounded_context_kind)
         if match_context is None:
             return False
         key = match_context.key
 
-        membership = None
-        has_cached_membership = False
-        if state.big_segments_membership is not None:
-            if key in state.big_segments_membership:
-                has_cached_membership = True
-                membership = state.big_segments_membership[key]
-                # Note that we could have cached a None result from a query, in which case membership
-                # will be None but has_cached_membership will be True.
-        if not has_cached_membership:
+        result = None if state.big_segments_membership is None else state.big_segments_membership.get(key)
+        if result is not None:
+            # The status is restored along with the membership, so that every segment match that uses
+            # it reports the status, including matches that are cached in the evaluation scope.
+            membership, state.big_segments_status = result
+        else:
             if self.__get_big_segments_membership is None:
                 state.big_segments_status = BigSegmentsStatus.NOT_CONFIGURED
                 return False
-            result = self.__get_big_segments_membership(key)
+            result = self._get_big_segments_membership(key, state)
             # Note that this query is just by key; the context kind doesn't matter because any given
             # Big Segment can only reference one context kind. So if segment A for the "user" kind
             # includes a "user" context with key X, and segment B for the "org" kind includes an "org"
@@ -254,8 +311,38 @@ class Evaluator:
             membership, state.big_segments_status = result
             if state.big_segments_membership is None:
                 state.big_segments_membership = {}
-            state.big_segments_membership[key] = membership
+            state.big_segments_membership[key] = result
         included = None if membership is None else membership.get(_make_big_segment_ref(segment), None)
         if included is not None:
             return included
         return self._simple_segment_match_context(segment, context, state, False)
+
+    def _get_flag(self, key: str, state: EvalResult) -> Optional[FeatureFlag]:
+        scope = state.scope
+        if scope is None:
+            return self.__get_flag(key)
+        if key in scope.flags:
+            return scope.flags[key]
+        flag = self.__get_flag(key)
+        scope.flags[key] = flag
+        return flag
+
+    def _get_segment(self, key: str, state: EvalResult) -> Optional[Segment]:
+        scope = state.scope
+        if scope is None:
+            return self.__get_segment(key)
+        if key in scope.segments:
+            return scope.segments[key]
+        segment = self.__get_segment(key)
+        scope.segments[key] = segment
+        return segment
+
+    def _get_big_segments_membership(self, key: str, state: EvalResult) -> Tuple[Optional[dict], str]:
+        scope = state.scope
+        if scope is None:
+            return self.__get_big_segments_membership(key)
+        result = scope.big_segments_membership.get(key)
+        if result is None:
+            result = self.__get_big_segments_membership(key)
+            scope.big_segments_membership[key] = result
+        return result
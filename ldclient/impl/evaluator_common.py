@@ -13,30 +13,36 @@ from typing import Any, Dict, List, Optional, Set, Tuple
 
 from ldclient.context import Context
 from ldclient.evaluation import EvaluationDetail
-from ldclient.impl import operators
 from ldclient.impl.events.types import EventInputEvaluation
 from ldclient.impl.model import *
 
 __LONG_SCALE__ = float(0xFFFFFFFFFFFFFFF)
 
+# Bucket values depend only on the hash inputs, so they are memoized across evaluations, and across
+# the sync and async evaluators since both use this module. The memo is a plain dict so that reads
+# and writes are atomic without taking a lock; when it reaches capacity it is simply cleared.
+_BUCKET_CACHE_CAPACITY = 10000
+_bucket_cache = {}  # type: Dict[Tuple[Optional[int], str, str, str], float]
+
 
 # EvalResult is used internally to hold the EvaluationDetail result of an evaluation along with
 # other side effects that are not exposed to the application, such as events generated by
 # prerequisite evaluations, and the cached state of any Big Segments query that we may have
 # ended up having to do for the context.
 class EvalResult:
-    __slots__ = ['detail', 'events', 'big_segments_status', 'big_segments_membership', 'original_flag_key', 'prereq_stack', 'segment_stack', 'depth', 'prerequisites']
+    __slots__ = ['detail', 'events', 'big_segments_status', 'big_segments_membership', 'original_flag_key', 'prereq_stack', 'segment_stack', 'depth', 'prerequisites', 'scope']
 
-    def __init__(self):
+    def __init__(self, scope=None):
         self.detail = None
         self.events = None  # type: Optional[List[EventInputEvaluation]]
         self.big_segments_status = None  # type: Optional[str]
-        self.big_segments_membership = None  # type: Optional[Dict[str, Optional[dict]]]
+        self.big_segments_membership = None  # type: Optional[Dict[str, Tuple[Optional[dict], str]]]
         self.original_flag_key = None  # type: Optional[str]
         self.prereq_stack = None  # type: Optional[List[str]]
         self.segment_stack = None  # type: Optional[List[str]]
         self.depth = 0
         self.prerequisites = []  # type: List[str]
+        self.scope = scope  # type: Optional[EvaluationScope]
 
     def record_prerequisite(self, key: str):
         if self.depth == 0:
@@ -51,6 +57,37 @@ class EvalResult:
         return "EvalResult(detail=%s, events=%s)" % (self.detail, self.events)
 
 
+# EvaluationScope holds results that can be shared between the evaluations of several flags for the
+# same context and the same event factory, such as within one call to LDClient.variations(). Since the
+# context does not change within a scope, a segment match or a prerequisite result for a given version
+# of a segment or flag is the same every time; likewise the flags, segments and Big Segment membership
+# read from the stores only need to be read once. A scope is not thread-safe and should not outlive the
+# batch it was created for, so that it never serves data that is older than the store.
+#
+# Cached segment and prerequisite results remember the Big Segments status (if any) that computing them
+# produced, so that reusing them affects the status reported for the flag exactly as recomputing would.
+class EvaluationScope:
+    __slots__ = ['flags', 'segments', 'big_segments_membership', 'segment_matches', 'prerequisite_results']
+
+    def __init__(self):
+        self.flags = {}  # type: Dict[str, Optional[FeatureFlag]]
+        self.segments = {}  # type: Dict[str, Optional[Segment]]
+        self.big_segments_membership = {}  # type: Dict[str, Tuple[Optional[dict], str]]
+        self.segment_matches = {}  # type: Dict[Tuple[str, int], Tuple[bool, Optional[str]]]
+        self.prerequisite_results = {}  # type: Dict[Tuple[str, int], PrerequisiteResult]
+
+
+class PrerequisiteResult:
+    __slots__ = ['detail', 'events', 'big_segments_status']
+
+    def __init__(self, detail: EvaluationDetail, events: List[EventInputEvaluation], big_segments_status: Optional[str]):
+        self.detail = detail
+        # events generated by the prerequisite's own prerequisites; the event for the prerequisite
+        # itself depends on which flag it is a prerequisite of, so it is not cached
+        self.events = events
+        self.big_segments_status = big_segments_status
+
+
 class EvaluationException(Exception):
     def __init__(self, message: str, error_kind: str = 'MALFORMED_FLAG'):
         self._message = message
@@ -105,7 +142,7 @@ def _variation_index_for_context(flag: FeatureFlag, vr: VariationOrRollout, cont
         return None, False
 
     bucket_by = None if rollout.is_experiment else rollout.bucket_by
-    bucket = _bucket_context(rollout.seed, context, rollout.context_kind, flag.key, flag.salt, bucket_by)
+    bucket = _bucket_context(rollout.seed, context, rollout.match_context_kind, flag.key, flag.salt, bucket_by)
     is_experiment = rollout.is_experiment and bucket >= 0
     # _bucket_context returns a negative value if the context didn't exist, in which case we
     # still end up returning the first bucket, but we will force the "in experiment" state to be false.
@@ -136,15 +173,26 @@ def _bucket_context(seed: Optional[int], context: Context, context_kind: Optiona
     bucket_by_value = _bucketable_string_value(clause_value)
     if bucket_by_value is None:
         return 0.0
-    id_hash = clause_value
+    cache_key = (seed, key, salt, bucket_by_value)
+    result = _bucket_cache.get(cache_key)
+    if result is None:
+        result = _compute_bucket_value(seed, key, salt, bucket_by_value)
+        if len(_bucket_cache) >= _BUCKET_CACHE_CAPACITY:
+            _bucket_cache.clear()
+        _bucket_cache[cache_key] = result
+    return result
+
+
+def _compute_bucket_value(seed: Optional[int], key: str, salt: str, bucket_by_value: str) -> float:
     if seed is not None:
         prefix = str(seed)
     else:
         prefix = '%s.%s' % (key, salt)
-    hash_key = '%s.%s' % (prefix, id_hash)
-    hash_val = int(hashlib.sha1(hash_key.encode('utf-8')).hexdigest()[:15], 16)
-    result = hash_val / __LONG_SCALE__
-    return result
+    hash_key = '%s.%s' % (prefix, bucket_by_value)
+    # The first 15 hex digits of the SHA-1 digest are the top 60 bits of its first 8 bytes, so we
+    # can get the same value without formatting and re-parsing a hex string.
+    hash_val = int.from_bytes(hashlib.sha1(hash_key.encode('utf-8')).digest()[:8], 'big') >> 4
+    return hash_val / __LONG_SCALE__
 
 
 def _bucketable_string_value(u_value) -> Optional[str]:
@@ -168,22 +216,24 @@ def _get_context_value_by_attr_ref(context: Context, attr: AttributeRef) -> Any:
         raise EvaluationException("rule clause did not specify an attribute")
     if attr.error is not None:
         raise EvaluationException("invalid attribute reference: " + attr.error)
-    name = attr[0]
-    if name is None:
+    components = attr.path_components
+    if len(components) == 0:
         return None
-    value = context.get(name)
-    depth = attr.depth
-    i = 1
-    while i < depth:
+    value = context.get(components[0])
+    if len(components) == 1:
+        return value
+    for name in components[1:]:
         if not isinstance(value, dict):
             return None  # can't get subproperty if we're not in a JSON object
-        value = value.get(attr[i])
-        i += 1
+        value = value.get(name)
     return value
 
 
 def _match_single_context_value(clause: Clause, context_value: Any) -> bool:
-    op_fn = operators.ops.get(clause.op)
+    values_matcher = clause.values_matcher
+    if values_matcher is not None:
+        return values_matcher.matches(context_value)
+    op_fn = clause.op_fn
     if op_fn is None:
         return False
     values_preprocessed = clause.values_preprocessed
@@ -221,36 +271,17 @@ def _target_match_result(flag: FeatureFlag, var: int) -> EvaluationDetail:
 
 
 def check_targets(flag: FeatureFlag, context: Context) -> Optional[EvaluationDetail]:
-    user_targets = flag.targets
-    context_targets = flag.context_targets
-    if len(context_targets) == 0:
-        # old-style data has only targets for users
-        if len(user_targets) != 0:
-            user_context = context.get_individual_context(Context.DEFAULT_KIND)
-            if user_context is None:
-                return None
-            key = user_context.key
-            for t in user_targets:
-                if key in t.values:
-                    return _target_match_result(flag, t.variation)
-        return None
-    for t in context_targets:
-        kind = t.context_kind or Context.DEFAULT_KIND
-        var = t.variation
+    best = None  # type: Optional[Tuple[int, int]]
+    for kind, keys in flag.target_index.items():
         actual_context = context.get_individual_context(kind)
         if actual_context is None:
             continue
-        key = actual_context.key
-        if kind == Context.DEFAULT_KIND:
-            for ut in user_targets:
-                if ut.variation == var:
-                    if key in ut.values:
-                        return _target_match_result(flag, var)
-                    break
-            continue
-        if key in t.values:
-            return _target_match_result(flag, var)
-    return None
+        found = keys.get(actual_context.key)
+        if found is not None and (best is None or found[0] < best[0]):
+            best = found
+    if best is None:
+        return None
+    return _target_match_result(flag, best[1])
 
 
 def error_reason(error_kind: str) -> dict:
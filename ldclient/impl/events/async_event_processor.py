@@ -5,7 +5,9 @@ Implementation details of the analytics event delivery component.
 import asyncio
 import gzip
 import json
+import logging
 import queue
+import time
 import uuid
 from collections import namedtuple
 from random import Random
@@ -24,19 +26,23 @@ from ldclient.impl.aio.transport import AsyncHTTPTransport
 from ldclient.impl.events.diagnostics import create_diagnostic_init
 from ldclient.impl.events.event_processor_common import (
     CURRENT_EVENT_SCHEMA,
+    EncodedEventPayload,
     EventBuffer,
     EventDispatcherBase,
-    EventOutputFormatter
+    EventMetricsRecorder,
+    EventOutputFormatter,
+    EventPayloadEncoder,
+    decode_event_payload_for_log,
+    make_context_keys_cache
 )
 from ldclient.impl.events.types import EventInput
-from ldclient.impl.lru_cache import SimpleLRUCache
 from ldclient.impl.sampler import Sampler
 from ldclient.impl.util import (
     _headers,
     check_if_error_is_recoverable_and_log,
     log
 )
-from ldclient.interfaces import AsyncEventProcessor
+from ldclient.interfaces import AsyncEventProcessor, EventProcessorMetrics
 
 __MAX_FLUSH_CONCURRENCY__ = 5
 
@@ -45,27 +51,36 @@ EventProcessorMessage = namedtuple('EventProcessorMessage', ['type', 'param'])
 
 
 class EventPayloadSendTask:
-    def __init__(self, http: AsyncHTTPTransport, config: AsyncConfig, formatter: EventOutputFormatter, payload, response_fn: Callable):
+    def __init__(self, http: AsyncHTTPTransport, config: AsyncConfig, formatter: EventOutputFormatter, payload, response_fn: Callable, delivery_fn: Optional[Callable] = None):
         self._http = http
         self._config = config
         self._formatter = formatter
         self._payload = payload
         self._response_fn = response_fn
+        self._delivery_fn = delivery_fn
+        self._encoder = EventPayloadEncoder(config.enable_event_compression, config.events_max_payload_size)
 
     async def run(self):
         try:
-            output_events = self._formatter.make_output_events(self._payload.events, self._payload.summary)
-            await self._do_send(output_events)
+            output_events = self._formatter.iter_output_events(self._payload.events, self._payload.summary)
+            # Unlike the sync implementation, the requests that a large flush is split into are sent one
+            # after another by this task: BoundedTaskSet.wait only waits for the tasks that were running
+            # when it was called, so extra tasks started from here could outlive flush_and_wait.
+            for encoded in self._encoder.encode(output_events):
+                await self._do_send(encoded)
         except Exception:
             log.warning('Unhandled exception in event processor. Analytics events were not processed.', exc_info=True)
 
-    async def _do_send(self, output_events):
+    async def _do_send(self, payload: EncodedEventPayload):
         # noinspection PyBroadException
         try:
-            json_body = json.dumps(output_events, separators=(',', ':'))
-            log.debug('Sending events payload: ' + json_body)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('Sending events payload: %s', decode_event_payload_for_log(payload, self._config.enable_event_compression))
             payload_id = str(uuid.uuid4())
-            r = await _post_events_with_retry(self._http, self._config, self._config.events_uri, payload_id, json_body, "%d events" % len(output_events))
+            started = time.perf_counter()
+            r = await _post_events_with_retry(self._http, self._config, self._config.events_uri, payload_id, payload.body, "%d events" % payload.event_count)
+            if self._delivery_fn is not None:
+                self._delivery_fn(payload, time.perf_counter() - started, r)
             if r:
                 self._response_fn(r)
             return r
@@ -98,16 +113,17 @@ class EventDispatcher(EventDispatcherBase):
         # remains owned by the caller.
         self._http = AsyncHTTPTransport(config, client=http_client)
         self._disabled = False
-        self._outbox = EventBuffer(config.events_max_pending)
-        self._context_keys = SimpleLRUCache(config.context_keys_capacity)
+        self._outbox = EventBuffer(config.events_max_pending, config.events_flush_high_water_ratio, config.events_max_payload_size)
+        self._context_keys = make_context_keys_cache(config)
         self._formatter = EventOutputFormatter(config)
         self._last_known_past_time = 0
         self._deduplicated_contexts = 0
         self._diagnostic_accumulator = None if config.diagnostic_opt_out else diagnostic_accumulator
         self._sampler = Sampler(Random())
         self._omit_anonymous_contexts = config.omit_anonymous_contexts
+        self._metrics = EventMetricsRecorder()
 
-        self._flush_workers = BoundedTaskSet(__MAX_FLUSH_CONCURRENCY__)
+        self._flush_workers = BoundedTaskSet(__MAX_FLUSH_CONCURRENCY__, self._flush_worker_done)
         self._diagnostic_flush_workers: Optional[BoundedTaskSet] = None
         if self._diagnostic_accumulator is not None:
             self._diagnostic_flush_workers = BoundedTaskSet(1)
@@ -125,8 +141,13 @@ class EventDispatcher(EventDispatcherBase):
                 message = await self._inbox.get()
                 if message.type == 'event':
                     self._process_event(message.param)
+                    if self._outbox.needs_early_flush() and self._flush_workers.has_capacity():
+                        self._trigger_flush()
                 elif message.type == 'flush':
                     self._trigger_flush()
+                elif message.type == 'flush_deferred':
+                    if self._outbox.flush_deferred and self._flush_workers.has_capacity():
+                        self._trigger_flush()
                 elif message.type == 'flush_contexts':
                     self._context_keys.clear()
                 elif message.type == 'diagnostic':
@@ -154,6 +175,15 @@ class EventDispatcher(EventDispatcherBase):
             except Exception:
                 log.error('Unhandled exception in event processor', exc_info=True)
 
+    def _flush_worker_done(self):
+        # A flush that was deferred because every worker was busy is retried as soon as one is free,
+        # rather than waiting for the next event or the flush interval.
+        if self._outbox.flush_deferred:
+            try:
+                self._inbox.put_nowait(EventProcessorMessage('flush_deferred', None))
+            except queue.Full:
+                pass  # the next event will retry it
+
     def _trigger_flush(self) -> bool:
         """Hands the buffered events to a flush worker. Returns True if handed
         off (or there was nothing to flush), or False if all workers are busy
@@ -164,12 +194,14 @@ class EventDispatcher(EventDispatcherBase):
         if self._diagnostic_accumulator:
             self._diagnostic_accumulator.record_events_in_batch(len(payload.events))
         if len(payload.events) > 0 or not payload.summary.is_empty():
-            task = EventPayloadSendTask(self._http, self._config, self._formatter, payload, self._handle_response)
+            task = EventPayloadSendTask(self._http, self._config, self._formatter, payload, self._handle_response, self._record_delivery)
             if self._flush_workers.try_run(task.run):
                 # The events have been handed off to a flush worker; clear them from our buffer.
                 self._outbox.clear()
                 return True
-            # We're already at our limit of concurrent flushes; leave the events in the buffer.
+            # We're already at our limit of concurrent flushes; keep the events for the next flush.
+            self._outbox.defer_flush()
+            self._metrics.flush_worker_saturations += 1
             return False
         return True
 
@@ -215,7 +247,9 @@ class DefaultAsyncEventProcessor(AsyncEventProcessor):
         self._close_lock = AsyncLock()
         self._closed = False
 
-        (dispatcher_class or EventDispatcher)(self._inbox, config, http, diagnostic_accumulator)
+        dispatcher = (dispatcher_class or EventDispatcher)(self._inbox, config, http, diagnostic_accumulator)
+        # a substitute dispatcher used in tests does not keep metrics
+        self._dispatcher = dispatcher if isinstance(dispatcher, EventDispatcher) else None
 
     def send_event(self, event: EventInput):
         self._post_to_inbox(EventProcessorMessage('event', event))
@@ -223,6 +257,11 @@ class DefaultAsyncEventProcessor(AsyncEventProcessor):
     def flush(self):
         self._post_to_inbox(EventProcessorMessage('flush', None))
 
+    def get_metrics(self) -> Optional[EventProcessorMetrics]:
+        if self._dispatcher is None:
+            return None
+        return self._dispatcher.get_metrics(self._inbox.qsize())
+
     async def flush_and_wait(self, timeout: float) -> bool:
         try:
             await asyncio.wait_for(self._post_message_and_wait('flush_and_wait'), timeout)
@@ -248,6 +287,8 @@ class DefaultAsyncEventProcessor(AsyncEventProcessor):
         try:
             self._inbox.put_nowait(message)
         except queue.Full:
+            if message.type == 'event' and self._dispatcher is not None:
+                self._dispatcher.record_inbox_full_drop()
             if not self._inbox_full:
                 # possible race condition here, but it's of no real consequence - we'd just get an extra log line
                 self._inbox_full = True
@@ -276,7 +317,7 @@ class DefaultAsyncEventProcessor(AsyncEventProcessor):
         await self.stop()
 
 
-async def _post_events_with_retry(http_client: AsyncHTTPTransport, config: AsyncConfig, uri: str, payload_id: Optional[str], body: str, events_description: str):
+async def _post_events_with_retry(http_client: AsyncHTTPTransport, config: AsyncConfig, uri: str, payload_id: Optional[str], body: Union[bytes, str], events_description: str):
     hdrs = _headers(config)
     hdrs['Content-Type'] = 'application/json'
     if config.enable_event_compression:
@@ -287,7 +328,10 @@ async def _post_events_with_retry(http_client: AsyncHTTPTransport, config: Async
         hdrs['X-LaunchDarkly-Payload-ID'] = payload_id
     can_retry = True
     context = "posting %s" % events_description
-    data: Union[bytes, str] = gzip.compress(bytes(body, 'utf-8')) if config.enable_event_compression else body
+    data = body
+    # A bytes body has already been encoded by EventPayloadEncoder, which compresses it if necessary.
+    if config.enable_event_compression and isinstance(body, str):
+        data = gzip.compress(bytes(body, 'utf-8'))
     while True:
         next_action_message = "will retry" if can_retry else "some events were dropped"
         try:
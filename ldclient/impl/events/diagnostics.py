@@ -23,7 +23,7 @@ class _DiagnosticAccumulator:
         with self._state_lock:
             self._events_in_last_batch = events_in_batch
 
-    def create_event_and_reset(self, dropped_events, deduplicated_users):
+    def create_event_and_reset(self, dropped_events, deduplicated_users, spool_stats=None):
         with self._state_lock:
             events_in_batch = self._events_in_last_batch
             stream_inits = self._stream_inits
@@ -35,6 +35,8 @@ class _DiagnosticAccumulator:
         periodic_event.update(
             {'dataSinceDate': self.data_since_date, 'droppedEvents': dropped_events, 'deduplicatedUsers': deduplicated_users, 'eventsInLastBatch': events_in_batch, 'streamInits': stream_inits}
         )
+        if spool_stats is not None:
+            periodic_event.update({'spooledEventBytes': spool_stats[0], 'droppedSpooledEventBytes': spool_stats[1]})
         self.data_since_date = current_time
         return periodic_event
 
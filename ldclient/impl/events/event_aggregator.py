@@ -0,0 +1,133 @@
+"""
+Implementation details of the optional cross-process aggregation of analytics events.
+
+When several processes share an events aggregator socket, the first one to claim it becomes the
+aggregator: it receives the events that the other processes have buffered, and delivers them to
+LaunchDarkly along with its own. The other processes forward their buffered events to it at each
+flush, instead of delivering them themselves.
+"""
+
+import json
+import os
+import socket
+import struct
+from threading import Thread
+from typing import Any, Callable, Optional
+
+from ldclient.impl.util import log
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None  # type: ignore
+
+_MESSAGE_HEADER = struct.Struct('>I')
+_ACCEPTED = b'\x01'
+_REJECTED = b'\x00'
+_SOCKET_TIMEOUT = 5
+_ACCEPT_POLL_INTERVAL = 1
+
+
+def aggregation_is_supported() -> bool:
+    return fcntl is not None and hasattr(socket, 'AF_UNIX')
+
+
+class EventAggregatorServer:
+    """
+    Listens on the aggregator socket on behalf of the process that claimed it, and passes each batch of
+    forwarded events to batch_fn, which returns False if the batch could not be accepted. The forwarding
+    process is told whether the batch was accepted, so that it can deliver the events itself if not.
+    """
+
+    def __init__(self, path: str, lock_file: Any, batch_fn: Callable[[dict], bool]):
+        self._path = path
+        self._lock_file = lock_file
+        self._batch_fn = batch_fn
+        self._closed = False
+        if os.path.exists(path):
+            # We hold the lock, so this was left behind by an aggregator that is no longer running.
+            os.remove(path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.bind(path)
+        os.chmod(path, 0o600)
+        self._socket.listen(16)
+        # so that the accept loop notices when the server is closed
+        self._socket.settimeout(_ACCEPT_POLL_INTERVAL)
+        self._thread = Thread(target=self._run, name="ldclient.events.aggregator")
+        self._thread.daemon = True
+        self._thread.start()
+
+    @staticmethod
+    def claim(path: str, batch_fn: Callable[[dict], bool]) -> Optional['EventAggregatorServer']:
+        """
+        Starts listening on the aggregator socket if no other process has claimed it, or returns None if
+        one has. The claim is an exclusive lock on a file next to the socket, which is released when the
+        server is closed or this process exits. Processes forked from this one cannot claim it while it is
+        held, so in a prefork server whichever process creates the client first becomes the aggregator.
+        """
+        lock_file = open(path + '.lock', 'a')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
+        try:
+            return EventAggregatorServer(path, lock_file, batch_fn)
+        except Exception:
+            lock_file.close()
+            raise
+
+    def close(self):
+        self._closed = True
+        try:
+            self._socket.close()
+            os.remove(self._path)
+        except OSError:
+            pass
+        self._lock_file.close()
+
+    def _run(self):
+        log.info("Aggregating analytics events from other processes on %s", self._path)
+        while not self._closed:
+            try:
+                conn, _ = self._socket.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                if not self._closed:
+                    log.warning('Events aggregator socket failed; no longer accepting events from other processes', exc_info=True)
+                return
+            # noinspection PyBroadException
+            try:
+                with conn:
+                    conn.settimeout(_SOCKET_TIMEOUT)
+                    batch = json.loads(_recv_message(conn))
+                    conn.sendall(_ACCEPTED if self._batch_fn(batch) else _REJECTED)
+            except Exception as e:
+                log.warning('Unable to receive analytics events from another process [%s]', e)
+
+
+def forward_batch(path: str, batch: dict) -> bool:
+    """Sends a batch of events to the aggregator, and returns True if it accepted them."""
+    body = json.dumps(batch, separators=(',', ':')).encode('utf-8')
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(_SOCKET_TIMEOUT)
+        conn.connect(path)
+        conn.sendall(_MESSAGE_HEADER.pack(len(body)) + body)
+        return conn.recv(1) == _ACCEPTED
+
+
+def _recv_message(conn: socket.socket) -> bytes:
+    header = _recv_exactly(conn, _MESSAGE_HEADER.size)
+    return _recv_exactly(conn, _MESSAGE_HEADER.unpack(header)[0])
+
+
+def _recv_exactly(conn: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size > 0:
+        chunk = conn.recv(min(size, 65536))
+        if not chunk:
+            raise EOFError('connection closed before the message was complete')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
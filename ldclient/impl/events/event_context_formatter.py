@@ -1,8 +1,25 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from ldclient.context import Context
 from ldclient.impl.model import AttributeRef
 
+# Limits how many distinct per-context private attribute lists have a redaction plan cached at once.
+_MAX_CACHED_PLANS = 1000
+
+
+class _RedactionPlan:
+    """
+    The private attribute references that apply to a context, split into the top-level attribute names
+    that are private as a whole and the references to properties within object values.
+    """
+
+    __slots__ = ['whole', 'nested', 'nested_roots']
+
+    def __init__(self, refs: List[AttributeRef]):
+        self.whole = frozenset(r[0] for r in refs if r.depth == 1)
+        self.nested = [r for r in refs if r.depth > 1]
+        self.nested_roots = frozenset(r[0] for r in self.nested)
+
 
 class EventContextFormatter:
     IGNORE_ATTRS = frozenset(['key', 'custom', 'anonymous'])
@@ -15,6 +32,10 @@ class EventContextFormatter:
             ar = AttributeRef.from_path(p)
             if ar.valid:
                 self._private_attributes.append(ar)
+        self._default_plan = _RedactionPlan(self._private_attributes)
+        # Keyed by a context's own private attribute list. Plans are immutable and can always be
+        # recomputed, so this is shared by flush threads without a lock.
+        self._plans = {}  # type: Dict[Tuple[str, ...], _RedactionPlan]
 
     def format_context(self, context: Context) -> Dict:
         """
@@ -53,35 +74,45 @@ class EventContextFormatter:
             out['anonymous'] = True
 
         redacted = []  # type: List[str]
-        all_private = self._private_attributes
-        for p in context.private_attributes:
-            if all_private is self._private_attributes:
-                all_private = all_private.copy()
-            ar = AttributeRef.from_path(p)
-            if ar.valid:
-                all_private.append(ar)
+        plan = self._redaction_plan(context)
+        redact_all = context.anonymous and redact_anonymous
 
-        if context.name is not None and not self._check_whole_attr_private('name', all_private, redacted, context.anonymous and redact_anonymous):
+        if context.name is not None and not self._check_whole_attr_private('name', plan, redacted, redact_all):
             out['name'] = context.name
 
         for attr in context.custom_attributes:
-            if not self._check_whole_attr_private(attr, all_private, redacted, context.anonymous and redact_anonymous):
+            if not self._check_whole_attr_private(attr, plan, redacted, redact_all):
                 value = context.get(attr)
-                out[attr] = self._redact_json_value(None, attr, value, all_private, redacted)
+                if attr in plan.nested_roots:
+                    value = self._redact_json_value(None, attr, value, plan.nested, redacted)
+                out[attr] = value
 
         if len(redacted) != 0:
             out['_meta'] = {'redactedAttributes': redacted}
 
         return out
 
-    def _check_whole_attr_private(self, attr: str, all_private: List[AttributeRef], redacted: List[str], redact_all: bool) -> bool:
-        if self._all_attributes_private or redact_all:
+    def _redaction_plan(self, context: Context) -> _RedactionPlan:
+        private = tuple(context.private_attributes)
+        if not private:
+            return self._default_plan
+        plan = self._plans.get(private)
+        if plan is None:
+            all_private = self._private_attributes.copy()
+            for p in private:
+                ar = AttributeRef.from_path(p)
+                if ar.valid:
+                    all_private.append(ar)
+            plan = _RedactionPlan(all_private)
+            if len(self._plans) >= _MAX_CACHED_PLANS:
+                self._plans = {}
+            self._plans[private] = plan
+        return plan
+
+    def _check_whole_attr_private(self, attr: str, plan: _RedactionPlan, redacted: List[str], redact_all: bool) -> bool:
+        if self._all_attributes_private or redact_all or attr in plan.whole:
             redacted.append(attr)
             return True
-        for p in all_private:
-            if p.depth == 1 and p[0] == attr:
-                redacted.append(attr)
-                return True
         return False
 
     def _redact_json_value(self, parent_path: Optional[List[str]], name: str, value: Any, all_private: List[AttributeRef], redacted: List[str]) -> Any:
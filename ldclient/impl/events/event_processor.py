@@ -4,71 +4,244 @@ Implementation details of the analytics event delivery component.
 
 import gzip
 import json
+import logging
 import queue
 import time
 import uuid
 from collections import namedtuple
+from functools import partial
 from random import Random
 from threading import Event, Lock, Thread
+from typing import Any, Dict, Optional
 
 import urllib3
+from ld_eventsource.config import RetryDelayStrategy
 
 from ldclient.config import Config
+from ldclient.context import Context
+from ldclient.evaluation import EvaluationDetail
 from ldclient.impl.events.diagnostics import create_diagnostic_init
+from ldclient.impl.events.event_aggregator import (
+    EventAggregatorServer,
+    aggregation_is_supported,
+    forward_batch
+)
 from ldclient.impl.events.event_processor_common import (
     CURRENT_EVENT_SCHEMA,
+    EncodedEventPayload,
     EventBuffer,
     EventDispatcherBase,
-    EventOutputFormatter
+    EventMetricsRecorder,
+    EventOutputFormatter,
+    EventPayloadEncoder,
+    decode_event_payload_for_log,
+    make_context_keys_cache
+)
+from ldclient.impl.events.event_spool import EventSpool
+from ldclient.impl.events.event_summarizer import ShardedEventSummarizer
+from ldclient.impl.events.types import (
+    EventFactory,
+    EventInput,
+    EventInputEvaluation
 )
-from ldclient.impl.events.types import EventInput
 from ldclient.impl.fixed_thread_pool import FixedThreadPool
 from ldclient.impl.http import _http_factory
-from ldclient.impl.lru_cache import SimpleLRUCache
+from ldclient.impl.model import FeatureFlag
 from ldclient.impl.repeating_task import RepeatingTask
 from ldclient.impl.sampler import Sampler
 from ldclient.impl.util import (
     _headers,
     check_if_error_is_recoverable_and_log,
+    current_time_millis,
     log
 )
-from ldclient.interfaces import EventProcessor
+from ldclient.interfaces import EventProcessor, EventProcessorMetrics
 
 __MAX_FLUSH_THREADS__ = 5
+# A delivery counts as slow if it takes this many times longer than usual, and at least the minimum.
+__SLOW_DELIVERY_RATIO__ = 3
+__SLOW_DELIVERY_MIN_SECONDS__ = 1.0
+__DELIVERY_TIME_SMOOTHING__ = 0.2
+__SPOOL_REPLAY_INITIAL_DELAY__ = 1
+__SPOOL_REPLAY_MAX_DELAY__ = 300
+__SPOOL_REPLAY_JITTER_RATIO__ = 0.5
 
 
 EventProcessorMessage = namedtuple('EventProcessorMessage', ['type', 'param'])
 
 
+class FlushConcurrencyLimiter:
+    """
+    Adjusts how many flush workers may send events at once, based on how deliveries are going. The
+    limit is halved when a delivery fails or is much slower than usual, which suggests that the network
+    or the events service is overloaded, and goes back up by one after each delivery that is not.
+    """
+
+    def __init__(self, workers: FixedThreadPool, max_limit: int):
+        self._workers = workers
+        self._max_limit = max_limit
+        self._limit = max_limit
+        self._usual_seconds = None  # type: Optional[float]
+        self._lock = Lock()
+
+    def record_delivery(self, seconds: float, succeeded: bool):
+        with self._lock:
+            usual = self._usual_seconds
+            slow = usual is not None and seconds > max(usual * __SLOW_DELIVERY_RATIO__, __SLOW_DELIVERY_MIN_SECONDS__)
+            if not succeeded or slow:
+                self._limit = max(1, self._limit // 2)
+            elif self._limit < self._max_limit:
+                self._limit += 1
+            if succeeded:
+                # Slow deliveries still count, so that a lasting change in latency becomes the new normal.
+                self._usual_seconds = seconds if usual is None else usual + (seconds - usual) * __DELIVERY_TIME_SMOOTHING__
+            self._workers.set_limit(self._limit)
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+
 class EventPayloadSendTask:
-    def __init__(self, http, config, formatter, payload, response_fn):
+    def __init__(self, http, config, formatter, payload, response_fn, workers=None, failure_fn=None, delivery_fn=None):
         self._http = http
         self._config = config
         self._formatter = formatter
         self._payload = payload
         self._response_fn = response_fn
+        self._workers = workers
+        self._failure_fn = failure_fn
+        self._delivery_fn = delivery_fn
+        self._encoder = EventPayloadEncoder(config.enable_event_compression, config.events_max_payload_size)
 
     def run(self):
         try:
-            output_events = self._formatter.make_output_events(self._payload.events, self._payload.summary)
-            resp = self._do_send(output_events)
+            output_events = self._formatter.iter_output_events(self._payload.events, self._payload.summary)
+            pending = None
+            for encoded in self._encoder.encode(output_events):
+                # When the events are split into several requests, every request but the last is handed
+                # to another flush worker if one is free, so that they are sent concurrently while we go
+                # on encoding; otherwise it is sent from this thread.
+                if pending is not None and (self._workers is None or not self._workers.execute(partial(self._do_send, pending))):
+                    self._do_send(pending)
+                pending = encoded
+            if pending is not None:
+                self._do_send(pending)
         except Exception as e:
             log.warning('Unhandled exception in event processor. Analytics events were not processed.', exc_info=True)
 
-    def _do_send(self, output_events):
+    def _do_send(self, payload: EncodedEventPayload):
         # noinspection PyBroadException
         try:
-            json_body = json.dumps(output_events, separators=(',', ':'))
-            log.debug('Sending events payload: ' + json_body)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('Sending events payload: %s', decode_event_payload_for_log(payload, self._config.enable_event_compression))
             payload_id = str(uuid.uuid4())
-            r = _post_events_with_retry(self._http, self._config, self._config.events_uri, payload_id, json_body, "%d events" % len(output_events))
+            started = time.perf_counter()
+            r = _post_events_with_retry(self._http, self._config, self._config.events_uri, payload_id, payload.body, "%d events" % payload.event_count)
+            if self._delivery_fn is not None:
+                self._delivery_fn(payload, time.perf_counter() - started, r)
             if r:
                 self._response_fn(r)
+            elif self._failure_fn is not None:
+                self._failure_fn(payload_id, payload.body)
             return r
         except Exception as e:
             log.warning('Unhandled exception in event processor. Analytics events were not processed. [%s]', e)
 
 
+class EventForwardTask:
+    """
+    Forwards a flush payload to the process that aggregates events, already in the output format, along
+    with the key of each event's context so that the aggregator can skip redundant index events. If the
+    aggregator cannot be reached or does not accept the events, fallback_fn is called to deliver them
+    directly instead. status_fn is called with None if the events were forwarded, or the error if not.
+    """
+
+    def __init__(self, path, formatter, payload, omit_anonymous_contexts, fallback_fn, status_fn):
+        self._path = path
+        self._formatter = formatter
+        self._payload = payload
+        self._omit_anonymous_contexts = omit_anonymous_contexts
+        self._fallback_fn = fallback_fn
+        self._status_fn = status_fn
+
+    def run(self):
+        # noinspection PyBroadException
+        try:
+            if forward_batch(self._path, self._make_batch()):
+                self._status_fn(None)
+                return
+            self._status_fn(Exception('the aggregating process is too busy'))
+        except Exception as e:
+            self._status_fn(e)
+        self._fallback_fn()
+
+    def _make_batch(self):
+        events = []
+        contexts = {}  # type: Dict[Any, Any]
+        for e in self._payload.events:
+            out = self._formatter.make_output_event(e, contexts)
+            if out is not None:
+                events.append([self._context_key(e), out])
+        summary = None if self._payload.summary.is_empty() else self._formatter.make_summary_event(self._payload.summary)
+        return {'events': events, 'summary': summary}
+
+    def _context_key(self, e):
+        context = getattr(e, 'context', None)
+        if context is None:
+            return None
+        if self._omit_anonymous_contexts:
+            context = context.without_anonymous_contexts()
+        return context.fully_qualified_key if context.valid else None
+
+
+class SpoolReplayTask:
+    """
+    Sends the payloads in the events spool, oldest first, until the spool is empty, a request fails,
+    or the event processor is stopped. Each payload is only removed from the spool once it has been
+    delivered. Calls done_fn with True if the spool was emptied, or False otherwise.
+    """
+
+    def __init__(self, http, config, spool, response_fn, done_fn, stopping):
+        self._http = http
+        self._config = config
+        self._spool = spool
+        self._response_fn = response_fn
+        self._done_fn = done_fn
+        self._stopping = stopping
+
+    def run(self):
+        emptied = False
+        # noinspection PyBroadException
+        try:
+            emptied = self._replay()
+        except Exception:
+            log.warning('Unhandled exception in event processor. Spooled analytics events were not sent.', exc_info=True)
+        self._done_fn(emptied)
+
+    def _replay(self):
+        compress = self._config.enable_event_compression
+        while not self._stopping.is_set():
+            spooled = self._spool.peek()
+            if spooled is None:
+                return True
+            body = spooled.body
+            # The spool may have been written by a process that had compression set differently.
+            if spooled.compressed and not compress:
+                body = gzip.decompress(body)
+            elif compress and not spooled.compressed:
+                body = gzip.compress(body)
+            r = _post_events_with_retry(self._http, self._config, self._config.events_uri, spooled.payload_id, body, "spooled events", retry=False)
+            if r is None:
+                return False
+            self._response_fn(r)
+            if r.status > 299:
+                # A recoverable error status is retried later; an unrecoverable one disables the processor.
+                return False
+            self._spool.remove(spooled)
+        return False
+
+
 class DiagnosticEventSendTask:
     def __init__(self, http, config, event_body):
         self._http = http
@@ -92,16 +265,38 @@ class EventDispatcher(EventDispatcherBase):
         self._http = _http_factory(config).create_pool_manager(1, config.events_uri) if http_client is None else http_client
         self._close_http = http_client is None  # so we know whether to close it later
         self._disabled = False
-        self._outbox = EventBuffer(config.events_max_pending)
-        self._context_keys = SimpleLRUCache(config.context_keys_capacity)
+        self._outbox = EventBuffer(config.events_max_pending, config.events_flush_high_water_ratio, config.events_max_payload_size)
+        self._context_keys = make_context_keys_cache(config)
         self._formatter = EventOutputFormatter(config)
         self._last_known_past_time = 0
         self._deduplicated_contexts = 0
-        self._diagnostic_accumulator = None if config.diagnostic_opt_out else diagnostic_accumulator
+        self._aggregator = None  # type: Optional[EventAggregatorServer]
+        self._forward_to = None  # type: Optional[str]
+        self._forwarding_failed = False
+        if config.events_aggregator_socket is not None:
+            self._start_aggregation(config.events_aggregator_socket)
+        # Diagnostics are only sent by the process that delivers events to LaunchDarkly.
+        self._diagnostic_accumulator = None if config.diagnostic_opt_out or self._forward_to is not None else diagnostic_accumulator
         self._sampler = Sampler(Random())
         self._omit_anonymous_contexts = config.omit_anonymous_contexts
+        self._caller_summaries = ShardedEventSummarizer(config.events_summary_shards) if config.events_summary_shards > 0 else None
+        self._metrics = EventMetricsRecorder()
 
-        self._flush_workers = FixedThreadPool(__MAX_FLUSH_THREADS__, "ldclient.flush")
+        self._flush_workers = FixedThreadPool(__MAX_FLUSH_THREADS__, "ldclient.flush", self._flush_worker_done)
+        self._flush_limiter = FlushConcurrencyLimiter(self._flush_workers, __MAX_FLUSH_THREADS__)
+        self._spool = None
+        if config.events_spool_dir is not None:
+            try:
+                self._spool = EventSpool(config.events_spool_dir, config.events_spool_max_size)
+            except OSError as e:
+                log.error("Unable to use %s as the events spool directory; undeliverable events will be discarded [%s]", config.events_spool_dir, e)
+        self._spool_stopping = Event()
+        # Guards the spool replay state below, which flush workers change as well as this thread.
+        self._spool_lock = Lock()
+        self._spool_replaying = False
+        self._spool_base_retry_delay = RetryDelayStrategy.default(max_delay=__SPOOL_REPLAY_MAX_DELAY__, backoff_multiplier=2, jitter_multiplier=__SPOOL_REPLAY_JITTER_RATIO__)
+        self._spool_retry_delay = self._spool_base_retry_delay
+        self._spool_next_replay_time = 0.0
         self._diagnostic_flush_workers = None if self._diagnostic_accumulator is None else FixedThreadPool(1, "ldclient.events.diag_flush")
         if self._diagnostic_accumulator is not None:
             init_event = create_diagnostic_init(self._diagnostic_accumulator.data_since_date, self._diagnostic_accumulator.diagnostic_id, config)
@@ -119,8 +314,15 @@ class EventDispatcher(EventDispatcherBase):
                 message = self._inbox.get(block=True)
                 if message.type == 'event':
                     self._process_event(message.param)
+                    self._maybe_flush_early()
+                elif message.type == 'forwarded':
+                    self._add_forwarded_events(message.param)
+                    self._maybe_flush_early()
                 elif message.type == 'flush':
                     self._trigger_flush()
+                elif message.type == 'flush_deferred':
+                    if self._outbox.flush_deferred and self._flush_workers.has_capacity():
+                        self._trigger_flush()
                 elif message.type == 'flush_contexts':
                     self._context_keys.clear()
                 elif message.type == 'diagnostic':
@@ -137,30 +339,194 @@ class EventDispatcher(EventDispatcherBase):
             except Exception as e:
                 log.error('Unhandled exception in event processor', exc_info=True)
 
+    def summarize_on_caller_thread(self, event: EventInput) -> bool:
+        """
+        Called on the application thread that produced the event, rather than on the event processor
+        thread. If the event only needs to be counted in the summary, and we have already seen its
+        context, it is counted in a caller-side shard and True is returned; otherwise False is
+        returned and the event must be queued as usual.
+
+        The context keys cache is only read here, never written; a membership test on its dict is
+        atomic, and a stale answer just means that an index event is sent or skipped as if the
+        evaluation had happened slightly earlier or later.
+        """
+        if self._caller_summaries is None:
+            return False
+        if self._disabled:
+            return True
+        if not isinstance(event, EventInputEvaluation) or event.track_events or event.exclude_from_summaries:
+            return False
+        if event.flag is not None and event.flag.debug_events_until_date is not None:
+            return False
+        if not self._context_already_seen(event.context):
+            return False
+        self._caller_summaries.summarize_event(event)
+        return True
+
+    def summarize_evaluation_on_caller_thread(self, flag: FeatureFlag, context: Context, detail: EvaluationDetail, default_value: Any) -> bool:
+        """
+        Like summarize_on_caller_thread, but called before the evaluation event for an existing flag has
+        been created, with the values that EventFactory.new_eval_event would put in it; if True is
+        returned, the event does not need to be created at all.
+        """
+        if self._caller_summaries is None:
+            return False
+        if self._disabled:
+            return True
+        if flag.track_events or flag.exclude_from_summaries or flag.debug_events_until_date is not None:
+            return False
+        if EventFactory.is_experiment(flag, detail.reason):
+            return False
+        if not self._context_already_seen(context):
+            return False
+        self._caller_summaries.summarize(current_time_millis(), context, flag.key, flag.version, detail.variation_index, detail.value, default_value)
+        return True
+
+    def _context_already_seen(self, context: Context) -> bool:
+        if self._omit_anonymous_contexts:
+            context = context.without_anonymous_contexts()
+        return context.valid and context.fully_qualified_key in self._context_keys
+
+    def _drain_caller_summaries(self):
+        if self._caller_summaries is not None:
+            # every event summarized on a caller thread had a context we had already seen
+            count = self._outbox.drain_summaries(self._caller_summaries)
+            self._deduplicated_contexts += count
+            self._metrics.context_lookups += count
+            self._metrics.context_dedup_hits += count
+
+    def _start_aggregation(self, path):
+        if not aggregation_is_supported():
+            log.warning("Aggregating analytics events across processes is not supported on this platform; events_aggregator_socket is ignored")
+            return
+        try:
+            self._aggregator = EventAggregatorServer.claim(path, self._post_forwarded_batch)
+        except OSError as e:
+            log.error("Unable to use %s as the events aggregator socket; analytics events will be sent directly [%s]", path, e)
+            return
+        if self._aggregator is None:
+            self._forward_to = path
+            log.info("Forwarding analytics events to the process that aggregates them on %s", path)
+
+    def _post_forwarded_batch(self, batch) -> bool:
+        # Called on the aggregator's socket thread.
+        try:
+            self._inbox.put(EventProcessorMessage('forwarded', batch), block=False)
+            return True
+        except queue.Full:
+            return False
+
+    def _forward_status(self, error):
+        # Called on a flush worker thread. Only changes are logged, since every flush would fail alike.
+        if error is None:
+            if self._forwarding_failed:
+                log.info("Forwarding analytics events to the aggregating process again")
+            self._forwarding_failed = False
+        else:
+            if not self._forwarding_failed:
+                log.warning("Unable to forward analytics events to the aggregating process; sending them directly [%s]", error)
+            self._forwarding_failed = True
+
+    def _flush_worker_done(self):
+        # Called on a flush worker thread once it is free. A flush that was deferred because every worker
+        # was busy is retried now, rather than waiting for the next event or the flush interval.
+        if self._outbox.flush_deferred:
+            try:
+                self._inbox.put(EventProcessorMessage('flush_deferred', None), block=False)
+            except queue.Full:
+                pass  # the next event will retry it
+
+    def _maybe_flush_early(self):
+        if self._outbox.needs_early_flush() and self._flush_workers.has_capacity():
+            self._trigger_flush()
+
     def _trigger_flush(self):
         if self._disabled:
             return
+        self._drain_caller_summaries()
         payload = self._outbox.get_payload()
         if self._diagnostic_accumulator:
             self._diagnostic_accumulator.record_events_in_batch(len(payload.events))
         if len(payload.events) > 0 or not payload.summary.is_empty():
-            task = EventPayloadSendTask(self._http, self._config, self._formatter, payload, self._handle_response)
+            if self._spool is not None:
+                task = EventPayloadSendTask(self._http, self._config, self._formatter, payload, self._handle_delivery_response, self._flush_workers, self._spool_payload, self._record_delivery)
+            else:
+                task = EventPayloadSendTask(self._http, self._config, self._formatter, payload, self._handle_response, self._flush_workers, None, self._record_delivery)
+            if self._forward_to is not None:
+                task = EventForwardTask(self._forward_to, self._formatter, payload, self._omit_anonymous_contexts, task.run, self._forward_status)
             if self._flush_workers.execute(task.run):
                 # The events have been handed off to a flush worker; clear them from our buffer.
                 self._outbox.clear()
             else:
-                # We're already at our limit of concurrent flushes; leave the events in the buffer.
-                pass
+                # We're already at our limit of concurrent flushes; keep the events for the next flush.
+                self._outbox.defer_flush()
+                self._metrics.flush_worker_saturations += 1
+        self._maybe_replay_spool()
+
+    def _record_delivery(self, payload, delivery_seconds, r):
+        super()._record_delivery(payload, delivery_seconds, r)
+        self._flush_limiter.record_delivery(delivery_seconds, r is not None and r.status < 300)
+
+    def _handle_delivery_response(self, r):
+        self._handle_response(r)
+        if r.status < 300:
+            # Delivery has recovered, so start sending spooled payloads again at the next flush.
+            with self._spool_lock:
+                self._reset_spool_replay_delay()
+
+    def _spool_payload(self, payload_id, body):
+        # Called on a flush worker thread when a payload could not be delivered.
+        self._spool.append(payload_id, body, self._config.enable_event_compression)
+        self._back_off_spool_replay()
+
+    def _maybe_replay_spool(self):
+        if self._spool is None:
+            return
+        with self._spool_lock:
+            # The replay is claimed in the same step as the check, so that two replays never overlap.
+            if self._spool_replaying or time.time() < self._spool_next_replay_time:
+                return
+            self._spool_replaying = True
+        task = SpoolReplayTask(self._http, self._config, self._spool, self._handle_response, self._spool_replay_done, self._spool_stopping)
+        if not self._spool.has_pending() or not self._flush_workers.execute(task.run):
+            with self._spool_lock:
+                self._spool_replaying = False
+
+    def _spool_replay_done(self, emptied):
+        # Called on the flush worker thread that ran the replay task.
+        with self._spool_lock:
+            if emptied:
+                self._reset_spool_replay_delay()
+            else:
+                self._back_off_spool_replay_locked()
+            self._spool_replaying = False
+
+    def _back_off_spool_replay(self):
+        with self._spool_lock:
+            self._back_off_spool_replay_locked()
+
+    def _back_off_spool_replay_locked(self):
+        delay, self._spool_retry_delay = self._spool_retry_delay.apply(__SPOOL_REPLAY_INITIAL_DELAY__)
+        self._spool_next_replay_time = time.time() + delay
+
+    def _reset_spool_replay_delay(self):
+        self._spool_retry_delay = self._spool_base_retry_delay
+        self._spool_next_replay_time = 0.0
 
     def _send_and_reset_diagnostics(self):
         if self._diagnostic_accumulator is not None:
+            self._drain_caller_summaries()
             dropped_event_count = self._outbox.get_and_clear_dropped_count()
-            stats_event = self._diagnostic_accumulator.create_event_and_reset(dropped_event_count, self._deduplicated_contexts)
+            spool_stats = self._spool.get_and_clear_stats() if self._spool is not None else None
+            stats_event = self._diagnostic_accumulator.create_event_and_reset(dropped_event_count, self._deduplicated_contexts, spool_stats)
             self._deduplicated_contexts = 0
             task = DiagnosticEventSendTask(self._http, self._config, stats_event)
             self._diagnostic_flush_workers.execute(task.run)
 
     def _do_shutdown(self):
+        if self._aggregator is not None:
+            self._aggregator.close()
+        self._spool_stopping.set()
         self._flush_workers.stop()
         self._flush_workers.wait()
 
@@ -189,14 +555,43 @@ class DefaultEventProcessor(EventProcessor):
         self._close_lock = Lock()
         self._closed = False
 
-        (dispatcher_class or EventDispatcher)(self._inbox, config, http, diagnostic_accumulator)
+        dispatcher = (dispatcher_class or EventDispatcher)(self._inbox, config, http, diagnostic_accumulator)
+        # a substitute dispatcher used in tests does not keep metrics
+        self._dispatcher = dispatcher if isinstance(dispatcher, EventDispatcher) else None
+        if isinstance(dispatcher, EventDispatcher) and config.events_summary_shards > 0:
+            self._summarize_on_caller_thread = dispatcher.summarize_on_caller_thread
+            self._summarize_evaluation_on_caller_thread = dispatcher.summarize_evaluation_on_caller_thread
+        else:
+            self._summarize_on_caller_thread = None
+            self._summarize_evaluation_on_caller_thread = None
 
     def send_event(self, event: EventInput):
+        if self._summarize_on_caller_thread is not None and self._summarize_on_caller_thread(event):
+            return
         self._post_to_inbox(EventProcessorMessage('event', event))
 
+    def summarizes_evaluations(self) -> bool:
+        """
+        True if some evaluations can be counted by summarize_evaluation without creating their events.
+        """
+        return self._summarize_evaluation_on_caller_thread is not None
+
+    def summarize_evaluation(self, flag: FeatureFlag, context: Context, detail: EvaluationDetail, default_value: Any) -> bool:
+        """
+        Called by the client before it creates the event for an evaluation of an existing flag. If that
+        event would only be counted in the summary, it is counted and True is returned; otherwise False
+        is returned, and the event must be created and passed to send_event as usual.
+        """
+        return self._summarize_evaluation_on_caller_thread is not None and self._summarize_evaluation_on_caller_thread(flag, context, detail, default_value)
+
     def flush(self):
         self._post_to_inbox(EventProcessorMessage('flush', None))
 
+    def get_metrics(self) -> Optional[EventProcessorMetrics]:
+        if self._dispatcher is None:
+            return None
+        return self._dispatcher.get_metrics(self._inbox.qsize())
+
     def stop(self):
         with self._close_lock:
             if self._closed:
@@ -215,6 +610,8 @@ class DefaultEventProcessor(EventProcessor):
         try:
             self._inbox.put(message, block=False)
         except queue.Full:
+            if message.type == 'event' and self._dispatcher is not None:
+                self._dispatcher.record_inbox_full_drop()
             if not self._inbox_full:
                 # possible race condition here, but it's of no real consequence - we'd just get an extra log line
                 self._inbox_full = True
@@ -243,7 +640,7 @@ class DefaultEventProcessor(EventProcessor):
         self.stop()
 
 
-def _post_events_with_retry(http_client, config, uri, payload_id, body, events_description):
+def _post_events_with_retry(http_client, config, uri, payload_id, body, events_description, retry=True):
     hdrs = _headers(config)
     hdrs['Content-Type'] = 'application/json'
     if config.enable_event_compression:
@@ -252,9 +649,12 @@ def _post_events_with_retry(http_client, config, uri, payload_id, body, events_d
     if payload_id:
         hdrs['X-LaunchDarkly-Event-Schema'] = str(CURRENT_EVENT_SCHEMA)
         hdrs['X-LaunchDarkly-Payload-ID'] = payload_id
-    can_retry = True
+    can_retry = retry
     context = "posting %s" % events_description
-    data = gzip.compress(bytes(body, 'utf-8')) if config.enable_event_compression else body
+    data = body
+    # A bytes body has already been encoded by EventPayloadEncoder, which compresses it if necessary.
+    if config.enable_event_compression and isinstance(body, str):
+        data = gzip.compress(bytes(body, 'utf-8'))
     while True:
         next_action_message = "will retry" if can_retry else "some events were dropped"
         try:
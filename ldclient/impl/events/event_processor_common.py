@@ -5,15 +5,34 @@ These classes contain no I/O and are used by both the sync (event_processor.py)
 and async (async_event_processor.py) implementations.
 """
 
+import gzip
+import json
+import time
+import zlib
 from calendar import timegm
 from collections import namedtuple
 from email.utils import parsedate
-from typing import Any, Callable, Dict, List, Optional
+from threading import Lock
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Union
+)
 
 from ldclient.config import PrivateAttributesConfig
 from ldclient.context import Context
+from ldclient.impl.bloom_filter import RotatingBloomFilter
 from ldclient.impl.events.event_context_formatter import EventContextFormatter
-from ldclient.impl.events.event_summarizer import EventSummarizer, EventSummary
+from ldclient.impl.events.event_summarizer import (
+    EventSummarizer,
+    EventSummary,
+    ShardedEventSummarizer
+)
 from ldclient.impl.events.types import (
     EventInput,
     EventInputCustom,
@@ -28,6 +47,7 @@ from ldclient.impl.util import (
     log,
     timedelta_millis
 )
+from ldclient.interfaces import EventProcessorMetrics
 from ldclient.migrations.tracker import MigrationOpEvent
 
 # Analytics event schema version sent to LaunchDarkly via the X-LaunchDarkly-Event-Schema header.
@@ -49,22 +69,47 @@ class IndexEvent:
         self.context = context
 
 
+class ForwardedEvent:
+    """An event that another process has already put in its output format, and forwarded to this one."""
+
+    __slots__ = ['output']
+
+    def __init__(self, output: dict):
+        self.output = output
+
+
 FlushPayload = namedtuple('FlushPayload', ['events', 'summary'])
 
+# How much larger than its capacity the buffer may grow while its flush is deferred.
+_DEFERRED_CAPACITY_FACTOR = 2
+
 
 class EventBuffer:
-    """In-memory buffer that accumulates events and their summary until flush. Performs no I/O."""
+    """
+    In-memory buffer that accumulates events and their summary until flush. Performs no I/O.
 
-    def __init__(self, capacity: int):
+    If a high-water ratio is given, needs_early_flush reports when the buffer is that full, or when the
+    events in it would make a payload of about max_payload_size bytes, estimated from the payloads that
+    were recently sent. If a flush cannot be handed off, defer_flush lets the buffer keep accepting events
+    up to twice its capacity, so that they go out together in the next flush rather than being dropped.
+    """
+
+    def __init__(self, capacity: int, high_water_ratio: Optional[float] = None, max_payload_size: Optional[int] = None):
         self._capacity = capacity
         self._events: List[Any] = []
         self._summarizer = EventSummarizer()
         self._exceeded_capacity = False
         self._dropped_events = 0
+        self.total_dropped_events = 0  # unlike _dropped_events, never reset
+        self._high_water_count = None if high_water_ratio is None else max(1, int(capacity * high_water_ratio))
+        self._high_water_bytes = None if high_water_ratio is None else max_payload_size
+        self._bytes_per_event = 0.0
+        self._flush_deferred = False
 
     def add_event(self, event: Any):
-        if len(self._events) >= self._capacity:
+        if len(self._events) >= (self._capacity * _DEFERRED_CAPACITY_FACTOR if self._flush_deferred else self._capacity):
             self._dropped_events += 1
+            self.total_dropped_events += 1
             if not self._exceeded_capacity:
                 log.warning("Exceeded event queue capacity. Increase capacity to avoid dropping events.")
                 self._exceeded_capacity = True
@@ -75,17 +120,49 @@ class EventBuffer:
     def add_to_summary(self, event: EventInputEvaluation):
         self._summarizer.summarize_event(event)
 
+    def add_summary(self, summary: EventSummary):
+        self._summarizer.merge(summary)
+
+    def drain_summaries(self, sharded_summarizer: ShardedEventSummarizer) -> int:
+        return sharded_summarizer.drain_into(self._summarizer)
+
     def get_and_clear_dropped_count(self) -> int:
         count = self._dropped_events
         self._dropped_events = 0
         return count
 
+    @property
+    def summary_flag_count(self) -> int:
+        return self._summarizer.flag_count
+
+    def needs_early_flush(self) -> bool:
+        if self._high_water_count is None:
+            return False
+        count = len(self._events)
+        if self._flush_deferred or count >= self._high_water_count:
+            return True
+        # flush once another event would no longer fit in a single payload
+        return self._high_water_bytes is not None and (count + 1) * self._bytes_per_event > self._high_water_bytes
+
+    def record_payload_size(self, event_count: int, size: int):
+        """May be called from a flush worker; a stale estimate only makes an early flush a little early or late."""
+        if event_count > 0:
+            self._bytes_per_event = size / event_count
+
+    def defer_flush(self):
+        self._flush_deferred = True
+
+    @property
+    def flush_deferred(self) -> bool:
+        return self._flush_deferred
+
     def get_payload(self) -> FlushPayload:
         return FlushPayload(self._events, self._summarizer.snapshot())
 
     def clear(self):
         self._events = []
         self._summarizer.clear()
+        self._flush_deferred = False
 
 
 class EventOutputFormatter:
@@ -97,38 +174,48 @@ class EventOutputFormatter:
         )
 
     def make_output_events(self, events: List[Any], summary: EventSummary):
-        events_out = [self.make_output_event(e) for e in events]
+        return list(self.iter_output_events(events, summary))
+
+    def iter_output_events(self, events: List[Any], summary: EventSummary) -> Iterator[Any]:
+        """
+        Like make_output_events, but produces the output events one at a time as they are consumed.
+
+        Each distinct context is only formatted once per call; events for the same context share the
+        formatted output.
+        """
+        contexts = {}  # type: Dict[Any, Any]
+        for e in events:
+            yield self.make_output_event(e, contexts)
         if not summary.is_empty():
-            events_out.append(self.make_summary_event(summary))
-        return events_out
+            yield self.make_summary_event(summary)
 
-    def make_output_event(self, e: Any):
+    def make_output_event(self, e: Any, contexts: Optional[Dict[Any, Any]] = None):
         if isinstance(e, EventInputEvaluation):
             out = self._base_eval_props(e, 'feature')
-            out['context'] = self._process_context(e.context, True)
+            out['context'] = self._process_context(e.context, True, contexts)
             return out
         elif isinstance(e, DebugEvent):
             out = self._base_eval_props(e.original_input, 'debug')
-            out['context'] = self._process_context(e.original_input.context, False)
+            out['context'] = self._process_context(e.original_input.context, False, contexts)
             return out
         elif isinstance(e, EventInputIdentify):
             return {
                 'kind': 'identify',
                 'creationDate': e.timestamp,
-                'context': self._process_context(e.context, False),
+                'context': self._process_context(e.context, False, contexts),
             }
         elif isinstance(e, IndexEvent):
             return {
                 'kind': 'index',
                 'creationDate': e.timestamp,
-                'context': self._process_context(e.context, False),
+                'context': self._process_context(e.context, False, contexts),
             }
         elif isinstance(e, EventInputCustom):
             out = {
                 'kind': 'custom',
                 'creationDate': e.timestamp,
                 'key': e.key,
-                'context': self._process_context(e.context, True),
+                'context': self._process_context(e.context, True, contexts),
             }
             if e.data is not None:
                 out['data'] = e.data
@@ -140,7 +227,7 @@ class EventOutputFormatter:
                 'kind': 'migration_op',
                 'creationDate': e.timestamp,
                 'operation': e.operation.value,
-                'context': self._process_context(e.context, True),
+                'context': self._process_context(e.context, True, contexts),
                 'evaluation': {'key': e.key, 'value': e.detail.value},
             }
             if e.flag is not None:
@@ -169,29 +256,19 @@ class EventOutputFormatter:
             if measurements:
                 out["measurements"] = measurements
             return out
+        elif isinstance(e, ForwardedEvent):
+            return e.output
         return None
 
     def make_summary_event(self, summary: EventSummary):
         """Transform summarizer data into the format used for the event payload."""
         flags_out: Dict[str, Any] = {}
-        for key, flag_data in summary.flags.items():
-            flag_data_out = {
+        for key, flag_data in summary.flag_summaries.items():
+            flags_out[key] = {
                 'default': flag_data.default,
-                'contextKinds': list(flag_data.context_kinds),
+                'contextKinds': flag_data.context_kinds,
+                'counters': flag_data.output_counters(),
             }
-            counters = []
-            for ckey, cval in flag_data.counters.items():
-                variation, version = ckey
-                counter = {'count': cval.count, 'value': cval.value}
-                if variation is not None:
-                    counter['variation'] = variation
-                if version is None:
-                    counter['unknown'] = True
-                else:
-                    counter['version'] = version
-                counters.append(counter)
-            flag_data_out['counters'] = counters
-            flags_out[key] = flag_data_out
         return {
             'kind': 'summary',
             'startDate': summary.start_date,
@@ -199,10 +276,31 @@ class EventOutputFormatter:
             'features': flags_out,
         }
 
-    def _process_context(self, context: Context, redact_anonymous: bool):
+    @staticmethod
+    def parse_summary_event(out: dict) -> EventSummary:
+        """The reverse of make_summary_event."""
+        summarizer = EventSummarizer()
+        for key, flag_out in out['features'].items():
+            for counter in flag_out['counters']:
+                summarizer.add_counter(key, flag_out['contextKinds'], flag_out['default'], counter.get('variation'), counter.get('version'), counter['count'], counter['value'])
+        summarizer.start_date = out['startDate']
+        summarizer.end_date = out['endDate']
+        return summarizer.snapshot()
+
+    def _process_context(self, context: Context, redact_anonymous: bool, contexts: Optional[Dict[Any, Any]] = None):
+        if contexts is not None:
+            # Contexts with the same key usually have the same attributes, but that has to be checked.
+            cache_key = (context.fully_qualified_key, redact_anonymous)
+            cached = contexts.get(cache_key)
+            if cached is not None and (cached[0] is context or cached[0] == context):
+                return cached[1]
         if redact_anonymous:
-            return self._context_formatter.format_context_redact_anonymous(context)
-        return self._context_formatter.format_context(context)
+            out = self._context_formatter.format_context_redact_anonymous(context)
+        else:
+            out = self._context_formatter.format_context(context)
+        if contexts is not None:
+            contexts[cache_key] = (context, out)
+        return out
 
     def _context_keys(self, context: Context):
         out = {}
@@ -231,6 +329,138 @@ class EventOutputFormatter:
         return out
 
 
+# One request body produced by EventPayloadEncoder: the encoded bytes (gzip-compressed if compression is
+# enabled), the number of events in it, the size of its uncompressed JSON, and the time in seconds that
+# it took to produce.
+EncodedEventPayload = namedtuple('EncodedEventPayload', ['body', 'event_count', 'size', 'encode_time'])
+
+
+class _PayloadBuilder:
+    __slots__ = ['_compressor', '_chunks', 'size', 'event_count']
+
+    def __init__(self, compress: bool):
+        # wbits=31 selects the gzip container format, the same one that gzip.compress produces.
+        self._compressor = zlib.compressobj(wbits=31) if compress else None
+        self._chunks = []  # type: List[bytes]
+        self.size = 1
+        self.event_count = 0
+        self._write(b'[')
+
+    def add(self, encoded_event: bytes):
+        if self.event_count > 0:
+            self._write(b',')
+            self.size += 1
+        self._write(encoded_event)
+        self.size += len(encoded_event)
+        self.event_count += 1
+
+    def finish(self, encode_time: float) -> EncodedEventPayload:
+        self._write(b']')
+        if self._compressor is not None:
+            self._chunks.append(self._compressor.flush())
+        return EncodedEventPayload(b''.join(self._chunks), self.event_count, self.size + 1, encode_time)
+
+    def _write(self, data: bytes):
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+            if not data:
+                return
+        self._chunks.append(data)
+
+
+class EventPayloadEncoder:
+    """
+    Encodes output events as JSON array request bodies. Performs no I/O.
+
+    Each event is serialized separately and written straight into the body, through a gzip
+    compressor if compression is enabled, so the whole payload never exists as a single string.
+    If a maximum size is set, a new body is started whenever adding an event would make the
+    uncompressed JSON of the current one larger than that; an event that is too large by itself
+    is still sent, in a body of its own.
+    """
+
+    def __init__(self, compress: bool, max_size: Optional[int]):
+        self._compress = compress
+        self._max_size = max_size
+
+    def encode(self, output_events: Iterable[Any]) -> Iterator[EncodedEventPayload]:
+        # The time spent in the caller between payloads, which may include sending them, is not counted.
+        started = time.perf_counter()
+        builder = _PayloadBuilder(self._compress)
+        for event in output_events:
+            encoded = json.dumps(event, separators=(',', ':')).encode('utf-8')
+            # The 2 bytes are the comma before this event and the closing bracket.
+            if self._max_size is not None and builder.event_count > 0 and builder.size + len(encoded) + 2 > self._max_size:
+                yield builder.finish(time.perf_counter() - started)
+                started = time.perf_counter()
+                builder = _PayloadBuilder(self._compress)
+            builder.add(encoded)
+        if builder.event_count > 0:
+            yield builder.finish(time.perf_counter() - started)
+
+
+class EventMetricsRecorder:
+    """
+    Accumulates the totals reported in EventProcessorMetrics. Totals that application threads or flush
+    workers update are guarded by a lock; the others are only updated by the event processor's own
+    thread or task, and are read without one.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._inbox_full_drops = 0
+        self._payloads = 0
+        self._payload_bytes = 0
+        self._payload_bytes_sent = 0
+        self._encode_seconds = 0.0
+        self._delivery_seconds = 0.0
+        self.context_lookups = 0
+        self.context_dedup_hits = 0
+        self.flush_worker_saturations = 0
+
+    def record_inbox_full_drop(self):
+        with self._lock:
+            self._inbox_full_drops += 1
+
+    def record_payload(self, payload: EncodedEventPayload, delivery_seconds: float):
+        with self._lock:
+            self._payloads += 1
+            self._payload_bytes += payload.size
+            self._payload_bytes_sent += len(payload.body)
+            self._encode_seconds += payload.encode_time
+            self._delivery_seconds += delivery_seconds
+
+    def snapshot(self, inbox_depth: int, outbox: EventBuffer) -> EventProcessorMetrics:
+        with self._lock:
+            return EventProcessorMetrics(
+                inbox_depth=inbox_depth,
+                inbox_full_drops=self._inbox_full_drops,
+                buffer_full_drops=outbox.total_dropped_events,
+                context_lookups=self.context_lookups,
+                context_dedup_hits=self.context_dedup_hits,
+                summary_flag_count=outbox.summary_flag_count,
+                flush_worker_saturations=self.flush_worker_saturations,
+                payloads=self._payloads,
+                payload_bytes=self._payload_bytes,
+                payload_bytes_sent=self._payload_bytes_sent,
+                encode_seconds=self._encode_seconds,
+                delivery_seconds=self._delivery_seconds,
+            )
+
+
+def decode_event_payload_for_log(payload: EncodedEventPayload, compressed: bool) -> str:
+    """Returns the JSON text of an encoded payload; this is only meant to be used for debug logging."""
+    body = gzip.decompress(payload.body) if compressed else payload.body
+    return body.decode('utf-8')
+
+
+def make_context_keys_cache(config: Any) -> Union[SimpleLRUCache, RotatingBloomFilter]:
+    """Creates the set of recently seen context keys that an event dispatcher uses to skip index events."""
+    if config.context_keys_false_positive_rate is not None:
+        return RotatingBloomFilter(config.context_keys_capacity, config.context_keys_false_positive_rate)
+    return SimpleLRUCache(config.context_keys_capacity)
+
+
 class EventDispatcherBase:
     """
     Pure event-handling methods shared by the sync and async EventDispatcher
@@ -240,16 +470,30 @@ class EventDispatcherBase:
     setting the following attributes, which these methods rely on:
     ``_disabled``, ``_outbox`` (an :class:`EventBuffer`), ``_sampler``,
     ``_context_keys``, ``_last_known_past_time``, ``_omit_anonymous_contexts``,
-    and ``_deduplicated_contexts``.
+    ``_deduplicated_contexts``, and ``_metrics`` (an :class:`EventMetricsRecorder`).
     """
 
     _disabled: bool
     _outbox: EventBuffer
     _sampler: Sampler
-    _context_keys: SimpleLRUCache
+    _context_keys: Union[SimpleLRUCache, RotatingBloomFilter]
     _last_known_past_time: int
     _omit_anonymous_contexts: bool
     _deduplicated_contexts: int
+    _metrics: EventMetricsRecorder
+
+    def get_metrics(self, inbox_depth: int) -> EventProcessorMetrics:
+        """Called from any thread by the event processor that owns this dispatcher."""
+        return self._metrics.snapshot(inbox_depth, self._outbox)
+
+    def record_inbox_full_drop(self):
+        """Called from any thread by the event processor that owns this dispatcher."""
+        self._metrics.record_inbox_full_drop()
+
+    def _record_delivery(self, payload: EncodedEventPayload, delivery_seconds: float, response: Any):
+        """Called by a flush worker after each attempt to deliver a payload, whether or not it succeeded."""
+        self._metrics.record_payload(payload, delivery_seconds)
+        self._outbox.record_payload_size(payload.event_count, payload.size)
 
     def _process_event(self, event: EventInput):
         if self._disabled:
@@ -293,6 +537,24 @@ class EventDispatcherBase:
         if debug_event and self._sampler.sample(sampling_ratio):
             self._outbox.add_event(debug_event)
 
+    def _add_forwarded_events(self, batch: dict):
+        """Adds the events that another process forwarded to this one, as created by EventForwardTask."""
+        if self._disabled:
+            return
+        for context_key, out in batch['events']:
+            if context_key is not None:
+                already_seen = self._context_keys.put(context_key, True)
+                if out.get('kind') == 'index':
+                    # The other process only knows which contexts it has seen itself.
+                    self._metrics.context_lookups += 1
+                    if already_seen:
+                        self._deduplicated_contexts += 1
+                        self._metrics.context_dedup_hits += 1
+                        continue
+            self._outbox.add_event(ForwardedEvent(out))
+        if batch.get('summary') is not None:
+            self._outbox.add_summary(EventOutputFormatter.parse_summary_event(batch['summary']))
+
     def _get_indexable_context(self, event: EventInput, block: Callable[[Context], None]):
         if event.context is None:
             return
@@ -305,8 +567,10 @@ class EventDispatcherBase:
             return
 
         already_seen = self._context_keys.put(context.fully_qualified_key, True)
+        self._metrics.context_lookups += 1
         if already_seen:
             self._deduplicated_contexts += 1
+            self._metrics.context_dedup_hits += 1
             return
         elif isinstance(event, EventInputIdentify) or isinstance(event, MigrationOpEvent):
             return
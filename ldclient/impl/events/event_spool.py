@@ -0,0 +1,174 @@
+"""
+Implementation details of the optional on-disk spool for analytics event payloads.
+"""
+
+import os
+import struct
+import zlib
+from collections import namedtuple
+from threading import Lock
+from typing import List, Optional, Tuple
+
+from ldclient.impl.util import log
+
+# A payload read back from the spool: its payload ID, the encoded request body, and whether that body
+# is gzip-compressed. The segment and offset identify the record, so that it can be removed later.
+SpooledPayload = namedtuple('SpooledPayload', ['payload_id', 'body', 'compressed', 'segment', 'offset'])
+
+# Each record is this header (body length, CRC-32 of the body, flags, and the 36-character payload ID),
+# followed by the body.
+_RECORD_HEADER = struct.Struct('>IIB36s')
+_FLAG_COMPRESSED = 1
+
+_SEGMENT_SUFFIX = '.spool'
+_SEGMENTS_PER_SPOOL = 8
+_MIN_SEGMENT_SIZE = 64 * 1024
+
+
+class EventSpool:
+    """
+    A bounded, segmented, append-only log of event payloads that could not be delivered.
+
+    Payloads are appended to the newest segment file, and a new segment is started when that one
+    reaches its size limit. Payloads are read back oldest first; a segment file is deleted once
+    everything in it has been removed. If appending a payload would make the spool larger than its
+    maximum size, whole segments are discarded, oldest first, to make room.
+
+    The read position is only kept in memory, so after a restart the oldest segment is replayed from
+    its beginning. Payloads keep their original payload ID, which lets LaunchDarkly discard any that
+    it has already received. A record that was only partly written when the process exited fails its
+    checksum and is discarded along with the rest of its segment.
+    """
+
+    def __init__(self, directory: str, max_size: int):
+        self._directory = directory
+        self._max_size = max_size
+        self._segment_size = max(max_size // _SEGMENTS_PER_SPOOL, _MIN_SEGMENT_SIZE)
+        self._lock = Lock()
+        self._spooled_bytes = 0
+        self._dropped_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._segments = self._load_segments()  # type: List[Tuple[int, int]]
+        self._read_offset = 0
+        self._next_segment = self._segments[-1][0] + 1 if self._segments else 0
+        if self._segments:
+            log.info("Found %d bytes of undelivered analytics events in %s", self._total_size(), directory)
+
+    def append(self, payload_id: str, body: bytes, compressed: bool) -> bool:
+        """
+        Writes a payload to the end of the spool, and returns True if successful. Returns False if the
+        payload is larger than the whole spool, or if it could not be written.
+        """
+        record = _RECORD_HEADER.pack(len(body), zlib.crc32(body), _FLAG_COMPRESSED if compressed else 0, payload_id.encode('ascii')) + body
+        with self._lock:
+            if len(record) > self._max_size:
+                self._dropped_bytes += len(record)
+                log.warning("Analytics events payload of %d bytes is larger than the events spool; it was dropped", len(record))
+                return False
+            while self._segments and self._total_size() + len(record) > self._max_size:
+                self._drop_oldest_segment()
+            if not self._segments or self._segments[-1][1] >= self._segment_size:
+                self._segments.append((self._next_segment, 0))
+                self._next_segment += 1
+            seq, size = self._segments[-1]
+            try:
+                with open(self._segment_path(seq), 'ab') as f:
+                    f.write(record)
+                    f.flush()
+                    os.fsync(f.fileno())
+            except OSError as e:
+                self._discard_partial_write(seq, size)
+                self._dropped_bytes += len(record)
+                log.warning("Unable to write analytics events to the events spool; they were dropped [%s]", e)
+                return False
+            self._segments[-1] = (seq, size + len(record))
+            self._spooled_bytes += len(record)
+            return True
+
+    def peek(self) -> Optional[SpooledPayload]:
+        """Returns the oldest payload in the spool without removing it, or None if the spool is empty."""
+        with self._lock:
+            while self._segments:
+                seq, size = self._segments[0]
+                if self._read_offset < size:
+                    payload = self._read_record(seq, self._read_offset)
+                    if payload is not None:
+                        return payload
+                    log.warning("Discarding a damaged analytics events spool segment")
+                    self._dropped_bytes += size - self._read_offset
+                self._delete_oldest_segment()
+            return None
+
+    def remove(self, payload: SpooledPayload):
+        """Removes a payload that was returned by peek, once it has been delivered."""
+        with self._lock:
+            if not self._segments or self._segments[0][0] != payload.segment or self._read_offset != payload.offset:
+                # The segment was discarded to make room while the payload was being delivered.
+                return
+            self._read_offset += _RECORD_HEADER.size + len(payload.body)
+            if self._read_offset >= self._segments[0][1]:
+                self._delete_oldest_segment()
+
+    def has_pending(self) -> bool:
+        with self._lock:
+            return len(self._segments) > 0
+
+    def get_and_clear_stats(self) -> Tuple[int, int]:
+        """Returns the number of bytes written to the spool and the number dropped, and resets both."""
+        with self._lock:
+            stats = (self._spooled_bytes, self._dropped_bytes)
+            self._spooled_bytes = 0
+            self._dropped_bytes = 0
+            return stats
+
+    def _load_segments(self) -> List[Tuple[int, int]]:
+        segments = []
+        for name in os.listdir(self._directory):
+            if name.endswith(_SEGMENT_SUFFIX) and name[:-len(_SEGMENT_SUFFIX)].isdigit():
+                seq = int(name[:-len(_SEGMENT_SUFFIX)])
+                segments.append((seq, os.path.getsize(self._segment_path(seq))))
+        segments.sort()
+        return segments
+
+    def _read_record(self, seq: int, offset: int) -> Optional[SpooledPayload]:
+        try:
+            with open(self._segment_path(seq), 'rb') as f:
+                f.seek(offset)
+                header = f.read(_RECORD_HEADER.size)
+                if len(header) < _RECORD_HEADER.size:
+                    return None
+                length, crc, flags, payload_id = _RECORD_HEADER.unpack(header)
+                body = f.read(length)
+        except OSError as e:
+            log.warning("Unable to read the events spool [%s]", e)
+            return None
+        if len(body) < length or zlib.crc32(body) != crc:
+            return None
+        return SpooledPayload(payload_id.decode('ascii'), body, (flags & _FLAG_COMPRESSED) != 0, seq, offset)
+
+    def _drop_oldest_segment(self):
+        self._dropped_bytes += self._segments[0][1] - self._read_offset
+        log.warning("Events spool is full; discarding the oldest undelivered analytics events")
+        self._delete_oldest_segment()
+
+    def _delete_oldest_segment(self):
+        seq = self._segments.pop(0)[0]
+        self._read_offset = 0
+        try:
+            os.remove(self._segment_path(seq))
+        except OSError:
+            pass
+
+    def _discard_partial_write(self, seq: int, size: int):
+        # so that later records are not written after a fragment of this one
+        try:
+            if os.path.exists(self._segment_path(seq)):
+                os.truncate(self._segment_path(seq), size)
+        except OSError:
+            pass
+
+    def _total_size(self) -> int:
+        return sum(size for _, size in self._segments)
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self._directory, '%016d%s' % (seq, _SEGMENT_SUFFIX))
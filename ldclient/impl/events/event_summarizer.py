@@ -2,9 +2,12 @@
 Implementation details of the analytics event delivery component.
 """
 
+import itertools
 from collections import namedtuple
-from typing import Any, Dict, List, Optional, Set, Tuple
+from threading import Lock, local
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
+from ldclient.context import Context
 from ldclient.impl.events.types import EventInputEvaluation
 
 
@@ -37,62 +40,280 @@ class EventSummaryFlag:
         return "EventSummaryFlag(%s, %s, %s)" % (self.context_kinds, self.counters, self.default)
 
 
+# Context kinds are interned as bits, so that the kinds a flag was evaluated for are a single integer.
+# This is shared by every summarizer, so that their masks can be combined directly.
+_kind_bits = {}  # type: Dict[str, int]
+_kind_names = []  # type: List[str]
+_kind_lock = Lock()
+
+
+def _kind_bit(kind: str) -> int:
+    bit = _kind_bits.get(kind)
+    if bit is None:
+        with _kind_lock:
+            bit = _kind_bits.get(kind)
+            if bit is None:
+                bit = 1 << len(_kind_names)
+                _kind_names.append(kind)
+                _kind_bits[kind] = bit
+    return bit
+
+
+def _kinds_mask(context: Context) -> int:
+    if not context.multiple:
+        return _kind_bit(context.kind)
+    mask = 0
+    for i in range(context.individual_context_count):
+        c = context.get_individual_context(i)
+        if c is not None:
+            mask |= _kind_bit(c.kind)
+    return mask
+
+
+def _kinds_of_mask(mask: int) -> List[str]:
+    kinds = []
+    i = 0
+    while mask:
+        if mask & 1:
+            kinds.append(_kind_names[i])
+        mask >>= 1
+        i += 1
+    return kinds
+
+
+class _FlagSummary:
+    """
+    The counters for one flag. Nearly every evaluation of a flag during a flush interval sees the same
+    flag version, so the counters for that version are kept in lists indexed by variation index plus one
+    (with index zero for evaluations that produced no variation). Counters for any other version, after
+    the flag was changed, are kept in a dict.
+    """
+
+    __slots__ = ['kinds', 'default', 'version', 'counts', 'values', 'others']
+
+    def __init__(self, default: Any, version: Optional[int]):
+        self.kinds = 0
+        self.default = default
+        self.version = version
+        self.counts = []  # type: List[int]
+        self.values = []  # type: List[Any]
+        self.others = None  # type: Optional[Dict[Tuple[Optional[int], Optional[int]], EventSummaryCounter]]
+
+    def add(self, variation: Optional[int], version: Optional[int], count: int, value: Any):
+        if version != self.version:
+            if self.others is None:
+                self.others = {}
+            counter = self.others.get((variation, version))
+            if counter is None:
+                self.others[(variation, version)] = EventSummaryCounter(count, value)
+            else:
+                counter.count += count
+            return
+        index = 0 if variation is None else variation + 1
+        counts = self.counts
+        if index >= len(counts):
+            grow = index + 1 - len(counts)
+            counts.extend([0] * grow)
+            self.values.extend([None] * grow)
+        if counts[index] == 0:
+            self.values[index] = value
+        counts[index] += count
+
+    def merge(self, other: '_FlagSummary'):
+        self.kinds |= other.kinds
+        if other.version == self.version:
+            counts, values = self.counts, self.values
+            if len(other.counts) > len(counts):
+                grow = len(other.counts) - len(counts)
+                counts.extend([0] * grow)
+                values.extend([None] * grow)
+            for index, count in enumerate(other.counts):
+                if count > 0:
+                    if counts[index] == 0:
+                        values[index] = other.values[index]
+                    counts[index] += count
+        else:
+            for index, count in enumerate(other.counts):
+                if count > 0:
+                    self.add(None if index == 0 else index - 1, other.version, count, other.values[index])
+        if other.others is not None:
+            for (variation, version), counter in other.others.items():
+                self.add(variation, version, counter.count, counter.value)
+
+    def copy(self) -> '_FlagSummary':
+        flag = _FlagSummary(self.default, self.version)
+        flag.kinds = self.kinds
+        flag.counts = self.counts.copy()
+        flag.values = self.values.copy()
+        if self.others is not None:
+            flag.others = {k: EventSummaryCounter(c.count, c.value) for k, c in self.others.items()}
+        return flag
+
+    def counters(self) -> Iterator[Tuple[Optional[int], Optional[int], EventSummaryCounter]]:
+        for index, count in enumerate(self.counts):
+            if count > 0:
+                yield (None if index == 0 else index - 1), self.version, EventSummaryCounter(count, self.values[index])
+        if self.others is not None:
+            for (variation, version), counter in self.others.items():
+                yield variation, version, counter
+
+    def output_counters(self) -> List[Dict[str, Any]]:
+        """The counters in the format of the summary event's ``counters`` property."""
+        out = []
+        for variation, version, counter in self.counters():
+            c = {'count': counter.count, 'value': counter.value}  # type: Dict[str, Any]
+            if variation is not None:
+                c['variation'] = variation
+            if version is None:
+                c['unknown'] = True
+            else:
+                c['version'] = version
+            out.append(c)
+        return out
+
+    @property
+    def context_kinds(self) -> List[str]:
+        return _kinds_of_mask(self.kinds)
+
+
 class EventSummary:
-    __slots__ = ['start_date', 'end_date', 'flags']
+    __slots__ = ['start_date', 'end_date', 'flag_summaries']
 
-    def __init__(self, start_date: int, end_date: int, flags: Dict[str, EventSummaryFlag]):
+    def __init__(self, start_date: int, end_date: int, flag_summaries: Dict[str, _FlagSummary]):
         self.start_date = start_date
         self.end_date = end_date
-        self.flags = flags
+        self.flag_summaries = flag_summaries
 
     def is_empty(self) -> bool:
-        return len(self.flags) == 0
+        return len(self.flag_summaries) == 0
+
+    @property
+    def flags(self) -> Dict[str, EventSummaryFlag]:
+        """The counters in a less compact form that is easier to inspect; used in tests."""
+        return {
+            key: EventSummaryFlag(set(f.context_kinds), f.default, {(variation, version): c for variation, version, c in f.counters()})
+            for key, f in self.flag_summaries.items()
+        }
 
 
 class EventSummarizer:
     def __init__(self):
         self.start_date = 0
         self.end_date = 0
-        self.flags = dict()  # type: Dict[str, EventSummaryFlag]
+        self._flags = dict()  # type: Dict[str, _FlagSummary]
 
     """
     Add this event to our counters, if it is a type of event we need to count.
     """
 
     def summarize_event(self, event: EventInputEvaluation):
-        flag_data = self.flags.get(event.key)
-        if flag_data is None:
-            flag_data = EventSummaryFlag(set(), event.default_value, dict())
-            self.flags[event.key] = flag_data
-
-        context = event.context
-        for i in range(context.individual_context_count):
-            c = context.get_individual_context(i)
-            if c is not None:
-                flag_data.context_kinds.add(c.kind)
-
-        counter_key = (event.variation, None if event.flag is None else event.flag.version)
-        counter = flag_data.counters.get(counter_key)
-        if counter is None:
-            counter = EventSummaryCounter(1, event.value)
-            flag_data.counters[counter_key] = counter
-        else:
-            counter.count += 1
+        self.summarize(event.timestamp, event.context, event.key, None if event.flag is None else event.flag.version, event.variation, event.value, event.default_value)
 
-        date = event.timestamp
-        if self.start_date == 0 or date < self.start_date:
-            self.start_date = date
-        if date > self.end_date:
-            self.end_date = date
+    """
+    Add an evaluation to our counters, given the properties its event would have had.
+    """
+
+    def summarize(self, timestamp: int, context: Context, key: str, version: Optional[int], variation: Optional[int], value: Any, default_value: Any):
+        flag = self._flags.get(key)
+        if flag is None:
+            flag = _FlagSummary(default_value, version)
+            self._flags[key] = flag
+        flag.kinds |= _kinds_mask(context)
+        flag.add(variation, version, 1, value)
+
+        if self.start_date == 0 or timestamp < self.start_date:
+            self.start_date = timestamp
+        if timestamp > self.end_date:
+            self.end_date = timestamp
+
+    """
+    Add counters that were read back from a summary event; see EventOutputFormatter.parse_summary_event.
+    """
+
+    def add_counter(self, key: str, context_kinds: Iterable[str], default_value: Any, variation: Optional[int], version: Optional[int], count: int, value: Any):
+        flag = self._flags.get(key)
+        if flag is None:
+            flag = _FlagSummary(default_value, version)
+            self._flags[key] = flag
+        for kind in context_kinds:
+            flag.kinds |= _kind_bit(kind)
+        flag.add(variation, version, count, value)
+
+    @property
+    def flag_count(self) -> int:
+        return len(self._flags)
 
     """
     Return the current summarized event data.
     """
 
     def snapshot(self):
-        return EventSummary(start_date=self.start_date, end_date=self.end_date, flags=self.flags)
+        return EventSummary(start_date=self.start_date, end_date=self.end_date, flag_summaries=self._flags)
 
     def clear(self):
         self.start_date = 0
         self.end_date = 0
-        self.flags = dict()
+        self._flags = dict()
+
+    """
+    Add the counters from a snapshot of another summarizer to our counters.
+    """
+
+    def merge(self, summary: EventSummary):
+        for key, other in summary.flag_summaries.items():
+            flag = self._flags.get(key)
+            if flag is None:
+                self._flags[key] = other.copy()
+            else:
+                flag.merge(other)
+
+        if summary.start_date != 0 and (self.start_date == 0 or summary.start_date < self.start_date):
+            self.start_date = summary.start_date
+        if summary.end_date > self.end_date:
+            self.end_date = summary.end_date
+
+
+class ShardedEventSummarizer:
+    """
+    A set of summarizers that application threads can update concurrently. Each thread is assigned
+    one shard the first time it summarizes an event, and each shard has its own lock, so threads
+    rarely wait for each other. The event processor thread periodically drains every shard into
+    its own summarizer.
+    """
+
+    def __init__(self, shard_count: int):
+        self._locks = [Lock() for _ in range(shard_count)]
+        self._summarizers = [EventSummarizer() for _ in range(shard_count)]
+        self._counts = [0] * shard_count
+        self._next_shard = itertools.count()
+        self._thread_shard = local()
+
+    def summarize_event(self, event: EventInputEvaluation):
+        self.summarize(event.timestamp, event.context, event.key, None if event.flag is None else event.flag.version, event.variation, event.value, event.default_value)
+
+    def summarize(self, timestamp: int, context: Context, key: str, version: Optional[int], variation: Optional[int], value: Any, default_value: Any):
+        index = getattr(self._thread_shard, 'index', None)
+        if index is None:
+            index = next(self._next_shard) % len(self._locks)
+            self._thread_shard.index = index
+        with self._locks[index]:
+            self._summarizers[index].summarize(timestamp, context, key, version, variation, value, default_value)
+            self._counts[index] += 1
+
+    def drain_into(self, target: EventSummarizer) -> int:
+        """
+        Merges the counters from every shard into the target summarizer and resets the shards.
+
+        :return: the number of events that were summarized in the shards since they were last drained
+        """
+        total = 0
+        for index, lock in enumerate(self._locks):
+            with lock:
+                summarizer = self._summarizers[index]
+                count = self._counts[index]
+                self._summarizers[index] = EventSummarizer()
+                self._counts[index] = 0
+            if count > 0:
+                target.merge(summarizer.snapshot())
+                total += count
+        return total
@@ -143,10 +143,22 @@ class EventInputCustom(EventInput):
 
 class EventFactory:
     def __init__(
-        self, with_reasons: bool, timestamp_fn: Callable[[], int] = current_time_millis
+        self,
+        with_reasons: bool,
+        timestamp_fn: Callable[[], int] = current_time_millis,
+        enabled: bool = True,
     ):
         self._with_reasons = with_reasons
         self._timestamp_fn = timestamp_fn
+        self._enabled = enabled
+
+    @property
+    def enabled(self) -> bool:
+        """
+        False if the events this factory creates would be discarded, in which case callers should not
+        create evaluation events at all.
+        """
+        return self._enabled
 
     def new_eval_event(
         self,
@@ -6,13 +6,17 @@ from ldclient.impl.util import log
 
 class FixedThreadPool:
     """
-    A simple fixed-size thread pool that rejects jobs when its limit is reached.
+    A simple fixed-size thread pool that rejects jobs when its limit is reached. If job_done_fn is
+    given, it is called on the worker thread after each job, once the worker is free again.
     """
 
-    def __init__(self, size, name):
+    def __init__(self, size, name, job_done_fn=None):
         self._size = size
+        self._job_done_fn = job_done_fn
+        self._limit = size
         self._lock = Lock()
         self._busy_count = 0
+        self._stopped = False
         self._event = Event()
         self._job_queue = queue.Queue()
         for i in range(0, size):
@@ -23,17 +27,36 @@ class FixedThreadPool:
 
     """
     Schedules a job for execution if there is an available worker thread, and returns
-    true if successful; returns false if all threads are busy.
+    true if successful; returns false if all threads are busy or the pool has been stopped.
     """
 
     def execute(self, jobFn):
+        # The job is queued while holding the lock, so that it can never end up behind the
+        # stop messages; a job could be scheduled from another job while the pool is stopping.
         with self._lock:
-            if self._busy_count >= self._size:
+            if self._stopped or self._busy_count >= self._limit:
                 return False
             self._busy_count = self._busy_count + 1
-        self._job_queue.put(jobFn)
+            self._job_queue.put(jobFn)
         return True
 
+    """
+    Returns true if a job scheduled now would be accepted.
+    """
+
+    def has_capacity(self):
+        with self._lock:
+            return not self._stopped and self._busy_count < self._limit
+
+    """
+    Limits how many jobs may run at once, from 1 up to the number of threads. Jobs that are already
+    running are not affected.
+    """
+
+    def set_limit(self, limit):
+        with self._lock:
+            self._limit = max(1, min(limit, self._size))
+
     """
     Waits until all currently busy worker threads have completed their jobs.
     """
@@ -51,8 +74,10 @@ class FixedThreadPool:
     """
 
     def stop(self):
-        for i in range(0, self._size):
-            self._job_queue.put('stop')
+        with self._lock:
+            self._stopped = True
+            for i in range(0, self._size):
+                self._job_queue.put('stop')
 
     def _run_worker(self):
         while True:
@@ -66,3 +91,8 @@ class FixedThreadPool:
             with self._lock:
                 self._busy_count = self._busy_count - 1
                 self._event.set()
+            if self._job_done_fn is not None:
+                try:
+                    self._job_done_fn()
+                except Exception:
+                    log.warning('Unhandled exception in worker thread', exc_info=True)
@@ -0,0 +1,72 @@
+from types import MappingProxyType
+from typing import Any, Dict, Mapping
+
+from ldclient.impl.util import log
+from ldclient.versioned_data_kind import VersionedDataKind
+
+
+def _is_deleted(item: Any) -> bool:
+    return 'deleted' in item and item['deleted']
+
+
+_EMPTY_VIEW = MappingProxyType({})  # type: Mapping[str, Any]
+
+
+class InMemorySnapshot:
+    """
+    An immutable view of the data in an in-memory store. For each kind, ``items`` holds every item
+    including deletion placeholders, and ``live`` holds a read-only view of just the items that are
+    not deleted. Neither is modified after construction; updates produce a new snapshot.
+
+    The stores replace their reference to the current snapshot under a write lock, and read from
+    it without taking any lock.
+    """
+
+    __slots__ = ['items', 'live']
+
+    def __init__(self, items: Dict[VersionedDataKind, Dict[str, Any]], live: Dict[VersionedDataKind, Mapping[str, Any]]) -> None:
+        self.items = items
+        self.live = live
+
+    @staticmethod
+    def from_items(items: Dict[VersionedDataKind, Dict[str, Any]]) -> 'InMemorySnapshot':
+        live = {kind: MappingProxyType({k: i for k, i in items_of_kind.items() if not _is_deleted(i)}) for kind, items_of_kind in items.items()}  # type: Dict[VersionedDataKind, Mapping[str, Any]]
+        return InMemorySnapshot(items, live)
+
+    def with_items(self, changes: Dict[VersionedDataKind, Dict[str, Any]]) -> 'InMemorySnapshot':
+        """Returns a new snapshot with the given items added or replaced; only the affected kinds are copied."""
+        new_items = dict(self.items)
+        new_live = dict(self.live)
+        for kind, changed_items in changes.items():
+            items_of_kind = dict(self.items.get(kind, {}))
+            live_of_kind = dict(self.live.get(kind, _EMPTY_VIEW))
+            for key, item in changed_items.items():
+                items_of_kind[key] = item
+                if _is_deleted(item):
+                    live_of_kind.pop(key, None)
+                else:
+                    live_of_kind[key] = item
+            new_items[kind] = items_of_kind
+            new_live[kind] = MappingProxyType(live_of_kind)
+        return InMemorySnapshot(new_items, new_live)
+
+    def get(self, kind: VersionedDataKind, key: str) -> Any:
+        """Returns the live item, logging at debug level if it is missing or deleted."""
+        item = self.live.get(kind, _EMPTY_VIEW).get(key)
+        if item is None:
+            if key in self.items.get(kind, _EMPTY_VIEW):
+                log.debug("Attempted to get deleted key %s in '%s', returning None", key, kind.namespace)
+            else:
+                log.debug("Attempted to get missing key %s in '%s', returning None", key, kind.namespace)
+        return item
+
+    def get_including_deleted(self, kind: VersionedDataKind, key: str) -> Any:
+        """Returns the item or its deletion placeholder, or None if there is neither."""
+        return self.items.get(kind, _EMPTY_VIEW).get(key)
+
+    def all(self, kind: VersionedDataKind) -> Mapping[str, Any]:
+        """Returns a read-only view of the items of a kind that are not deleted."""
+        return self.live.get(kind, _EMPTY_VIEW)
+
+
+EMPTY_SNAPSHOT = InMemorySnapshot({}, {})
@@ -1,4 +1,5 @@
 import json
+import time
 
 from ldclient import log
 from ldclient.interfaces import FeatureStoreCore
@@ -93,6 +94,15 @@ class _DynamoDBFeatureStoreCore(FeatureStoreCore):
         resp = self._get_item_by_keys(self._namespace_for_kind(kind), key)
         return self._unmarshal_item(resp.get('Item'))
 
+    def get_many_internal(self, kind, keys):
+        namespace = self._namespace_for_kind(kind)
+        items_out = {}
+        for item in _DynamoDBHelpers.batch_get_items(self._client, self._table_name, [self._make_keys(namespace, key) for key in keys]):
+            item_out = self._unmarshal_item(item)
+            if item_out is not None:
+                items_out[item_out['key']] = item_out
+        return items_out
+
     def get_all_internal(self, kind):
         items_out = {}
         paginator = self._client.get_paginator('query')
@@ -182,3 +192,32 @@ class _DynamoDBHelpers:
         batch_size = 25
         for batch in (requests[i: i + batch_size] for i in range(0, len(requests), batch_size)):
             client.batch_write_item(RequestItems={table_name: batch})
+
+    # The number of times, and the delay before the first time, that batch_get_items retries the keys
+    # that DynamoDB left unprocessed; the delay doubles on each retry, up to the maximum.
+    UNPROCESSED_KEYS_MAX_RETRIES = 8
+    UNPROCESSED_KEYS_INITIAL_DELAY = 0.05
+    UNPROCESSED_KEYS_MAX_DELAY = 2.0
+
+    @staticmethod
+    def batch_get_items(client, table_name, keys):
+        # DynamoDB rejects a batch that contains the same key twice.
+        unique_keys = list({json.dumps(key, sort_keys=True): key for key in keys}.values())
+        batch_size = 100
+        items = []
+        for batch in (unique_keys[i: i + batch_size] for i in range(0, len(unique_keys), batch_size)):
+            request = {table_name: {'Keys': batch}}
+            retries = 0
+            # DynamoDB may leave some keys unprocessed if the response would be too large, or if the
+            # table is being throttled, in which case retrying right away would only be throttled too.
+            while True:
+                resp = client.batch_get_item(RequestItems=request)
+                items.extend(resp.get('Responses', {}).get(table_name, []))
+                request = resp.get('UnprocessedKeys')
+                if not request:
+                    break
+                if retries == _DynamoDBHelpers.UNPROCESSED_KEYS_MAX_RETRIES:
+                    raise Exception("DynamoDB left keys unprocessed after %d retries" % retries)
+                time.sleep(min(_DynamoDBHelpers.UNPROCESSED_KEYS_INITIAL_DELAY * (2 ** retries), _DynamoDBHelpers.UNPROCESSED_KEYS_MAX_DELAY))
+                retries += 1
+        return items
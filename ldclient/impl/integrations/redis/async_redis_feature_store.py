@@ -1,5 +1,6 @@
 import json
-from typing import Any, Callable, Dict, Mapping, Optional
+import uuid
+from typing import Any, Callable, Dict, List, Mapping, Optional
 
 from ldclient.feature_store_helpers import CachingStoreWrapper
 from ldclient.impl.util import log, redact_password
@@ -18,6 +19,14 @@ except ImportError:
 # Cap the WATCH-retry loop so a hot-contended key can't starve upsert_internal forever; matches the LaunchDarkly Go Redis stores.
 _MAX_UPSERT_RETRIES = 10
 
+# init_internal writes the data set in pipelines of at most this many commands, so that it is never
+# all buffered at once.
+_INIT_CHUNK_SIZE = 500
+
+# Staging hashes expire after this many seconds, so that they are not left behind if init_internal
+# fails before renaming them over the live hashes (the rename is followed by PERSIST).
+_STAGING_TTL = 3600
+
 
 class _AsyncRedisFeatureStoreCore(DiagnosticDescription, AsyncFeatureStoreCore):
     """Async Redis implementation of :class:`ldclient.interfaces.AsyncFeatureStoreCore`.
@@ -46,16 +55,33 @@ class _AsyncRedisFeatureStoreCore(DiagnosticDescription, AsyncFeatureStoreCore):
         return "{0}:{1}".format(self._prefix, kind.namespace)
 
     async def init_internal(self, all_data: Mapping[VersionedDataKind, Mapping[str, dict]]) -> None:
+        # Each kind is written to a staging hash in chunks, and the staging hashes then replace the
+        # live ones in a single transaction, so that readers never see a partial data set.
+        staging_suffix = ":$staging:" + uuid.uuid4().hex
         all_count = 0
-        async with self._client.pipeline() as pipe:
+
+        async with self._client.pipeline(transaction=True) as commit:
             for kind, items in all_data.items():
                 base_key = self._items_key(kind)
-                pipe.delete(base_key)
-                for key, item in items.items():
-                    pipe.hset(base_key, key, json.dumps(item))
+                if not items:
+                    # Redis doesn't store empty hashes, so there is nothing to rename.
+                    commit.delete(base_key)
+                    continue
+                staging_key = base_key + staging_suffix
+                async with self._client.pipeline(transaction=False) as pipe:
+                    for key, item in items.items():
+                        pipe.hset(staging_key, key, json.dumps(item))
+                        if len(pipe) >= _INIT_CHUNK_SIZE:
+                            pipe.expire(staging_key, _STAGING_TTL)
+                            await pipe.execute()
+                    pipe.expire(staging_key, _STAGING_TTL)
+                    await pipe.execute()
+                commit.rename(staging_key, base_key)
+                commit.persist(base_key)
                 all_count = all_count + len(items)
-            pipe.set(self._init_key, self._init_key)
-            await pipe.execute()
+
+            commit.set(self._init_key, self._init_key)
+            await commit.execute()
         log.info("Initialized AsyncRedisFeatureStore with %d items", all_count)
 
     async def get_all_internal(self, kind: VersionedDataKind) -> Mapping[str, dict]:
@@ -74,6 +100,14 @@ class _AsyncRedisFeatureStoreCore(DiagnosticDescription, AsyncFeatureStoreCore):
             return None
         return json.loads(item_json.decode('utf-8'))
 
+    async def get_many_internal(self, kind: VersionedDataKind, keys: List[str]) -> Mapping[str, dict]:
+        items_json = await self._client.hmget(self._items_key(kind), keys)
+        results = {}
+        for key, item_json in zip(keys, items_json):
+            if item_json:
+                results[key] = json.loads(item_json if isinstance(item_json, str) else item_json.decode('utf-8'))
+        return results
+
     async def upsert_internal(self, kind: VersionedDataKind, item: dict) -> dict:
         base_key = self._items_key(kind)
         key = item['key']
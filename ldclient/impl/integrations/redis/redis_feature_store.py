@@ -1,4 +1,5 @@
 import json
+import uuid
 from typing import Any, Dict
 
 from ldclient import log
@@ -18,6 +19,14 @@ except ImportError:
 # Cap the WATCH-retry loop so a hot-contended key can't starve upsert_internal forever; matches the LaunchDarkly Go Redis stores.
 _MAX_UPSERT_RETRIES = 10
 
+# init_internal writes the data set in pipelines of at most this many commands, so that it is never
+# all buffered at once.
+_INIT_CHUNK_SIZE = 500
+
+# Staging hashes expire after this many seconds, so that they are not left behind if init_internal
+# fails before renaming them over the live hashes (the rename is followed by PERSIST).
+_STAGING_TTL = 3600
+
 
 class _RedisFeatureStoreCore(DiagnosticDescription, FeatureStoreCore):
     def __init__(self, url, prefix, redis_opts: Dict[str, Any]):
@@ -40,20 +49,34 @@ class _RedisFeatureStoreCore(DiagnosticDescription, FeatureStoreCore):
         return "{0}:{1}".format(self._prefix, kind.namespace)
 
     def init_internal(self, all_data):
-        pipe = redis.Redis(connection_pool=self._pool).pipeline()
-
+        # Each kind is written to a staging hash in chunks, and the staging hashes then replace the
+        # live ones in a single transaction, so that readers never see a partial data set.
+        r = redis.Redis(connection_pool=self._pool)
+        staging_suffix = ":$staging:" + uuid.uuid4().hex
         all_count = 0
 
+        commit = r.pipeline(transaction=True)
         for kind, items in all_data.items():
             base_key = self._items_key(kind)
-            pipe.delete(base_key)
+            if not items:
+                # Redis doesn't store empty hashes, so there is nothing to rename.
+                commit.delete(base_key)
+                continue
+            staging_key = base_key + staging_suffix
+            pipe = r.pipeline(transaction=False)
             for key, item in items.items():
-                item_json = json.dumps(item)
-                pipe.hset(base_key, key, item_json)
+                pipe.hset(staging_key, key, json.dumps(item))
+                if len(pipe) >= _INIT_CHUNK_SIZE:
+                    pipe.expire(staging_key, _STAGING_TTL)
+                    pipe.execute()
+            pipe.expire(staging_key, _STAGING_TTL)
+            pipe.execute()
+            commit.rename(staging_key, base_key)
+            commit.persist(base_key)
             all_count = all_count + len(items)
 
-        pipe.set(self._init_key, self._init_key)
-        pipe.execute()
+        commit.set(self._init_key, self._init_key)
+        commit.execute()
         log.info("Initialized RedisFeatureStore with %d items", all_count)
 
     def get_all_internal(self, kind):
@@ -79,6 +102,11 @@ class _RedisFeatureStoreCore(DiagnosticDescription, FeatureStoreCore):
 
         return json.loads(item_json.decode('utf-8'))
 
+    def get_many_internal(self, kind, keys):
+        r = redis.Redis(connection_pool=self._pool)
+        items_json = r.hmget(self._items_key(kind), keys)
+        return {key: json.loads(item_json.decode('utf-8')) for key, item_json in zip(keys, items_json) if item_json}
+
     def upsert_internal(self, kind, item):
         r = redis.Redis(connection_pool=self._pool)
         base_key = self._items_key(kind)
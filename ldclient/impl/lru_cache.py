@@ -13,6 +13,9 @@ class SimpleLRUCache:
     def get(self, key):
         return self.cache.get(key)
 
+    def __contains__(self, key):
+        return key in self.cache
+
     '''
     Stores a value in the cache, evicting an old entry if necessary. Returns true if
     the item already existed, or false if it was newly added.
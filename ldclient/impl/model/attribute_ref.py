@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import re
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 
 def req_attr_ref_with_opt_context_kind(attr_ref_str: str, context_kind: Optional[str]) -> AttributeRef:
@@ -20,7 +20,7 @@ _INVALID_ATTR_ESCAPE_REGEX = re.compile('(~[^01]|~$)')
 
 
 class AttributeRef:
-    __slots__ = ['_raw', '_single_component', '_components', '_error']
+    __slots__ = ['_raw', '_single_component', '_components', '_error', '_path_components']
 
     _ERR_EMPTY = 'attribute reference cannot be empty'
 
@@ -29,6 +29,14 @@ class AttributeRef:
         self._single_component = single_component
         self._components = components
         self._error = error
+        # The full list of path components is computed once here so that the evaluator can walk it
+        # without going through __getitem__ and depth for every clause it checks.
+        if error is not None:
+            self._path_components = ()  # type: Tuple[str, ...]
+        elif components is not None:
+            self._path_components = tuple(components)
+        else:
+            self._path_components = (single_component,) if single_component is not None else ()
 
     @property
     def valid(self) -> bool:
@@ -50,6 +58,10 @@ class AttributeRef:
             return len(self._components)
         return 1
 
+    @property
+    def path_components(self) -> Tuple[str, ...]:
+        return self._path_components
+
     def __getitem__(self, index) -> Optional[str]:
         if self._error is not None:
             return None
@@ -1,14 +1,18 @@
+import re
 from re import Pattern
-from typing import Any, List, Optional
+from typing import Any, Callable, List, Optional, Set, Tuple, Union
 
 from semver import VersionInfo
 
+from ldclient.context import Context
+from ldclient.impl import operators
 from ldclient.impl.model.attribute_ref import (
     AttributeRef,
     req_attr_ref_with_opt_context_kind
 )
 from ldclient.impl.model.entity import *
 from ldclient.impl.model.value_parsing import (
+    is_number,
     parse_regex,
     parse_semver,
     parse_time
@@ -36,6 +40,124 @@ class ClausePreprocessedValue:
         return self._as_semver
 
 
+class ClauseValueIndex:
+    """
+    A hash index of the values of an "in" clause, so that matching a context value is a set
+    lookup rather than a comparison against every clause value.
+
+    Values are partitioned by JSON type, because a context value should only match a clause value
+    of the same type: in Python, True == 1 and hash(True) == hash(1), so booleans cannot share a
+    set with numbers. Numbers of different Python types (1 and 1.0) are equal and hash the same,
+    so they can share a set. Unhashable values such as arrays and objects are kept in a list and
+    compared one at a time, which is what the "in" operator would have done anyway.
+    """
+    __slots__ = ['_strings', '_numbers', '_bools', '_others']
+
+    def __init__(self, values: List[Any]):
+        self._strings = set()  # type: Set[str]
+        self._numbers = set()  # type: Set[Any]
+        self._bools = set()  # type: Set[bool]
+        self._others = []  # type: List[Any]
+        for value in values:
+            if isinstance(value, str):
+                self._strings.add(value)
+            elif isinstance(value, bool):
+                self._bools.add(value)
+            elif is_number(value):
+                self._numbers.add(value)
+            else:
+                self._others.append(value)
+
+    def matches(self, context_value: Any) -> bool:
+        if isinstance(context_value, str):
+            return context_value in self._strings
+        if isinstance(context_value, bool):
+            return context_value in self._bools
+        if is_number(context_value):
+            return context_value in self._numbers
+        for value in self._others:
+            if context_value == value:
+                return True
+        return False
+
+
+class ClauseStringMatcher:
+    """
+    Matches a context string against all of the values of a "startsWith", "endsWith", "contains"
+    or "matches" clause in a single call, instead of calling the operator once per clause value.
+
+    Non-string clause values can never match a string operator, so they are dropped here.
+    """
+    __slots__ = ['_strings', '_regexes', '_combined_regex', '_match_fn']
+
+    def __init__(self, op: str, values: List[Any], values_preprocessed: Optional[List[ClausePreprocessedValue]]):
+        self._strings = tuple(value for value in values if isinstance(value, str))  # type: Tuple[str, ...]
+        self._regexes = ()  # type: Tuple[Pattern, ...]
+        self._combined_regex = None  # type: Optional[Pattern]
+        if op == 'startsWith':
+            self._match_fn = self._starts_with
+        elif op == 'endsWith':
+            self._match_fn = self._ends_with
+        elif op == 'contains':
+            self._match_fn = self._contains
+        else:
+            self._regexes = tuple(p.as_regex for p in values_preprocessed or [] if p.as_regex is not None)
+            self._combined_regex = _combine_regexes(self._regexes)
+            self._match_fn = self._matches
+
+    def matches(self, context_value: Any) -> bool:
+        return isinstance(context_value, str) and self._match_fn(context_value)
+
+    def _starts_with(self, context_value: str) -> bool:
+        return context_value.startswith(self._strings)
+
+    def _ends_with(self, context_value: str) -> bool:
+        return context_value.endswith(self._strings)
+
+    def _contains(self, context_value: str) -> bool:
+        # A plain loop over the C-level substring search is faster in CPython than either a regex
+        # alternation of the escaped values or a pure-Python multi-pattern automaton.
+        for value in self._strings:
+            if value in context_value:
+                return True
+        return False
+
+    def _matches(self, context_value: str) -> bool:
+        if self._combined_regex is not None:
+            return self._combined_regex.search(context_value) is not None
+        for regex in self._regexes:
+            if regex.search(context_value) is not None:
+                return True
+        return False
+
+
+def _combine_regexes(regexes: Tuple[Pattern, ...]) -> Optional[Pattern]:
+    # A search for "(?:a)|(?:b)" finds a match exactly when a search for "a" or a search for "b"
+    # would. That only holds if the patterns do not depend on their own group numbering (capture
+    # groups, backreferences, conditionals) or on global inline flags such as "(?i)", which are not
+    # allowed anywhere but the start of a pattern; in those cases we keep the individual patterns.
+    if len(regexes) < 2:
+        return None
+    for regex in regexes:
+        if not isinstance(regex.pattern, str) or regex.groups != 0 or (regex.flags & ~re.UNICODE) != 0:
+            return None
+    try:
+        return re.compile('|'.join('(?:%s)' % regex.pattern for regex in regexes))
+    except Exception:
+        return None
+
+
+ClauseValuesMatcher = Union[ClauseValueIndex, ClauseStringMatcher]
+
+
+def _build_clause_values_matcher(op: str, values: List[Any], values_preprocessed: Optional[List[ClausePreprocessedValue]]) -> Optional[ClauseValuesMatcher]:
+    if op == 'in':
+        return ClauseValueIndex(values)
+    if op == 'startsWith' or op == 'endsWith' or op == 'contains' or op == 'matches':
+        return ClauseStringMatcher(op, values, values_preprocessed)
+    return None
+
+
 def _preprocess_clause_values(op: str, values: List[Any]) -> Optional[List[ClausePreprocessedValue]]:
     if op == 'matches':
         return list(ClausePreprocessedValue(as_regex=parse_regex(value)) for value in values)
@@ -47,7 +169,7 @@ def _preprocess_clause_values(op: str, values: List[Any]) -> Optional[List[Claus
 
 
 class Clause:
-    __slots__ = ['_context_kind', '_attribute', '_op', '_negate', '_values', '_values_preprocessed']
+    __slots__ = ['_context_kind', '_attribute', '_op', '_negate', '_values', '_values_preprocessed', '_values_matcher', '_match_context_kind', '_matches_kind_attribute', '_op_fn']
 
     def __init__(self, data: dict):
         self._context_kind = opt_str(data, 'contextKind')
@@ -56,6 +178,12 @@ class Clause:
         self._op = req_str(data, 'op')
         self._values = req_list(data, 'values')
         self._values_preprocessed = _preprocess_clause_values(self._op, self._values)
+        self._values_matcher = _build_clause_values_matcher(self._op, self._values, self._values_preprocessed)
+        # The following are derived once at decode time so the evaluator does not have to repeat
+        # these lookups every time the clause is checked.
+        self._match_context_kind = self._context_kind or Context.DEFAULT_KIND
+        self._matches_kind_attribute = self._attribute.path_components == ('kind',)
+        self._op_fn = operators.ops.get(self._op)  # type: Optional[Callable[[Any, Any, Optional[ClausePreprocessedValue]], bool]]
 
     @property
     def attribute(self) -> AttributeRef:
@@ -65,6 +193,14 @@ class Clause:
     def context_kind(self) -> Optional[str]:
         return self._context_kind
 
+    @property
+    def match_context_kind(self) -> str:
+        return self._match_context_kind
+
+    @property
+    def matches_kind_attribute(self) -> bool:
+        return self._matches_kind_attribute
+
     @property
     def negate(self) -> bool:
         return self._negate
@@ -73,6 +209,10 @@ class Clause:
     def op(self) -> str:
         return self._op
 
+    @property
+    def op_fn(self) -> Optional[Callable[[Any, Any, Optional[ClausePreprocessedValue]], bool]]:
+        return self._op_fn
+
     @property
     def values(self) -> List[Any]:
         return self._values
@@ -80,3 +220,7 @@ class Clause:
     @property
     def values_preprocessed(self) -> Optional[List[ClausePreprocessedValue]]:
         return self._values_preprocessed
+
+    @property
+    def values_matcher(self) -> Optional[ClauseValuesMatcher]:
+        return self._values_matcher
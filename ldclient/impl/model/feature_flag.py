@@ -1,5 +1,6 @@
-from typing import Any, Dict, List, Optional, Set, Union
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
+from ldclient.context import Context
 from ldclient.impl.model.clause import Clause
 from ldclient.impl.model.entity import *
 from ldclient.impl.model.variation_or_rollout import VariationOrRollout
@@ -22,10 +23,11 @@ class Prerequisite:
 
 
 class Target:
-    __slots__ = ['_context_kind', '_variation', '_values']
+    __slots__ = ['_context_kind', '_match_context_kind', '_variation', '_values']
 
     def __init__(self, data: dict):
         self._context_kind = opt_str(data, 'contextKind')
+        self._match_context_kind = self._context_kind or Context.DEFAULT_KIND
         self._variation = req_int(data, 'variation')
         self._values = set(req_str_list(data, 'values'))
 
@@ -33,6 +35,10 @@ class Target:
     def context_kind(self) -> Optional[str]:
         return self._context_kind
 
+    @property
+    def match_context_kind(self) -> str:
+        return self._match_context_kind
+
     @property
     def variation(self) -> int:
         return self._variation
@@ -42,6 +48,38 @@ class Target:
         return self._values
 
 
+def _build_target_index(targets: List[Target], context_targets: List[Target]) -> Dict[str, Dict[str, Tuple[int, int]]]:
+    # Maps each context kind to a dict of context key -> (target position, variation). The position
+    # lets a multi-kind context pick the same target that a sequential scan of the targets would have
+    # found first. For old-style data, only the user targets are present. Otherwise, a user-kind entry
+    # in the context targets is just a placeholder for the first user target with the same variation,
+    # which is where its keys are stored.
+    index = {}  # type: Dict[str, Dict[str, Tuple[int, int]]]
+    if len(context_targets) == 0:
+        user_index = {}  # type: Dict[str, Tuple[int, int]]
+        for position, t in enumerate(targets):
+            for key in t.values:
+                user_index.setdefault(key, (position, t.variation))
+        if user_index:
+            index[Context.DEFAULT_KIND] = user_index
+        return index
+    for position, t in enumerate(context_targets):
+        kind = t.match_context_kind
+        values = t.values  # type: Set[str]
+        if kind == Context.DEFAULT_KIND:
+            values = set()
+            for ut in targets:
+                if ut.variation == t.variation:
+                    values = ut.values
+                    break
+        if not values:
+            continue
+        kind_index = index.setdefault(kind, {})
+        for key in values:
+            kind_index.setdefault(key, (position, t.variation))
+    return index
+
+
 class FlagRule:
     __slots__ = ['_id', '_clauses', '_track_events', '_variation_or_rollout']
 
@@ -92,6 +130,7 @@ class FeatureFlag(ModelEntity):
         '_prerequisites',
         '_targets',
         '_context_targets',
+        '_target_index',
         '_rules',
         '_salt',
         '_track_events',
@@ -117,6 +156,7 @@ class FeatureFlag(ModelEntity):
         self._rules = list(FlagRule(item) for item in opt_dict_list(data, 'rules'))
         self._targets = list(Target(item) for item in opt_dict_list(data, 'targets'))
         self._context_targets = list(Target(item) for item in opt_dict_list(data, 'contextTargets'))
+        self._target_index = _build_target_index(self._targets, self._context_targets)
         self._salt = opt_str(data, 'salt') or ''
         self._track_events = opt_bool(data, 'trackEvents')
         self._track_events_fallthrough = opt_bool(data, 'trackEventsFallthrough')
@@ -169,6 +209,11 @@ class FeatureFlag(ModelEntity):
     def context_targets(self) -> List[Target]:
         return self._context_targets
 
+    @property
+    def target_index(self) -> Dict[str, Dict[str, Tuple[int, int]]]:
+        """For each context kind, the (target position, variation) of the first target matching each key."""
+        return self._target_index
+
     @property
     def rules(self) -> List[FlagRule]:
         return self._rules
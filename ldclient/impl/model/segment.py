@@ -1,5 +1,6 @@
 from typing import Any, List, Optional, Set
 
+from ldclient.context import Context
 from ldclient.impl.model.attribute_ref import (
     AttributeRef,
     opt_attr_ref_with_opt_context_kind
@@ -9,27 +10,33 @@ from ldclient.impl.model.entity import *
 
 
 class SegmentTarget:
-    __slots__ = ['_context_kind', '_values']
+    __slots__ = ['_context_kind', '_match_context_kind', '_values']
 
     def __init__(self, data: dict, logger=None):
         self._context_kind = opt_str(data, 'contextKind')
+        self._match_context_kind = self._context_kind or Context.DEFAULT_KIND
         self._values = set(req_str_list(data, 'values'))
 
     @property
     def context_kind(self) -> Optional[str]:
         return self._context_kind
 
+    @property
+    def match_context_kind(self) -> str:
+        return self._match_context_kind
+
     @property
     def values(self) -> Set[str]:
         return self._values
 
 
 class SegmentRule:
-    __slots__ = ['_bucket_by', '_clauses', '_rollout_context_kind', '_weight']
+    __slots__ = ['_bucket_by', '_clauses', '_rollout_context_kind', '_match_rollout_context_kind', '_weight']
 
     def __init__(self, data: dict):
         self._clauses = list(Clause(item) for item in req_dict_list(data, 'clauses'))
         self._rollout_context_kind = opt_str(data, 'rolloutContextKind')
+        self._match_rollout_context_kind = self._rollout_context_kind or Context.DEFAULT_KIND
         self._bucket_by = opt_attr_ref_with_opt_context_kind(opt_str(data, 'bucketBy'), self._rollout_context_kind)
         self._weight = opt_int(data, 'weight')
 
@@ -45,6 +52,10 @@ class SegmentRule:
     def rollout_context_kind(self) -> Optional[str]:
         return self._rollout_context_kind
 
+    @property
+    def match_rollout_context_kind(self) -> str:
+        return self._match_rollout_context_kind
+
     @property
     def weight(self) -> Optional[int]:
         return self._weight
@@ -64,6 +75,7 @@ class Segment(ModelEntity):
         '_salt',
         '_unbounded',
         '_unbounded_context_kind',
+        '_match_unbounded_context_kind',
         '_generation',
     ]
 
@@ -86,6 +98,7 @@ class Segment(ModelEntity):
         self._salt = opt_str(data, 'salt') or ''
         self._unbounded = opt_bool(data, 'unbounded')
         self._unbounded_context_kind = opt_str(data, 'unboundedContextKind')
+        self._match_unbounded_context_kind = self._unbounded_context_kind or Context.DEFAULT_KIND
         self._generation = opt_int(data, 'generation')
 
     @property
@@ -132,6 +145,10 @@ class Segment(ModelEntity):
     def unbounded_context_kind(self) -> Optional[str]:
         return self._unbounded_context_kind
 
+    @property
+    def match_unbounded_context_kind(self) -> str:
+        return self._match_unbounded_context_kind
+
     @property
     def generation(self) -> Optional[int]:
         return self._generation
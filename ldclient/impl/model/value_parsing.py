@@ -2,7 +2,7 @@ import re
 from datetime import datetime, timedelta, timezone, tzinfo
 from numbers import Number
 from re import Pattern
-from typing import Any, Optional
+from typing import Any, Dict, Optional
 
 import pyrfc3339
 from semver import VersionInfo
@@ -26,6 +26,18 @@ class _UTC(tzinfo):
 
 _epoch = datetime.fromtimestamp(0, timezone.utc)
 
+# Timestamps in this exact RFC3339 shape can be handed straight to datetime.fromisoformat; anything
+# else goes through pyrfc3339, so the fast path never accepts a value that pyrfc3339 would reject.
+_RFC3339_PATTERN = re.compile(r'^[0-9]{4}-[0-9]{2}-[0-9]{2}[Tt ][0-9]{2}:[0-9]{2}:[0-9]{2}(\.[0-9]+)?([Zz]|[+-][0-9]{2}:[0-9]{2})$')
+
+# Context attribute values compared with the time and semver operators tend to repeat, both across
+# the clauses of one evaluation and across contexts, so parsed strings are memoized by value. As
+# with the bucketing memo in evaluator_common, these are plain dicts that are cleared when full.
+_PARSED_VALUE_CACHE_CAPACITY = 10000
+_parsed_time_cache = {}  # type: Dict[str, Optional[float]]
+_parsed_semver_cache = {}  # type: Dict[str, Optional[VersionInfo]]
+_MISSING = object()
+
 
 def is_number(input: Any) -> bool:
     # bool is a subtype of int, and we don't want to try and treat it as a number.
@@ -51,19 +63,47 @@ def parse_time(input: Any) -> Optional[float]:
         return float(input)
 
     if isinstance(input, str):
-        try:
-            parsed_time = pyrfc3339.parse(input)
-            timestamp = (parsed_time - _epoch).total_seconds()
-            return timestamp * 1000.0
-        except Exception as e:
-            return None
+        result = _parsed_time_cache.get(input, _MISSING)
+        if result is _MISSING:
+            result = _parse_time_string(input)
+            if len(_parsed_time_cache) >= _PARSED_VALUE_CACHE_CAPACITY:
+                _parsed_time_cache.clear()
+            _parsed_time_cache[input] = result
+        return result  # type: ignore[return-value]
 
     return None
 
 
+def _parse_time_string(input: str) -> Optional[float]:
+    parsed_time = None
+    if _RFC3339_PATTERN.match(input) is not None:
+        try:
+            parsed_time = datetime.fromisoformat(input[:-1] + '+00:00' if input[-1] in 'Zz' else input)
+        except ValueError:
+            # older Python versions only accept some fractional second lengths
+            pass
+    try:
+        if parsed_time is None:
+            parsed_time = pyrfc3339.parse(input)
+        timestamp = (parsed_time - _epoch).total_seconds()
+        return timestamp * 1000.0
+    except Exception as e:
+        return None
+
+
 def parse_semver(input: Any) -> Optional[VersionInfo]:
     if not isinstance(input, str):
         return None
+    result = _parsed_semver_cache.get(input, _MISSING)
+    if result is _MISSING:
+        result = _parse_semver_string(input)
+        if len(_parsed_semver_cache) >= _PARSED_VALUE_CACHE_CAPACITY:
+            _parsed_semver_cache.clear()
+        _parsed_semver_cache[input] = result
+    return result  # type: ignore[return-value]
+
+
+def _parse_semver_string(input: str) -> Optional[VersionInfo]:
     try:
         return VersionInfo.parse(input)
     except TypeError:
@@ -1,5 +1,6 @@
 from typing import List, Optional
 
+from ldclient.context import Context
 from ldclient.impl.model.attribute_ref import (
     AttributeRef,
     opt_attr_ref_with_opt_context_kind
@@ -29,10 +30,11 @@ class WeightedVariation:
 
 
 class Rollout:
-    __slots__ = ['_bucket_by', '_context_kind', '_is_experiment', '_seed', '_variations']
+    __slots__ = ['_bucket_by', '_context_kind', '_match_context_kind', '_is_experiment', '_seed', '_variations']
 
     def __init__(self, data: dict):
         self._context_kind = opt_str(data, 'contextKind')
+        self._match_context_kind = self._context_kind or Context.DEFAULT_KIND
         self._bucket_by = opt_attr_ref_with_opt_context_kind(opt_str(data, 'bucketBy'), self._context_kind)
         self._is_experiment = opt_str(data, 'kind') == 'experiment'
         self._seed = opt_int(data, 'seed')
@@ -46,6 +48,10 @@ class Rollout:
     def context_kind(self) -> Optional[str]:
         return self._context_kind
 
+    @property
+    def match_context_kind(self) -> str:
+        return self._match_context_kind
+
     @property
     def is_experiment(self) -> bool:
         return self._is_experiment
@@ -1,16 +1,22 @@
+from __future__ import annotations
+
 from collections import defaultdict
 from numbers import Number
-from typing import Any, Callable, Optional
+from typing import TYPE_CHECKING, Any, Callable, Optional
 
 from semver import VersionInfo
 
-from ldclient.impl.model.clause import ClausePreprocessedValue
 from ldclient.impl.model.value_parsing import (
     is_number,
     parse_semver,
     parse_time
 )
 
+if TYPE_CHECKING:
+    # Clause binds its operator function from this module at decode time, so this import is only
+    # needed for type checking; importing it at runtime would be circular.
+    from ldclient.impl.model.clause import ClausePreprocessedValue
+
 
 def _string_operator(context_value: Any, clause_value: Any, fn: Callable[[str, str], bool]) -> bool:
     return isinstance(context_value, str) and isinstance(clause_value, str) and fn(context_value, clause_value)
@@ -303,6 +303,26 @@ class FeatureStoreCore(ABC):
     #     :return: true if the underlying data store is reachable
     #     """
 
+    # WARN: This isn't a required method on a FeatureStoreCore. The SDK will
+    # check if the provided store responds to this method, and if it does,
+    # will use it instead of calling get_internal once for each key.
+    #
+    # @abstractmethod
+    # def get_many_internal(self, kind: VersionedDataKind, keys: List[str]) -> Mapping[str, dict]:
+    #     """
+    #     Returns the objects to which the specified keys are mapped, reading them
+    #     all in as few operations on the database as it supports. As with
+    #     get_internal, items should not be filtered by their deleted property.
+    #
+    #     ``CachingStoreWrapper`` uses this to load a flag's prerequisites and
+    #     segments together with the flag, rather than one at a time.
+    #
+    #     :param kind: The kind of objects to get
+    #     :param keys: The keys of the objects
+    #     :return: A dictionary of keys to items; a key that does not exist may be
+    #       omitted or mapped to None
+    #     """
+
 
 class AsyncReadOnlyStore(Protocol):
     """Read-only async view of a data store used by the async client's evaluation path.
@@ -498,9 +518,11 @@ class AsyncFeatureStoreCore(ABC):
         """
         ...
 
-    # An implementation may also define ``async def is_available(self) -> bool`` and
-    # ``async def close(self) -> None``. The wrapper detects and uses them if present, so they are
-    # not declared here as required methods.
+    # An implementation may also define ``async def is_available(self) -> bool``,
+    # ``async def close(self) -> None`` and
+    # ``async def get_many_internal(self, kind, keys) -> Mapping[str, dict]`` (see
+    # :class:`FeatureStoreCore`). The wrapper detects and uses them if present, so they are not
+    # declared here as required methods.
 
 
 # Internal use only. Common methods for components that perform a task in the background.
@@ -571,6 +593,60 @@ class AsyncUpdateProcessor(ABC):
         """
 
 
+@dataclass(frozen=True)
+class EventProcessorMetrics:
+    """
+    A snapshot of the internal state of the default event processor, returned by
+    :func:`ldclient.client.LDClient.get_event_metrics()`. These numbers can help with choosing
+    ``events_max_pending`` and ``flush_interval``.
+
+    ``inbox_depth`` and ``summary_flag_count`` describe the moment the snapshot was taken. All other
+    values are totals since the event processor started, so they only ever increase; to get a rate,
+    compare two snapshots.
+    """
+
+    inbox_depth: int = 0
+    """The number of messages waiting to be picked up by the event processor."""
+
+    inbox_full_drops: int = 0
+    """The number of events dropped because the event processor's inbox was full."""
+
+    buffer_full_drops: int = 0
+    """The number of events dropped because ``events_max_pending`` events were already waiting to be flushed."""
+
+    context_lookups: int = 0
+    """The number of times the event processor checked whether it had recently seen an event's context."""
+
+    context_dedup_hits: int = 0
+    """How many of those checks found the context, so that no index event was needed."""
+
+    summary_flag_count: int = 0
+    """The number of distinct flags in the summary that will be sent with the next flush."""
+
+    flush_worker_saturations: int = 0
+    """The number of flushes that were put off because every flush worker was busy."""
+
+    payloads: int = 0
+    """The number of event payloads that delivery was attempted for."""
+
+    payload_bytes: int = 0
+    """The total size of those payloads as uncompressed JSON."""
+
+    payload_bytes_sent: int = 0
+    """The total size of those payloads as sent, which is smaller if event compression is enabled."""
+
+    encode_seconds: float = 0.0
+    """The total time spent serializing and compressing payloads."""
+
+    delivery_seconds: float = 0.0
+    """The total time spent sending payloads to LaunchDarkly, including any retries."""
+
+    @property
+    def context_dedup_hit_rate(self) -> float:
+        """The fraction of context checks that found the context, or zero if there were none."""
+        return self.context_dedup_hits / self.context_lookups if self.context_lookups > 0 else 0.0
+
+
 class EventProcessor(ABC):
     """
     Interface for the component that buffers analytics events and sends them to LaunchDarkly.
@@ -598,6 +674,13 @@ class EventProcessor(ABC):
         Shuts down the event processor after first delivering all pending events.
         """
 
+    def get_metrics(self) -> Optional[EventProcessorMetrics]:
+        """
+        Returns a snapshot of the event processor's internal metrics, or None if it does not
+        provide any. The default implementation returns None.
+        """
+        return None
+
 
 class AsyncEventProcessor(ABC):
     """
@@ -639,6 +722,13 @@ class AsyncEventProcessor(ABC):
         Shuts down the event processor after first delivering all pending events.
         """
 
+    def get_metrics(self) -> Optional[EventProcessorMetrics]:
+        """
+        Returns a snapshot of the event processor's internal metrics, or None if it does not
+        provide any. The default implementation returns None.
+        """
+        return None
+
 
 class FeatureRequester(ABC):
     """
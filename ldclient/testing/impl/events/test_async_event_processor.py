@@ -481,6 +481,37 @@ async def test_does_not_block_on_full_inbox():
     assert had_no_more
 
 
+async def test_metrics_describe_delivered_payloads_and_deduplicated_contexts():
+    mock_http = MockAioHttp()
+    async with make_processor(mock_http, enable_event_compression=True) as ep:
+        ep.send_event(EventInputCustom(timestamp, context, 'event1', None, None))
+        ep.send_event(EventInputCustom(timestamp, context, 'event2', None, None))
+        ep.flush()
+        await ep._wait_until_inactive()
+
+        metrics = ep.get_metrics()
+        assert metrics.payloads == 1
+        assert metrics.payload_bytes_sent == len(mock_http.request_data)
+        assert metrics.payload_bytes == len(gzip.decompress(mock_http.request_data))
+        assert metrics.context_lookups == 2
+        assert metrics.context_dedup_hits == 1
+        assert metrics.inbox_full_drops == 0
+        assert metrics.buffer_full_drops == 0
+
+
+async def test_buffer_is_flushed_without_waiting_when_it_reaches_high_water_mark():
+    mock_http = MockAioHttp()
+    async with make_processor(mock_http, events_max_pending=4, events_flush_high_water_ratio=0.5) as ep:
+        ep.send_event(EventInputIdentify(timestamp, context))
+        await ep._wait_until_inactive()
+        assert mock_http.request_data is None
+
+        ep.send_event(EventInputIdentify(timestamp, context))
+        await ep._wait_until_inactive()
+        output = json.loads(mock_http.request_data)
+        assert len(output) == 2
+
+
 async def test_event_payload_is_gzip_compressed_when_enabled():
     mock_http = MockAioHttp()
     async with make_processor(mock_http, enable_event_compression=True) as ep:
@@ -494,6 +525,24 @@ async def test_event_payload_is_gzip_compressed_when_enabled():
         assert output[0]['kind'] == 'identify'
 
 
+async def test_large_flush_is_split_into_requests_no_larger_than_max_payload_size():
+    mock_http = MockAioHttp()
+    contexts = [Context.create('user-%d' % i) for i in range(50)]
+    async with make_processor(mock_http, events_max_payload_size=1000, enable_event_compression=True) as ep:
+        for c in contexts:
+            ep.send_event(EventInputIdentify(timestamp, c))
+        ep.flush()
+        await ep._wait_until_inactive()
+
+        keys = []
+        for headers, body in mock_http.recorded_requests:
+            data = gzip.decompress(body)
+            assert len(data) <= 1000
+            keys.extend(e['context']['key'] for e in json.loads(data))
+        assert len(mock_http.recorded_requests) > 1
+        assert sorted(keys) == sorted(c.key for c in contexts)
+
+
 async def test_flush_and_wait_completes_when_in_flight_posts_finish_together():
     # Regression test for a livelock: when all in-flight flush POSTs finish and
     # the flush_and_wait message arrives in the same event-loop batch, the
@@ -519,7 +568,7 @@ async def test_flush_and_wait_completes_when_in_flight_posts_finish_together():
 
             return _Ctx()
 
-    # DefaultAsyncEventProcessor discards the dispatcher, so capture it here to
+    # DefaultAsyncEventProcessor keeps the dispatcher private, so capture it here to
     # let the watchdog recover the loop if it wedges.
     dispatcher_holder = []
 
@@ -159,3 +159,8 @@ def test_diagnostic_accumulator():
     del reset_diag_event['dataSinceDate']
     del def_diag_event['dataSinceDate']
     assert reset_diag_event == def_diag_event
+
+    spool_diag_event = diag_accum.create_event_and_reset(0, 0, (1000, 200))
+    assert len(spool_diag_event) == 10
+    assert spool_diag_event['spooledEventBytes'] == 1000
+    assert spool_diag_event['droppedSpooledEventBytes'] == 200
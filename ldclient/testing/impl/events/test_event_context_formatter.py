@@ -61,3 +61,12 @@ def test_private_property_in_object():
     f = EventContextFormatter(False, ['/b/prop1', '/c/prop2/sub1'])
     c = Context.builder('a').set('b', {'prop1': True, 'prop2': 3}).set('c', {'prop1': {'sub1': True}, 'prop2': {'sub1': 4, 'sub2': 5}}).build()
     assert f.format_context(c) == {'kind': 'user', 'key': 'a', 'b': {'prop2': 3}, 'c': {'prop1': {'sub1': True}, 'prop2': {'sub2': 5}}, '_meta': {'redactedAttributes': ['/b/prop1', '/c/prop2/sub1']}}
+
+
+def test_per_context_private_attributes_do_not_affect_other_contexts():
+    f = EventContextFormatter(False, ['name'])
+    c1 = Context.builder('a').name('b').set('c', True).set('d', {'e': 1, 'f': 2}).private('c', '/d/e').build()
+    c2 = Context.builder('a').name('b').set('c', True).set('d', {'e': 1, 'f': 2}).build()
+    for _ in range(2):
+        assert f.format_context(c1) == {'kind': 'user', 'key': 'a', 'd': {'f': 2}, '_meta': {'redactedAttributes': ['name', 'c', '/d/e']}}
+        assert f.format_context(c2) == {'kind': 'user', 'key': 'a', 'c': True, 'd': {'e': 1, 'f': 2}, '_meta': {'redactedAttributes': ['name']}}
@@ -1,8 +1,12 @@
+import gzip
 import json
+import os
+import socket
+import tempfile
 import time
 import uuid
 from datetime import timedelta
-from threading import Thread
+from threading import Event, Thread
 from typing import Dict, Set
 
 import pytest
@@ -15,19 +19,30 @@ from ldclient.impl.events.diagnostics import (
     create_diagnostic_id
 )
 from ldclient.impl.events.event_context_formatter import EventContextFormatter
-from ldclient.impl.events.event_processor import DefaultEventProcessor
+from ldclient.impl.events.event_processor import (
+    DefaultEventProcessor,
+    FlushConcurrencyLimiter
+)
+from ldclient.impl.events.event_processor_common import (
+    EventBuffer,
+    EventOutputFormatter,
+    EventPayloadEncoder
+)
+from ldclient.impl.events.event_summarizer import EventSummarizer
 from ldclient.impl.events.types import (
     EventInput,
     EventInputCustom,
     EventInputEvaluation,
     EventInputIdentify
 )
+from ldclient.impl.fixed_thread_pool import FixedThreadPool
 from ldclient.impl.util import timedelta_millis
 from ldclient.migrations.tracker import MigrationOpEvent
 from ldclient.migrations.types import Operation, Origin, Stage
 from ldclient.testing.builders import *
 from ldclient.testing.proxy_test_util import do_proxy_tests
-from ldclient.testing.stub_util import MockHttp
+from ldclient.testing.stub_util import MockHttp, MockResponse
+from ldclient.testing.sync_util import wait_until
 
 default_config = Config("fake_sdk_key")
 context = Context.builder('userkey').name('Red').build()
@@ -401,6 +416,20 @@ def test_new_index_event_is_added_if_context_cache_has_been_cleared():
         check_summary_event(output[4])
 
 
+def test_probabilistic_context_key_filter_produces_one_index_event_until_cleared():
+    with DefaultTestProcessor(context_keys_false_positive_rate=0.001, context_keys_flush_interval=0.1) as ep:
+        e0 = EventInputEvaluation(timestamp, context, flag.key, flag, 1, 'value1', None, 'default', None, True)
+        e1 = EventInputEvaluation(timestamp, context, flag.key, flag, 2, 'value2', None, 'default', None, True)
+        e2 = EventInputEvaluation(timestamp, context, flag.key, flag, 1, 'value1', None, 'default', None, True)
+        ep.send_event(e0)
+        ep.send_event(e1)
+        time.sleep(0.2)
+        ep.send_event(e2)
+
+        output = flush_and_get_events(ep)
+        assert [o['kind'] for o in output] == ['index', 'feature', 'feature', 'index', 'feature', 'summary']
+
+
 def test_event_kind_is_debug_if_flag_is_temporarily_in_debug_mode():
     with DefaultTestProcessor() as ep:
         future_time = now() + 100000
@@ -539,6 +568,85 @@ def test_nontracked_events_are_summarized():
         }
 
 
+def test_summary_only_events_for_known_context_are_counted_on_caller_thread():
+    with DefaultTestProcessor(events_summary_shards=2) as ep:
+        e0 = EventInputEvaluation(timestamp, context, flag.key, flag, 1, 'value1', None, 'default', None, False)
+        ep.send_event(e0)
+        ep._wait_until_inactive()
+
+        def evaluate():
+            for _ in range(10):
+                ep.send_event(EventInputEvaluation(timestamp + 1, context, flag.key, flag, 1, 'value1', None, 'default', None, False))
+
+        threads = [Thread(target=evaluate) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert ep._inbox.qsize() == 0
+
+        tracked = EventInputEvaluation(timestamp + 2, context, flag.key, flag, 2, 'value2', None, 'default', None, True)
+        ep.send_event(tracked)
+
+        output = flush_and_get_events(ep)
+        assert len(output) == 3
+        check_index_event(output[0], e0)
+        check_feature_event(output[1], tracked)
+        se = output[2]
+        assert se['kind'] == 'summary'
+        assert se['startDate'] == timestamp
+        assert se['endDate'] == timestamp + 2
+        assert sorted(se['features']['flagkey']['counters'], key=lambda c: c['variation']) == [
+            {'version': 2, 'variation': 1, 'value': 'value1', 'count': 31},
+            {'version': 2, 'variation': 2, 'value': 'value2', 'count': 1},
+        ]
+
+
+def test_summary_only_evaluation_is_counted_without_creating_event():
+    flag = FlagBuilder('flagkey').version(11).build()
+    tracked_flag = FlagBuilder('tracked').version(2).track_events(True).build()
+    detail = EvaluationDetail('value1', 1, {'kind': 'FALLTHROUGH'})
+    with DefaultTestProcessor(events_summary_shards=2) as ep:
+        # the context has not been seen yet, so an index event is needed
+        assert not ep.summarize_evaluation(flag, context, detail, 'default')
+        e0 = EventInputEvaluation(timestamp, context, flag.key, flag, 1, 'value1', None, 'default', None, False)
+        ep.send_event(e0)
+        ep._wait_until_inactive()
+
+        assert ep.summarize_evaluation(flag, context, detail, 'default')
+        assert ep.summarize_evaluation(flag, context, detail, 'default')
+        assert not ep.summarize_evaluation(tracked_flag, context, detail, 'default')
+
+        output = flush_and_get_events(ep)
+        assert len(output) == 2
+        check_index_event(output[0], e0)
+        assert output[1]['features']['flagkey']['counters'] == [{'version': 11, 'variation': 1, 'value': 'value1', 'count': 3}]
+
+
+def test_evaluations_are_not_summarized_before_creating_event_without_shards():
+    flag = FlagBuilder('flagkey').version(11).build()
+    with DefaultTestProcessor() as ep:
+        assert not ep.summarizes_evaluations()
+        assert not ep.summarize_evaluation(flag, context, EvaluationDetail('value1', 1, {'kind': 'FALLTHROUGH'}), 'default')
+
+
+def test_caller_side_summaries_are_included_in_deduplicated_users():
+    with DefaultTestProcessor(diagnostic_opt_out=False, events_summary_shards=1) as ep:
+        # Ignore init event
+        flush_and_get_events(ep)
+        ep.send_event(EventInputEvaluation(timestamp, context, flag.key, flag, 1, 'value1', None, 'default', None, False))
+        ep._wait_until_inactive()
+        ep.send_event(EventInputEvaluation(timestamp, context, flag.key, flag, 1, 'value1', None, 'default', None, False))
+        ep.send_event(EventInputEvaluation(timestamp, context, flag.key, flag, 1, 'value1', None, 'default', None, False))
+
+        # Not flushing here, so that the diagnostic event is the last request and not racing with the summary.
+        ep._send_diagnostic()
+        ep._wait_until_inactive()
+        diag_event = json.loads(mock_http.request_data)
+        assert diag_event['kind'] == 'diagnostic'
+        assert diag_event['deduplicatedUsers'] == 2
+
+
 def test_custom_event_is_queued_with_user():
     with DefaultTestProcessor() as ep:
         e = EventInputCustom(timestamp, context, 'eventkey', {'thing': 'stuff '}, 1.5)
@@ -675,6 +783,135 @@ def test_periodic_diagnostic_includes_deduplicated_users():
         assert diag_event['deduplicatedUsers'] == 1
 
 
+def test_metrics_describe_delivered_payloads_and_deduplicated_contexts():
+    with DefaultTestProcessor() as ep:
+        ep.send_event(EventInputCustom(timestamp, context, 'event1', None, None))
+        ep.send_event(EventInputCustom(timestamp, context, 'event2', None, None))
+        flush_and_get_events(ep)
+
+        metrics = ep.get_metrics()
+        assert metrics.payloads == 1
+        assert metrics.payload_bytes == metrics.payload_bytes_sent == len(mock_http.request_data)
+        assert metrics.context_lookups == 2
+        assert metrics.context_dedup_hits == 1
+        assert metrics.context_dedup_hit_rate == 0.5
+        assert metrics.buffer_full_drops == 0
+        assert metrics.encode_seconds >= 0
+        assert metrics.delivery_seconds >= 0
+
+
+def test_metrics_count_events_dropped_from_full_buffer():
+    with DefaultTestProcessor(events_max_pending=1, events_flush_high_water_ratio=None) as ep:
+        # the inbox is also this small, so wait for each event to be processed before sending another
+        ep.send_event(EventInputCustom(timestamp, context, 'event1', None, None))
+        ep._wait_until_inactive()
+        ep.send_event(EventInputCustom(timestamp, context, 'event2', None, None))
+        ep._wait_until_inactive()
+
+        # the first event's index event fills the buffer
+        assert ep.get_metrics().buffer_full_drops == 2
+        flush_and_get_events(ep)
+        assert ep.get_metrics().buffer_full_drops == 2
+
+
+def test_buffer_is_flushed_without_waiting_when_it_reaches_high_water_mark():
+    with DefaultTestProcessor(events_max_pending=4, events_flush_high_water_ratio=0.5) as ep:
+        ep.send_event(EventInputIdentify(timestamp, context))
+        ep._wait_until_inactive()
+        assert mock_http.request_data is None
+
+        ep.send_event(EventInputIdentify(timestamp, context))
+        ep._wait_until_inactive()
+        output = json.loads(mock_http.request_data)
+        assert len(output) == 2
+
+
+def test_buffer_is_flushed_without_waiting_when_it_holds_about_one_payload():
+    with DefaultTestProcessor(events_flush_high_water_ratio=1.0, events_max_payload_size=1000) as ep:
+        # the first flush tells the event processor how large these events are
+        ep.send_event(EventInputIdentify(timestamp, context))
+        flush_and_get_events(ep)
+        mock_http.reset()
+
+        for _ in range(20):
+            ep.send_event(EventInputIdentify(timestamp, context))
+            ep._wait_until_inactive()
+            if mock_http.request_data is not None:
+                break
+        assert len(mock_http.recorded_requests) == 1
+        assert len(mock_http.request_data) <= 1000
+        assert 1 < len(json.loads(mock_http.request_data)) < 20
+
+
+def test_deferred_flush_is_retried_when_a_flush_worker_is_free():
+    release = Event()
+
+    def blocked_response():
+        release.wait(5)
+        return MockResponse(200, {})
+
+    mock_http.set_response_func(blocked_response)
+    with DefaultTestProcessor(flush_interval=60, events_flush_high_water_ratio=None) as ep:
+        # keep every flush worker busy, so that the last flush is deferred
+        for i in range(6):
+            ep.send_event(EventInputIdentify(timestamp, context))
+            ep.flush()
+            if i < 5:
+                wait_until(lambda: len(mock_http.recorded_requests) == i + 1)
+        wait_until(lambda: ep.get_metrics().flush_worker_saturations == 1)
+        assert len(mock_http.recorded_requests) == 5
+
+        # with no further events or flushes, the deferred events are sent once a worker is done
+        release.set()
+        wait_until(lambda: len(mock_http.recorded_requests) == 6)
+
+
+def test_deferred_buffer_accepts_events_beyond_capacity_until_cleared():
+    buffer = EventBuffer(2, 0.5)
+    buffer.add_event('a')
+    assert buffer.needs_early_flush()
+
+    buffer.defer_flush()
+    for e in ['b', 'c', 'd', 'e']:
+        buffer.add_event(e)
+    assert buffer.get_payload().events == ['a', 'b', 'c', 'd']
+    assert buffer.total_dropped_events == 1
+
+    buffer.clear()
+    for e in ['a', 'b', 'c']:
+        buffer.add_event(e)
+    assert buffer.get_payload().events == ['a', 'b']
+    assert buffer.total_dropped_events == 2
+
+
+def test_buffer_never_needs_early_flush_without_high_water_ratio():
+    buffer = EventBuffer(2)
+    buffer.add_event('a')
+    buffer.add_event('b')
+    buffer.defer_flush()
+    assert not buffer.needs_early_flush()
+
+
+def test_flush_concurrency_is_reduced_when_deliveries_fail_or_slow_down():
+    workers = FixedThreadPool(4, 'ldclient.testing.flush')
+    limiter = FlushConcurrencyLimiter(workers, 4)
+    limiter.record_delivery(0.5, True)
+    assert limiter.limit == 4
+
+    limiter.record_delivery(0.5, False)
+    assert limiter.limit == 2
+    limiter.record_delivery(5.0, True)
+    assert limiter.limit == 1
+    assert workers.execute(lambda: time.sleep(0.2))
+    assert not workers.has_capacity()
+    workers.wait()
+
+    limiter.record_delivery(0.5, True)
+    limiter.record_delivery(0.5, True)
+    assert limiter.limit == 3
+    workers.stop()
+
+
 def test_no_more_payloads_are_sent_after_401_error():
     verify_unrecoverable_http_error(401)
 
@@ -765,6 +1002,52 @@ def verify_recoverable_http_error(status):
         assert mock_http.request_data is not None
 
 
+def test_undeliverable_payload_is_spooled_and_sent_when_delivery_recovers(tmp_path):
+    with DefaultTestProcessor(events_spool_dir=str(tmp_path)) as ep:
+        mock_http.set_response_status(503)
+        ep.send_event(EventInputIdentify(timestamp, context))
+        ep.flush()
+        ep._wait_until_inactive()
+        failed_payload_id = mock_http.request_headers.get('X-LaunchDarkly-Payload-ID')
+        assert os.listdir(str(tmp_path)) != []
+
+        mock_http.set_response_status(200)
+        mock_http.reset()
+        ep.send_event(EventInputIdentify(timestamp, Context.create('userkey2')))
+        ep.flush()
+        ep._wait_until_inactive()
+        assert len(mock_http.recorded_requests) == 1
+
+        # the successful request above makes the spooled payload eligible at the next flush
+        ep.flush()
+        ep._wait_until_inactive()
+        assert len(mock_http.recorded_requests) == 2
+        assert mock_http.request_headers.get('X-LaunchDarkly-Payload-ID') == failed_payload_id
+        output = json.loads(mock_http.request_data)
+        check_identify_event(output[0], EventInputIdentify(timestamp, context))
+        assert os.listdir(str(tmp_path)) == []
+
+
+def test_spooled_payload_is_sent_by_later_processor(tmp_path):
+    with DefaultTestProcessor(events_spool_dir=str(tmp_path), enable_event_compression=True) as ep:
+        mock_http.set_response_status(503)
+        ep.send_event(EventInputIdentify(timestamp, context))
+        ep.flush()
+        ep._wait_until_inactive()
+        failed_payload_id = mock_http.request_headers.get('X-LaunchDarkly-Payload-ID')
+
+    mock_http.set_response_status(200)
+    mock_http.reset()
+    with DefaultTestProcessor(events_spool_dir=str(tmp_path)) as ep:
+        ep.flush()
+        ep._wait_until_inactive()
+        assert len(mock_http.recorded_requests) == 1
+        assert mock_http.request_headers.get('X-LaunchDarkly-Payload-ID') == failed_payload_id
+        assert mock_http.request_headers.get('Content-Encoding') is None
+        output = json.loads(mock_http.request_data)
+        check_identify_event(output[0], EventInputIdentify(timestamp, context))
+
+
 def test_event_payload_id_is_sent():
     with DefaultEventProcessor(Config(sdk_key='SDK_KEY'), mock_http) as ep:
         ep.send_event(EventInputIdentify(timestamp, context))
@@ -792,6 +1075,115 @@ def test_event_payload_id_changes_between_requests():
         assert firstPayloadId != secondPayloadId
 
 
+def test_event_payload_is_gzip_compressed_when_enabled():
+    with DefaultTestProcessor(enable_event_compression=True) as ep:
+        ep.send_event(EventInputIdentify(timestamp, context))
+        ep.flush()
+        ep._wait_until_inactive()
+
+        assert mock_http.request_headers.get('Content-Encoding') == 'gzip'
+        output = json.loads(gzip.decompress(mock_http.request_data))
+        assert len(output) == 1
+        check_identify_event(output[0], EventInputIdentify(timestamp, context))
+
+
+@pytest.mark.parametrize("compression", [False, True])
+def test_large_flush_is_split_into_requests_no_larger_than_max_payload_size(compression):
+    contexts = [Context.create('user-%d' % i) for i in range(50)]
+    with DefaultTestProcessor(events_max_payload_size=1000, enable_event_compression=compression) as ep:
+        for c in contexts:
+            ep.send_event(EventInputIdentify(timestamp, c))
+        ep.flush()
+        ep._wait_until_inactive()
+
+        keys = []
+        payload_ids = set()
+        for headers, body in mock_http.recorded_requests:
+            data = gzip.decompress(body) if compression else body
+            assert len(data) <= 1000
+            payload_ids.add(headers.get('X-LaunchDarkly-Payload-ID'))
+            keys.extend(e['context']['key'] for e in json.loads(data))
+        assert len(mock_http.recorded_requests) > 1
+        assert len(payload_ids) == len(mock_http.recorded_requests)
+        assert sorted(keys) == sorted(c.key for c in contexts)
+
+
+def test_context_is_formatted_once_per_flush():
+    formatter = EventOutputFormatter(Config('SDK_KEY', private_attributes=['name']))
+    same_context = Context.builder('userkey').name('Red').build()
+    changed_context = Context.builder('userkey').name('Red').set('team', 'a').build()
+    events = [EventInputIdentify(timestamp, context), EventInputIdentify(timestamp, same_context), EventInputIdentify(timestamp, changed_context)]
+    summary = EventSummarizer().snapshot()
+
+    output = formatter.make_output_events(events, summary)
+    assert output[0]['context'] is output[1]['context']
+    assert output[2]['context'] is not output[0]['context']
+    assert output[2]['context']['team'] == 'a'
+    assert formatter.make_output_events(events, summary)[0]['context'] is not output[0]['context']
+
+
+def test_payload_encoder_sends_oversized_event_in_its_own_payload():
+    events = [{'kind': 'custom', 'key': 'a'}, {'kind': 'custom', 'key': 'b' * 100}, {'kind': 'custom', 'key': 'c'}]
+    payloads = list(EventPayloadEncoder(False, 50).encode(events))
+    assert [json.loads(p.body) for p in payloads] == [[events[0]], [events[1]], [events[2]]]
+    assert [p.size for p in payloads] == [len(p.body) for p in payloads]
+
+    payloads = list(EventPayloadEncoder(False, None).encode(events))
+    assert len(payloads) == 1
+    assert payloads[0].event_count == 3
+    assert json.loads(payloads[0].body) == events
+
+
+def test_summary_event_can_be_parsed_back_into_summary():
+    summarizer = EventSummarizer()
+    summarizer.summarize_event(EventInputEvaluation(1000, context, flag.key, flag, 1, 'value1', None, 'default', None, False))
+    summarizer.summarize_event(EventInputEvaluation(2000, context, 'unknown', None, None, 'default', None, 'default', None, False))
+    summary = summarizer.snapshot()
+    formatter = EventOutputFormatter(default_config)
+
+    parsed = EventOutputFormatter.parse_summary_event(json.loads(json.dumps(formatter.make_summary_event(summary))))
+    assert parsed.start_date == summary.start_date
+    assert parsed.end_date == summary.end_date
+    assert parsed.flags == summary.flags
+
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="requires Unix domain sockets")
+def test_events_from_other_process_are_aggregated_with_global_context_deduplication():
+    with tempfile.TemporaryDirectory() as dir:
+        path = os.path.join(dir, 'events.sock')
+        with DefaultTestProcessor(events_aggregator_socket=path) as aggregator:
+            with DefaultTestProcessor(events_aggregator_socket=path) as forwarder:
+                assert aggregator._dispatcher._aggregator is not None
+                assert forwarder._dispatcher._forward_to == path
+                e0 = EventInputEvaluation(timestamp, context, flag.key, flag, 1, 'value1', None, 'default', None, True)
+                e1 = EventInputEvaluation(timestamp, context, flag.key, flag, 1, 'value1', None, 'default', None, False)
+                aggregator.send_event(e0)
+                forwarder.send_event(e1)
+                forwarder.flush()
+                forwarder._wait_until_inactive()
+                aggregator._wait_until_inactive()
+                assert len(mock_http.recorded_requests) == 0
+
+                output = flush_and_get_events(aggregator)
+                assert len(mock_http.recorded_requests) == 1
+                assert [o['kind'] for o in output] == ['index', 'feature', 'summary']
+                assert output[2]['features'][flag.key]['counters'] == [{'count': 2, 'value': 'value1', 'variation': 1, 'version': flag.version}]
+
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="requires Unix domain sockets")
+def test_events_are_sent_directly_if_aggregator_is_not_running():
+    with tempfile.TemporaryDirectory() as dir:
+        path = os.path.join(dir, 'events.sock')
+        aggregator = DefaultTestProcessor(events_aggregator_socket=path)
+        with DefaultTestProcessor(events_aggregator_socket=path) as forwarder:
+            assert forwarder._dispatcher._forward_to == path
+            aggregator.stop()
+            forwarder.send_event(EventInputIdentify(timestamp, context))
+            output = flush_and_get_events(forwarder)
+            assert len(output) == 1
+            check_identify_event(output[0], EventInputIdentify(timestamp, context))
+
+
 def flush_and_get_events(ep):
     ep.flush()
     ep._wait_until_inactive()
@@ -0,0 +1,87 @@
+import os
+import uuid
+
+from ldclient.impl.events.event_spool import EventSpool
+
+
+def payload_id():
+    return str(uuid.uuid4())
+
+
+def drain(spool):
+    out = []
+    while True:
+        p = spool.peek()
+        if p is None:
+            return out
+        out.append(p)
+        spool.remove(p)
+
+
+def test_payloads_are_read_back_in_order(tmp_path):
+    spool = EventSpool(str(tmp_path), 1024 * 1024)
+    ids = [payload_id() for _ in range(3)]
+    for i, pid in enumerate(ids):
+        assert spool.append(pid, b'[%d]' % i, i == 1)
+
+    assert spool.has_pending()
+    payloads = drain(spool)
+    assert [p.payload_id for p in payloads] == ids
+    assert [p.body for p in payloads] == [b'[0]', b'[1]', b'[2]']
+    assert [p.compressed for p in payloads] == [False, True, False]
+    assert not spool.has_pending()
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_peek_does_not_remove_payload(tmp_path):
+    spool = EventSpool(str(tmp_path), 1024 * 1024)
+    pid = payload_id()
+    spool.append(pid, b'[]', False)
+    assert spool.peek().payload_id == pid
+    assert spool.peek().payload_id == pid
+
+
+def test_payloads_are_retained_across_instances(tmp_path):
+    ids = [payload_id() for _ in range(2)]
+    spool = EventSpool(str(tmp_path), 1024 * 1024)
+    for pid in ids:
+        spool.append(pid, b'[]', False)
+
+    spool2 = EventSpool(str(tmp_path), 1024 * 1024)
+    assert [p.payload_id for p in drain(spool2)] == ids
+
+
+def test_oldest_segments_are_dropped_when_spool_is_full(tmp_path):
+    max_size = 8 * 64 * 1024
+    spool = EventSpool(str(tmp_path), max_size)
+    body = b'x' * (32 * 1024)
+    ids = [payload_id() for _ in range(40)]
+    for pid in ids:
+        assert spool.append(pid, body, False)
+
+    total = sum(os.path.getsize(os.path.join(str(tmp_path), f)) for f in os.listdir(str(tmp_path)))
+    assert total <= max_size
+    remaining = [p.payload_id for p in drain(spool)]
+    assert remaining == ids[len(ids) - len(remaining):]
+    spooled, dropped = spool.get_and_clear_stats()
+    assert dropped == spooled - len(remaining) * (len(body) + 45)
+    assert spool.get_and_clear_stats() == (0, 0)
+
+
+def test_payload_larger_than_spool_is_dropped(tmp_path):
+    spool = EventSpool(str(tmp_path), 100)
+    assert not spool.append(payload_id(), b'x' * 100, False)
+    assert not spool.has_pending()
+    assert spool.get_and_clear_stats() == (0, 145)
+
+
+def test_damaged_record_is_discarded_with_rest_of_segment(tmp_path):
+    spool = EventSpool(str(tmp_path), 1024 * 1024)
+    spool.append(payload_id(), b'[1]', False)
+    path = os.path.join(str(tmp_path), os.listdir(str(tmp_path))[0])
+    with open(path, 'ab') as f:
+        f.write(b'\x00\x00\x00\x10partial')
+
+    spool2 = EventSpool(str(tmp_path), 1024 * 1024)
+    assert [p.body for p in drain(spool2)] == [b'[1]']
+    assert not spool2.has_pending()
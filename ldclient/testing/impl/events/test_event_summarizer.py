@@ -1,8 +1,11 @@
+from threading import Thread
+
 from ldclient.context import Context
 from ldclient.impl.events.event_summarizer import (
     EventSummarizer,
     EventSummaryCounter,
-    EventSummaryFlag
+    EventSummaryFlag,
+    ShardedEventSummarizer
 )
 from ldclient.impl.events.types import *
 from ldclient.testing.builders import *
@@ -46,3 +49,57 @@ def test_summarize_event_increments_counters():
         'badkey': EventSummaryFlag({'user'}, 'default3', {(None, None): EventSummaryCounter(1, 'default3')}),
     }
     assert data.flags == expected
+
+
+def test_merge_combines_counters_and_dates():
+    es1 = EventSummarizer()
+    es1.summarize_event(EventInputEvaluation(2000, user, flag1.key, flag1, 1, 'value1', None, 'default1'))
+    es1.summarize_event(EventInputEvaluation(2000, user, flag2.key, flag2, 1, 'value99', None, 'default2'))
+    es2 = EventSummarizer()
+    es2.summarize_event(EventInputEvaluation(1000, user, flag1.key, flag1, 1, 'value1', None, 'default1'))
+    es2.summarize_event(EventInputEvaluation(3000, Context.create('org1', 'org'), flag1.key, flag1, 2, 'value2', None, 'default1'))
+    es1.merge(es2.snapshot())
+    data = es1.snapshot()
+
+    assert data.start_date == 1000
+    assert data.end_date == 3000
+    assert data.flags == {
+        'flag1': EventSummaryFlag({'user', 'org'}, 'default1', {(1, flag1.version): EventSummaryCounter(2, 'value1'), (2, flag1.version): EventSummaryCounter(1, 'value2')}),
+        'flag2': EventSummaryFlag({'user'}, 'default2', {(1, flag2.version): EventSummaryCounter(1, 'value99')}),
+    }
+
+
+def test_merge_keeps_counters_for_each_flag_version():
+    flag1_v2 = FlagBuilder(flag1.key).version(flag1.version + 1).build()
+    es1 = EventSummarizer()
+    es1.summarize_event(EventInputEvaluation(1000, user, flag1.key, flag1, 1, 'value1', None, 'default1'))
+    es2 = EventSummarizer()
+    es2.summarize_event(EventInputEvaluation(2000, user, flag1.key, flag1_v2, 1, 'value1', None, 'default1'))
+    es2.summarize_event(EventInputEvaluation(2000, user, flag1.key, flag1_v2, None, 'default1', None, 'default1'))
+    es1.merge(es2.snapshot())
+
+    assert es1.snapshot().flags['flag1'].counters == {
+        (1, flag1.version): EventSummaryCounter(1, 'value1'),
+        (1, flag1_v2.version): EventSummaryCounter(1, 'value1'),
+        (None, flag1_v2.version): EventSummaryCounter(1, 'default1'),
+    }
+
+
+def test_sharded_summarizer_counts_events_from_all_threads():
+    sharded = ShardedEventSummarizer(3)
+    event = EventInputEvaluation(1000, user, flag1.key, flag1, 1, 'value1', None, 'default1')
+
+    def summarize():
+        for _ in range(100):
+            sharded.summarize_event(event)
+
+    threads = [Thread(target=summarize) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    es = EventSummarizer()
+    assert sharded.drain_into(es) == 500
+    assert es.snapshot().flags['flag1'].counters == {(1, flag1.version): EventSummaryCounter(500, 'value1')}
+    assert sharded.drain_into(es) == 0
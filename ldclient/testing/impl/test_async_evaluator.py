@@ -9,6 +9,7 @@ import pytest
 from ldclient import Context
 from ldclient.evaluation import BigSegmentsStatus, EvaluationDetail
 from ldclient.impl.async_evaluator import AsyncEvaluator, _make_big_segment_ref
+from ldclient.impl.evaluator_common import EvaluationScope
 from ldclient.impl.events.types import EventFactory, EventInputEvaluation
 from ldclient.impl.model import *
 from ldclient.testing.builders import *
@@ -328,6 +329,24 @@ async def test_big_segment_matched_with_include():
     assert result.detail.reason['bigSegmentsStatus'] == BigSegmentsStatus.HEALTHY
 
 
+@pytest.mark.asyncio
+async def test_big_segments_status_is_reported_for_scoped_match_that_reused_membership():
+    seg1 = SegmentBuilder('seg1').version(1).unbounded(True).generation(2).build()
+    seg2 = SegmentBuilder('seg2').version(1).unbounded(True).generation(2).build()
+    flag_b = FlagBuilder('flag-b').on(True).variations(False, True).fallthrough_variation(0) \
+        .rules(FlagRuleBuilder().clauses(make_clause_matching_segment_key('seg1')).variation(1).build(),
+               FlagRuleBuilder().clauses(make_clause_matching_segment_key('seg2')).variation(1).build()).build()
+    flag_c = FlagBuilder('flag-c').on(True).variations(False, True).fallthrough_variation(0) \
+        .rules(FlagRuleBuilder().clauses(make_clause_matching_segment_key('seg2')).variation(1).build()).build()
+    evaluator = AsyncEvaluatorBuilder().with_segment(seg1).with_segment(seg2).with_big_segment_for_key(basic_user.key, seg2, True).build()
+
+    scope = EvaluationScope()
+    await evaluator.evaluate(flag_b, basic_user, event_factory, scope)
+    result = await evaluator.evaluate(flag_c, basic_user, event_factory, scope)
+    assert result.detail.value is True
+    assert result.detail.reason['bigSegmentsStatus'] == BigSegmentsStatus.HEALTHY
+
+
 @pytest.mark.asyncio
 async def test_big_segment_unmatched_by_exclude():
     segment = SegmentBuilder('key').version(1).unbounded(True).generation(2).rules(make_segment_rule_matching_context(basic_user)).build()
@@ -0,0 +1,53 @@
+from ldclient.impl.bloom_filter import RotatingBloomFilter
+
+
+def test_remembers_keys_that_were_added():
+    keys = RotatingBloomFilter(100, 0.01)
+    assert keys.put("a") is False
+    assert keys.put("b") is False
+    assert "a" in keys
+    assert keys.put("a") is True
+    assert keys.put("b") is True
+
+
+def test_false_positive_rate_is_about_as_configured():
+    keys = RotatingBloomFilter(10000, 0.01)
+    for i in range(5000):
+        keys.put("seen-%d" % i)
+    false_positives = sum(1 for i in range(10000) if "unseen-%d" % i in keys)
+    assert false_positives < 200
+
+
+def test_oldest_keys_are_forgotten_after_capacity_is_exceeded():
+    keys = RotatingBloomFilter(4, 0.0001)
+    for k in ["a", "b", "c", "d"]:
+        keys.put(k)
+    assert all(k in keys for k in ["a", "b", "c", "d"])
+
+    keys.put("e")
+    keys.put("f")
+    keys.put("g")
+    assert "a" not in keys
+    assert "b" not in keys
+    assert all(k in keys for k in ["e", "f", "g"])
+
+
+def test_key_that_is_still_used_is_not_forgotten():
+    keys = RotatingBloomFilter(4, 0.0001)
+    keys.put("a")
+    keys.put("b")
+    keys.put("c")
+    assert keys.put("a") is True  # "a" is only in the previous filter, so it is added again
+    keys.put("d")
+    keys.put("e")
+    assert "a" in keys
+    assert "b" not in keys
+
+
+def test_clear_forgets_all_keys():
+    keys = RotatingBloomFilter(100, 0.01)
+    keys.put("a")
+    keys.put("b")
+    keys.clear()
+    assert "a" not in keys
+    assert keys.put("b") is False
@@ -1,12 +1,15 @@
+import hashlib
 import math
 
 import pytest
 
 from ldclient.client import Context
+from ldclient.impl import evaluator_common
 from ldclient.impl.evaluator import (
     _bucket_context,
     _variation_index_for_context
 )
+from ldclient.impl.evaluator_common import _compute_bucket_value
 from ldclient.impl.model import *
 from ldclient.testing.builders import *
 from ldclient.testing.impl.evaluator_util import *
@@ -124,3 +127,21 @@ class TestEvaluatorBucketing:
         assert _bucket_context(seed, context1, None, key, salt, None) == _bucket_context(seed, multi, 'user', key, salt, None)
         assert _bucket_context(seed, context2, 'kind2', key, salt, None) == _bucket_context(seed, multi, 'kind2', key, salt, None)
         assert _bucket_context(seed, multi, 'user', key, salt, None) != _bucket_context(seed, multi, 'kind2', key, salt, None)
+
+    def test_bucket_value_matches_hex_digest_calculation(self):
+        for i in range(1000):
+            hash_key = 'flag-key.salt.user-%d' % i
+            expected = int(hashlib.sha1(hash_key.encode('utf-8')).hexdigest()[:15], 16) / float(0xFFFFFFFFFFFFFFF)
+            assert _compute_bucket_value(None, 'flag-key', 'salt', 'user-%d' % i) == expected
+        expected_with_seed = int(hashlib.sha1('61.user-1'.encode('utf-8')).hexdigest()[:15], 16) / float(0xFFFFFFFFFFFFFFF)
+        assert _compute_bucket_value(61, 'flag-key', 'salt', 'user-1') == expected_with_seed
+
+    def test_bucket_cache_is_bounded(self, monkeypatch):
+        monkeypatch.setattr(evaluator_common, '_BUCKET_CACHE_CAPACITY', 10)
+        evaluator_common._bucket_cache.clear()
+        values = []
+        for i in range(25):
+            values.append(_bucket_context(None, Context.create('key%d' % i), None, 'hashKey', 'saltyA', None))
+            assert len(evaluator_common._bucket_cache) <= 10
+        for i in range(25):
+            assert _bucket_context(None, Context.create('key%d' % i), None, 'hashKey', 'saltyA', None) == values[i]
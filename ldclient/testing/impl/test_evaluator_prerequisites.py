@@ -2,7 +2,7 @@ import pytest
 
 from ldclient.client import Context
 from ldclient.evaluation import EvaluationDetail
-from ldclient.impl.events.types import EventInputEvaluation
+from ldclient.impl.events.types import EventFactory, EventInputEvaluation
 from ldclient.testing.builders import *
 from ldclient.testing.impl.evaluator_util import *
 
@@ -46,6 +46,15 @@ def test_flag_returns_fallthrough_and_event_if_prereq_is_met_and_there_are_no_ru
     assert_eval_result(evaluator.evaluate(flag, user, event_factory), detail, events_should_be)
 
 
+def test_no_prerequisite_events_are_created_if_event_factory_is_disabled():
+    flag = FlagBuilder('feature0').on(True).off_variation(1).variations('a', 'b', 'c').fallthrough_variation(0).prerequisite('feature1', 1).build()
+    flag1 = FlagBuilder('feature1').version(2).on(True).off_variation(1).variations('d', 'e').fallthrough_variation(1).build()
+    evaluator = EvaluatorBuilder().with_flag(flag1).build()
+    user = Context.create('x')
+    detail = EvaluationDetail('a', 0, {'kind': 'FALLTHROUGH'})
+    assert_eval_result(evaluator.evaluate(flag, user, EventFactory(False, enabled=False)), detail, None)
+
+
 @pytest.mark.parametrize("depth", [1, 2, 3, 4])
 def test_prerequisite_cycle_detection(depth: int):
     flag_keys = list("flagkey%d" % i for i in range(depth))
@@ -66,3 +66,25 @@ class TestEvaluatorTarget:
         expect_match(flag, Context.create_multi(Context.create('z', 'dog'), Context.create('a')), MATCH_VAR_2)  # "dog" targets don't match, continue to "user" targets
         expect_fallthrough(flag, Context.create_multi(Context.create('x', 'dog'), Context.create('z')))  # nothing matches
         expect_match(flag, Context.create_multi(Context.create('a', 'dog'), Context.create('b', 'cat')), MATCH_VAR_1)
+
+    def test_context_targets_order_decides_between_kinds(self):
+        flag = (
+            base_flag_builder()
+            .target(MATCH_VAR_2, 'a')
+            .target(MATCH_VAR_1, 'a', 'b')
+            .context_target(Context.DEFAULT_KIND, MATCH_VAR_1)
+            .context_target('dog', MATCH_VAR_2, 'a', 'b')
+            .context_target(Context.DEFAULT_KIND, MATCH_VAR_2)
+            .build()
+        )
+
+        expect_match(flag, Context.create('a'), MATCH_VAR_1)  # first "user" placeholder refers to the MATCH_VAR_1 user target
+        expect_match(flag, Context.create_multi(Context.create('b', 'dog'), Context.create('a')), MATCH_VAR_1)
+        expect_match(flag, Context.create_multi(Context.create('b', 'dog'), Context.create('z')), MATCH_VAR_2)
+        expect_match(flag, Context.create('a', 'dog'), MATCH_VAR_2)
+
+    def test_user_context_target_without_user_target_for_its_variation(self):
+        flag = base_flag_builder().target(MATCH_VAR_1, 'a').context_target(Context.DEFAULT_KIND, MATCH_VAR_2).context_target('dog', MATCH_VAR_1, 'a').build()
+
+        expect_fallthrough(flag, Context.create('a'))
+        expect_match(flag, Context.create('a', 'dog'), MATCH_VAR_1)
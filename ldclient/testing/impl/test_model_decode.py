@@ -3,6 +3,7 @@ import re
 import pytest
 from semver import VersionInfo
 
+from ldclient.impl import operators
 from ldclient.impl.model import *
 from ldclient.testing.builders import *
 
@@ -41,3 +42,38 @@ def test_clause_values_preprocessed_with_time_operator(op):
     flag = make_boolean_flag_with_clauses(make_clause(None, "attr", op, 1000, "1970-01-01T00:00:02Z", True))
     assert flag.rules[0].clauses[0]._values == [1000, "1970-01-01T00:00:02Z", True]
     assert list(x.as_time for x in flag.rules[0].clauses[0]._values_preprocessed) == [1000, 2000, None]
+
+
+def test_clause_operator_and_context_kind_are_resolved_at_decode_time():
+    flag = make_boolean_flag_with_clauses(make_clause(None, "attr", "startsWith", "a"), make_clause("org", "kind", "in", "org"))
+    clause1 = flag.rules[0].clauses[0]
+    clause2 = flag.rules[0].clauses[1]
+    assert clause1.op_fn is operators.ops["startsWith"]
+    assert clause1.match_context_kind == "user"
+    assert clause1.matches_kind_attribute is False
+    assert clause2.match_context_kind == "org"
+    assert clause2.matches_kind_attribute is True
+
+
+def test_clause_with_unknown_operator_has_no_operator_function():
+    flag = make_boolean_flag_with_clauses(make_clause(None, "attr", "unsupportedOperator", "a"))
+    assert flag.rules[0].clauses[0].op_fn is None
+
+
+def test_attribute_ref_path_components_are_precomputed():
+    assert AttributeRef.from_literal("/a").path_components == ("/a",)
+    assert AttributeRef.from_path("/a/b~1c").path_components == ("a", "b/c")
+    assert AttributeRef.from_path("//").path_components == ()
+
+
+def test_target_context_kinds_default_to_user():
+    flag = FlagBuilder("key").target(0, "a").context_target("kind1", 0, "b").build()
+    assert flag.targets[0].match_context_kind == "user"
+    assert flag.context_targets[0].match_context_kind == "kind1"
+
+
+def test_flag_target_index_is_built_per_context_kind():
+    flag = FlagBuilder("key").target(0, "a").target(1, "a", "b").context_target("user", 1).context_target("kind1", 0, "b").context_target("user", 0).build()
+    assert flag.target_index == {"user": {"a": (0, 1), "b": (0, 1)}, "kind1": {"b": (1, 0)}}
+    legacy = FlagBuilder("key").target(0, "a").target(1, "a", "b").build()
+    assert legacy.target_index == {"user": {"a": (0, 0), "b": (1, 1)}}
@@ -1,103 +1,210 @@
+import pyrfc3339
 import pytest
 
 from ldclient.impl import operators
+from ldclient.impl.evaluator_common import _match_single_context_value
+from ldclient.impl.model import value_parsing
 from ldclient.testing.builders import *
 
+_operator_test_cases = [
+    # numeric comparisons
+    ["in", 99, 99, True],
+    ["in", 99.0001, 99.0001, True],
+    ["in", 99, 99.0001, False],
+    ["in", 99.0001, 99, False],
+    ["lessThan", 99, 99.0001, True],
+    ["lessThan", 99.0001, 99, False],
+    ["lessThan", 99, 99, False],
+    ["lessThanOrEqual", 99, 99.0001, True],
+    ["lessThanOrEqual", 99.0001, 99, False],
+    ["lessThanOrEqual", 99, 99, True],
+    ["greaterThan", 99.0001, 99, True],
+    ["greaterThan", 99, 99.0001, False],
+    ["greaterThan", 99, 99, False],
+    ["greaterThanOrEqual", 99.0001, 99, True],
+    ["greaterThanOrEqual", 99, 99.0001, False],
+    ["greaterThanOrEqual", 99, 99, True],
+    # string comparisons
+    ["in", "x", "x", True],
+    ["in", "x", "xyz", False],
+    ["startsWith", "xyz", "x", True],
+    ["startsWith", "x", "xyz", False],
+    ["endsWith", "xyz", "z", True],
+    ["endsWith", "z", "xyz", False],
+    ["contains", "xyz", "y", True],
+    ["contains", "y", "xyz", False],
+    # booleans and numbers must remain distinct (bool is a subtype of int in Python)
+    ["in", True, True, True],
+    ["in", False, False, True],
+    ["in", True, 1, False],
+    ["in", 1, True, False],
+    ["in", True, 1.0, False],
+    ["in", 1.0, True, False],
+    ["in", False, 0, False],
+    ["in", 0, False, False],
+    ["in", False, 0.0, False],
+    ["in", 0.0, False, False],
+    # mixed strings and numbers
+    ["in", "99", 99, False],
+    ["in", 99, "99", False],
+    ["contains", "99", 99, False],
+    ["startsWith", "99", 99, False],
+    ["endsWith", "99", 99, False],
+    ["lessThanOrEqual", "99", 99, False],
+    ["lessThanOrEqual", 99, "99", False],
+    ["greaterThanOrEqual", "99", 99, False],
+    ["greaterThanOrEqual", 99, "99", False],
+    # regex
+    ["matches", "hello world", "hello.*rld", True],
+    ["matches", "hello world", "hello.*rl", True],
+    ["matches", "hello world", "l+", True],
+    ["matches", "hello world", "(world|planet)", True],
+    ["matches", "hello world", "aloha", False],
+    # [ "matches", "hello world", "***not a regex", False ],   # currently throws an exception
+    # dates
+    ["before", 0, 1, True],
+    ["before", -100, 0, True],
+    ["before", "1970-01-01T00:00:00Z", 1000, True],
+    ["before", "1970-01-01T00:00:00.500Z", 1000, True],
+    ["before", True, 1000, False],  # wrong type
+    ["after", "1970-01-01T00:00:02.500Z", 1000, True],
+    ["after", "1970-01-01 00:00:02.500Z", 1000, True],
+    ["after", "1970-01-01T00:00:02+01:00", None, False],
+    ["after", None, "1970-01-01T00:00:02+01:00", False],
+    ["before", "1970-01-01T00:00:02+01:00", 1000, True],
+    ["before", "1970-01-01T00:00:02+01:00", None, False],
+    ["before", None, "1970-01-01T00:00:02+01:00", False],
+    ["before", -1000, 1000, True],
+    ["after", "1970-01-01T00:00:01.001Z", 1000, True],
+    ["after", "1970-01-01T00:00:00-01:00", 1000, True],
+    # semver
+    ["semVerEqual", "2.0.1", "2.0.1", True],
+    ["semVerEqual", "2.0", "2.0.0", True],
+    ["semVerEqual", "2", "2.0.0", True],
+    ["semVerEqual", 2, "2.0.0", False],
+    ["semVerEqual", "2.0.0", 2, False],
+    ["semVerEqual", "2.0-rc1", "2.0.0-rc1", True],
+    ["semVerLessThan", "2.0.0", "2.0.1", True],
+    ["semVerLessThan", "2.0", "2.0.1", True],
+    ["semVerLessThan", "2.0.1", "2.0.0", False],
+    ["semVerLessThan", "2.0.1", "2.0", False],
+    ["semVerGreaterThan", "2.0.1", "2.0.0", True],
+    ["semVerGreaterThan", "2.0.1", "2.0", True],
+    ["semVerGreaterThan", "2.0.0", "2.0.1", False],
+    ["semVerGreaterThan", "2.0", "2.0.1", False],
+    ["semVerLessThan", "2.0.1", "xbad%ver", False],
+    ["semVerGreaterThan", "2.0.1", "xbad%ver", False],
+]
 
-@pytest.mark.parametrize(
-    "op,context_value,clause_value,expected",
-    [
-        # numeric comparisons
-        ["in", 99, 99, True],
-        ["in", 99.0001, 99.0001, True],
-        ["in", 99, 99.0001, False],
-        ["in", 99.0001, 99, False],
-        ["lessThan", 99, 99.0001, True],
-        ["lessThan", 99.0001, 99, False],
-        ["lessThan", 99, 99, False],
-        ["lessThanOrEqual", 99, 99.0001, True],
-        ["lessThanOrEqual", 99.0001, 99, False],
-        ["lessThanOrEqual", 99, 99, True],
-        ["greaterThan", 99.0001, 99, True],
-        ["greaterThan", 99, 99.0001, False],
-        ["greaterThan", 99, 99, False],
-        ["greaterThanOrEqual", 99.0001, 99, True],
-        ["greaterThanOrEqual", 99, 99.0001, False],
-        ["greaterThanOrEqual", 99, 99, True],
-        # string comparisons
-        ["in", "x", "x", True],
-        ["in", "x", "xyz", False],
-        ["startsWith", "xyz", "x", True],
-        ["startsWith", "x", "xyz", False],
-        ["endsWith", "xyz", "z", True],
-        ["endsWith", "z", "xyz", False],
-        ["contains", "xyz", "y", True],
-        ["contains", "y", "xyz", False],
-        # booleans and numbers must remain distinct (bool is a subtype of int in Python)
-        ["in", True, True, True],
-        ["in", False, False, True],
-        ["in", True, 1, False],
-        ["in", 1, True, False],
-        ["in", True, 1.0, False],
-        ["in", 1.0, True, False],
-        ["in", False, 0, False],
-        ["in", 0, False, False],
-        ["in", False, 0.0, False],
-        ["in", 0.0, False, False],
-        # mixed strings and numbers
-        ["in", "99", 99, False],
-        ["in", 99, "99", False],
-        ["contains", "99", 99, False],
-        ["startsWith", "99", 99, False],
-        ["endsWith", "99", 99, False],
-        ["lessThanOrEqual", "99", 99, False],
-        ["lessThanOrEqual", 99, "99", False],
-        ["greaterThanOrEqual", "99", 99, False],
-        ["greaterThanOrEqual", 99, "99", False],
-        # regex
-        ["matches", "hello world", "hello.*rld", True],
-        ["matches", "hello world", "hello.*rl", True],
-        ["matches", "hello world", "l+", True],
-        ["matches", "hello world", "(world|planet)", True],
-        ["matches", "hello world", "aloha", False],
-        # [ "matches", "hello world", "***not a regex", False ],   # currently throws an exception
-        # dates
-        ["before", 0, 1, True],
-        ["before", -100, 0, True],
-        ["before", "1970-01-01T00:00:00Z", 1000, True],
-        ["before", "1970-01-01T00:00:00.500Z", 1000, True],
-        ["before", True, 1000, False],  # wrong type
-        ["after", "1970-01-01T00:00:02.500Z", 1000, True],
-        ["after", "1970-01-01 00:00:02.500Z", 1000, True],
-        ["after", "1970-01-01T00:00:02+01:00", None, False],
-        ["after", None, "1970-01-01T00:00:02+01:00", False],
-        ["before", "1970-01-01T00:00:02+01:00", 1000, True],
-        ["before", "1970-01-01T00:00:02+01:00", None, False],
-        ["before", None, "1970-01-01T00:00:02+01:00", False],
-        ["before", -1000, 1000, True],
-        ["after", "1970-01-01T00:00:01.001Z", 1000, True],
-        ["after", "1970-01-01T00:00:00-01:00", 1000, True],
-        # semver
-        ["semVerEqual", "2.0.1", "2.0.1", True],
-        ["semVerEqual", "2.0", "2.0.0", True],
-        ["semVerEqual", "2", "2.0.0", True],
-        ["semVerEqual", 2, "2.0.0", False],
-        ["semVerEqual", "2.0.0", 2, False],
-        ["semVerEqual", "2.0-rc1", "2.0.0-rc1", True],
-        ["semVerLessThan", "2.0.0", "2.0.1", True],
-        ["semVerLessThan", "2.0", "2.0.1", True],
-        ["semVerLessThan", "2.0.1", "2.0.0", False],
-        ["semVerLessThan", "2.0.1", "2.0", False],
-        ["semVerGreaterThan", "2.0.1", "2.0.0", True],
-        ["semVerGreaterThan", "2.0.1", "2.0", True],
-        ["semVerGreaterThan", "2.0.0", "2.0.1", False],
-        ["semVerGreaterThan", "2.0", "2.0.1", False],
-        ["semVerLessThan", "2.0.1", "xbad%ver", False],
-        ["semVerGreaterThan", "2.0.1", "xbad%ver", False],
-    ],
-)
+
+@pytest.mark.parametrize("op,context_value,clause_value,expected", _operator_test_cases)
 def test_operator(op, context_value, clause_value, expected):
     flag = make_boolean_flag_with_clauses(make_clause(None, 'attr', op, clause_value))
     preprocessed = flag.rules[0].clauses[0].values_preprocessed
     result = operators.ops.get(op)(context_value, clause_value, None if preprocessed is None else preprocessed[0])
     assert result == expected
+
+
+@pytest.mark.parametrize(
+    "context_value,expected",
+    [
+        ["b", True],
+        ["B", False],
+        [2, True],
+        [2.0, True],
+        [3, True],
+        [4, False],
+        ["2", False],
+        [True, True],
+        [False, False],
+        [1, False],
+        [0, False],
+        [{"x": 1}, True],
+        [{"x": 2}, False],
+        [[1, 2], True],
+    ],
+)
+def test_in_operator_with_value_index(context_value, expected):
+    clause = make_boolean_flag_with_clauses(make_clause(None, 'attr', 'in', 'a', 'b', 2, 3.0, True, {"x": 1}, [1, 2])).rules[0].clauses[0]
+    assert isinstance(clause.values_matcher, ClauseValueIndex)
+    assert _match_single_context_value(clause, context_value) == expected
+    assert any(operators.ops['in'](context_value, v, None) for v in clause.values) == expected
+
+
+@pytest.mark.parametrize("op,context_value,clause_value,expected", _operator_test_cases)
+def test_operator_via_clause_values_matcher(op, context_value, clause_value, expected):
+    clause = make_boolean_flag_with_clauses(make_clause(None, 'attr', op, clause_value)).rules[0].clauses[0]
+    assert _match_single_context_value(clause, context_value) == expected
+
+
+@pytest.mark.parametrize(
+    "op,context_value,expected",
+    [
+        ["startsWith", "abcdef", True],
+        ["startsWith", "xyzabc", True],
+        ["startsWith", "fedcba", False],
+        ["endsWith", "xxxdef", True],
+        ["endsWith", "defxxx", False],
+        ["contains", "xxcdexx", False],
+        ["contains", "xxxyzxx", True],
+        ["contains", "xxdefxx", True],
+        ["startsWith", 99, False],
+    ],
+)
+def test_string_operator_with_multiple_values(op, context_value, expected):
+    clause = make_boolean_flag_with_clauses(make_clause(None, 'attr', op, 'abc', 'xyz', 'def', 99)).rules[0].clauses[0]
+    assert isinstance(clause.values_matcher, ClauseStringMatcher)
+    assert _match_single_context_value(clause, context_value) == expected
+
+
+@pytest.mark.parametrize(
+    "patterns,context_value,expected,combined",
+    [
+        [["^abc", "d+e$", "x.z"], "xyz", True, True],
+        [["^abc", "d+e$", "x.z"], "ddde", True, True],
+        [["^abc", "d+e$", "x.z"], "zabc", False, True],
+        [["a|b", "^c"], "xxbxx", True, True],
+        [["(a)\\1", "^c"], "aa", True, False],
+        [["(a)\\1", "^c"], "ab", False, False],
+        [["(?i)abc", "^c"], "ABC", True, False],
+        [["abc", "***not a regex"], "abc", True, False],
+    ],
+)
+def test_matches_operator_with_multiple_patterns(patterns, context_value, expected, combined):
+    clause = make_boolean_flag_with_clauses(make_clause(None, 'attr', 'matches', *patterns)).rules[0].clauses[0]
+    assert (clause.values_matcher._combined_regex is not None) == combined
+    assert _match_single_context_value(clause, context_value) == expected
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "1970-01-01T00:00:02.500Z",
+        "1970-01-01t00:00:02.5z",
+        "1970-01-01 00:00:02.500Z",
+        "2024-02-29T23:59:59.123456789-07:30",
+        "2023-02-29T00:00:00Z",
+        "2023-01-01T00:00:00",
+        "2023-01-01",
+        "not a timestamp",
+    ],
+)
+def test_parse_time_fast_path_agrees_with_pyrfc3339(value):
+    try:
+        expected = (pyrfc3339.parse(value) - value_parsing._epoch).total_seconds() * 1000.0
+    except Exception:
+        expected = None
+    assert value_parsing._parse_time_string(value) == expected
+
+
+def test_parsed_values_are_memoized_and_bounded(monkeypatch):
+    monkeypatch.setattr(value_parsing, '_PARSED_VALUE_CACHE_CAPACITY', 10)
+    value_parsing._parsed_semver_cache.clear()
+    value_parsing._parsed_time_cache.clear()
+    assert value_parsing.parse_semver("2.0") is value_parsing.parse_semver("2.0")
+    for i in range(25):
+        assert str(value_parsing.parse_semver("1.%d" % i)) == "1.%d.0" % i
+        assert value_parsing.parse_semver("bad%%ver%d" % i) is None
+        assert value_parsing.parse_time("1970-01-01T00:00:%02dZ" % i) == i * 1000.0
+        assert len(value_parsing._parsed_semver_cache) <= 10
+        assert len(value_parsing._parsed_time_cache) <= 10
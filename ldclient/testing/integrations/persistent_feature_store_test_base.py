@@ -100,3 +100,14 @@ class PersistentFeatureStoreTestBase(FeatureStoreTestBase):
                 assert item is None
                 items = store_b.all(FEATURES, lambda x: x)
                 assert items == {'flagB1': FEATURES.decode(flag_b1), 'flagB2': FEATURES.decode(flag_b2)}
+
+    def test_get_many_reads_existing_and_missing_items(self, tester):
+        flag1 = {'key': 'flag1', 'version': 1}
+        flag2 = {'key': 'flag2', 'version': 1, 'deleted': True}
+
+        with StoreTestScope(tester.create_feature_store()) as store:
+            store.init({FEATURES: {'flag1': flag1, 'flag2': flag2}})
+            core = store._core
+            if not callable(getattr(core, 'get_many_internal', None)):
+                pytest.skip("this store does not read several items at once")
+            assert core.get_many_internal(FEATURES, ['flag1', 'flag2', 'flag3']) == {'flag1': flag1, 'flag2': flag2}
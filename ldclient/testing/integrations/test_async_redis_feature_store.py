@@ -21,7 +21,7 @@ from ldclient.testing.async_feature_store_test_base import (
     AsyncFeatureStoreTester
 )
 from ldclient.testing.test_util import skip_database_tests
-from ldclient.versioned_data_kind import FEATURES
+from ldclient.versioned_data_kind import FEATURES, SEGMENTS
 
 have_async_redis = False
 try:
@@ -114,6 +114,43 @@ async def test_stores_with_different_prefixes_are_independent():
         await store_b.close()
 
 
+@pytest.mark.asyncio
+@pytest.mark.skipif(skip_database_tests, reason="skipping database tests")
+@pytest.mark.skipif(not have_sync_redis, reason="skipping: sync redis not available for test setup")
+async def test_init_replaces_data_without_leaving_staging_keys():
+    clear_data(None)
+    store = Redis.async_feature_store(caching=CacheConfig.disabled())
+    try:
+        await store.init({FEATURES: {'old': {'key': 'old', 'version': 1}}, SEGMENTS: {'seg': {'key': 'seg', 'version': 1}}})
+
+        flags = {'flag%d' % i: {'key': 'flag%d' % i, 'version': 1} for i in range(1200)}  # more than one chunk
+        await store.init({FEATURES: flags, SEGMENTS: {}})
+
+        assert (await store.all(FEATURES)).keys() == flags.keys()
+        assert await store.all(SEGMENTS) == {}
+        r = sync_redis_client()
+        assert r.keys(DEFAULT_PREFIX + ':*$staging*') == []
+        assert r.ttl(DEFAULT_PREFIX + ':' + FEATURES.namespace) == -1  # the live hash does not expire
+    finally:
+        await store.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(skip_database_tests, reason="skipping database tests")
+@pytest.mark.skipif(not have_sync_redis, reason="skipping: sync redis not available for test setup")
+async def test_get_many_reads_existing_and_missing_items():
+    clear_data(None)
+    flag1 = {'key': 'flag1', 'version': 1}
+    flag2 = {'key': 'flag2', 'version': 1}
+
+    store = Redis.async_feature_store()
+    try:
+        await store.init({FEATURES: {'flag1': flag1, 'flag2': flag2}})
+        assert await store._core.get_many_internal(FEATURES, ['flag1', 'flag2', 'flag3']) == {'flag1': flag1, 'flag2': flag2}
+    finally:
+        await store.close()
+
+
 @pytest.mark.asyncio
 @pytest.mark.skipif(skip_database_tests, reason="skipping database tests")
 @pytest.mark.skipif(not have_sync_redis, reason="skipping: sync redis not available for test setup")
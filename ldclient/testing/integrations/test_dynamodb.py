@@ -155,3 +155,48 @@ class TestDynamoDBBigSegmentStore(BigSegmentStoreTestBase):
     @property
     def tester_class(self):
         return DynamoDBBigSegmentTester
+
+
+class ThrottlingClient:
+    """Leaves every key but the first unprocessed, a given number of times."""
+
+    def __init__(self, throttled_count):
+        self.throttled_count = throttled_count
+        self.requests = []
+
+    def batch_get_item(self, RequestItems):
+        self.requests.append(RequestItems)
+        keys = RequestItems[DynamoDBTestHelper.table_name]['Keys']
+        if self.throttled_count == 0:
+            return {'Responses': {DynamoDBTestHelper.table_name: keys}}
+        self.throttled_count -= 1
+        return {'Responses': {DynamoDBTestHelper.table_name: keys[:1]}, 'UnprocessedKeys': {DynamoDBTestHelper.table_name: {'Keys': keys[1:]}}}
+
+
+class TestDynamoDBBatchGetItems:
+    keys = [{'key': {'S': 'a'}}, {'key': {'S': 'b'}}, {'key': {'S': 'a'}}, {'key': {'S': 'c'}}]
+
+    def test_duplicate_keys_are_requested_once(self, monkeypatch):
+        monkeypatch.setattr(time, 'sleep', lambda delay: None)
+        client = ThrottlingClient(0)
+        items = _DynamoDBHelpers.batch_get_items(client, DynamoDBTestHelper.table_name, self.keys)
+        assert items == [{'key': {'S': 'a'}}, {'key': {'S': 'b'}}, {'key': {'S': 'c'}}]
+        assert client.requests == [{DynamoDBTestHelper.table_name: {'Keys': items}}]
+
+    def test_unprocessed_keys_are_retried_with_backoff(self, monkeypatch):
+        delays = []
+        monkeypatch.setattr(time, 'sleep', delays.append)
+        client = ThrottlingClient(2)
+        items = _DynamoDBHelpers.batch_get_items(client, DynamoDBTestHelper.table_name, self.keys)
+        assert items == [{'key': {'S': 'a'}}, {'key': {'S': 'b'}}, {'key': {'S': 'c'}}]
+        assert len(client.requests) == 3
+        assert delays == [0.05, 0.1]
+
+    def test_unprocessed_keys_are_not_retried_forever(self, monkeypatch):
+        delays = []
+        monkeypatch.setattr(time, 'sleep', delays.append)
+        client = ThrottlingClient(100)
+        with pytest.raises(Exception):
+            _DynamoDBHelpers.batch_get_items(client, DynamoDBTestHelper.table_name, self.keys)
+        assert len(delays) == _DynamoDBHelpers.UNPROCESSED_KEYS_MAX_RETRIES
+        assert max(delays) == _DynamoDBHelpers.UNPROCESSED_KEYS_MAX_DELAY
@@ -9,7 +9,7 @@ from ldclient.integrations import Redis
 from ldclient.testing.integrations.big_segment_store_test_base import *
 from ldclient.testing.integrations.persistent_feature_store_test_base import *
 from ldclient.testing.test_util import skip_database_tests
-from ldclient.versioned_data_kind import FEATURES
+from ldclient.versioned_data_kind import FEATURES, SEGMENTS
 
 have_redis = False
 try:
@@ -120,6 +120,19 @@ class TestRedisFeatureStore(PersistentFeatureStoreTestBase):
         result = store.get(FEATURES, 'flagkey', lambda x: x)
         assert result['version'] == 5
 
+    def test_init_replaces_data_without_leaving_staging_keys(self):
+        client = RedisTestHelper.make_client()
+        store = Redis.new_feature_store(caching=CacheConfig.disabled())
+        store.init({FEATURES: {'old': {'key': 'old', 'version': 1}}, SEGMENTS: {'seg': {'key': 'seg', 'version': 1}}})
+
+        flags = {'flag%d' % i: {'key': 'flag%d' % i, 'version': 1} for i in range(1200)}  # more than one chunk
+        store.init({FEATURES: flags, SEGMENTS: {}})
+
+        assert store.all(FEATURES, lambda x: x).keys() == flags.keys()
+        assert store.all(SEGMENTS, lambda x: x) == {}
+        assert client.keys(Redis.DEFAULT_PREFIX + ':*$staging*') == []
+        assert client.ttl(Redis.DEFAULT_PREFIX + ':' + FEATURES.namespace) == -1  # the live hash does not expire
+
 
 class TestRedisBigSegmentStore(BigSegmentStoreTestBase):
     @property
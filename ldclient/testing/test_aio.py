@@ -205,6 +205,7 @@ class TestBoundedTaskSet:
         assert tasks.try_run(job) is True
         await started.wait(2)
         # Set is full (limit 1), so the next task is rejected rather than queued.
+        assert tasks.has_capacity() is False
         assert tasks.try_run(noop) is False
         release.set()
         await tasks.wait()
@@ -215,8 +216,22 @@ class TestBoundedTaskSet:
 
         # After stop(), further work is rejected.
         tasks.stop()
+        assert tasks.has_capacity() is False
         assert tasks.try_run(noop) is False
 
+    @pytest.mark.asyncio
+    async def test_done_fn_is_called_once_task_no_longer_counts_against_limit(self):
+        capacity_when_done = []
+        tasks = aio.BoundedTaskSet(1, lambda: capacity_when_done.append(tasks.has_capacity()))
+
+        async def noop():
+            pass
+
+        assert tasks.try_run(noop) is True
+        await tasks.wait()
+        assert capacity_when_done == [True]
+        tasks.stop()
+
     @pytest.mark.asyncio
     async def test_wait_returns_when_idle(self):
         tasks = aio.BoundedTaskSet(2)
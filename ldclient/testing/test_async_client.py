@@ -475,7 +475,7 @@ async def test_all_flags_state_degrades_gracefully_when_evaluator_raises():
         send_events=False,
     )
     async with AsyncLDClient(config) as client:
-        async def fake_evaluate(flag, context, event_factory):
+        async def fake_evaluate(flag, context, event_factory, scope=None):
             if flag['key'].startswith('flag-bad'):
                 raise RuntimeError("boom")
             result = EvalResult()
@@ -500,3 +500,46 @@ async def test_all_flags_state_degrades_gracefully_when_evaluator_raises():
     assert flags_state['flag-good'].get('prerequisites') == ['prereq-x']
     assert 'prerequisites' not in flags_state['flag-bad-last']
     assert 'prerequisites' not in flags_state['flag-bad-first']
+
+
+@pytest.mark.asyncio
+async def test_variations_returns_values_and_runs_hooks_per_flag():
+    """variations() returns the same values as variation() and runs hooks once per flag."""
+    from ldclient.hook import AsyncHook, Metadata
+
+    class RecordingHook(AsyncHook):
+        def __init__(self):
+            self.keys = []
+
+        @property
+        def metadata(self):
+            return Metadata(name='recording-hook')
+
+        async def before_evaluation(self, series_context, data):
+            self.keys.append((series_context.key, series_context.method))
+            return data
+
+        async def after_evaluation(self, series_context, data, detail):
+            return data
+
+    store = MockAsyncFeatureStore()
+    await store.force_set(FEATURES, _make_flag('flag-1', 'one'))
+    await store.force_set(FEATURES, _make_flag('flag-2', 'two'))
+    store._initialized = True
+
+    config = AsyncConfig(
+        "test-sdk-key",
+        feature_store=store,
+        update_processor_class=MockAsyncUpdateProcessor,
+        send_events=False,
+    )
+    hook = RecordingHook()
+    async with AsyncLDClient(config) as client:
+        client.add_hook(hook)
+        context = Context.create('user-1')
+        values = await client.variations(['flag-1', 'flag-2', 'missing'], context, {'missing': 'fallback'})
+        details = await client.variation_details(['flag-1'], context)
+        assert details['flag-1'] == await client.variation_detail('flag-1', context, None)
+
+    assert values == {'flag-1': 'one', 'flag-2': 'two', 'missing': 'fallback'}
+    assert hook.keys[:4] == [('flag-1', 'variations'), ('flag-2', 'variations'), ('missing', 'variations'), ('flag-1', 'variation_details')]
@@ -4,7 +4,14 @@ import pytest
 
 from ldclient.async_feature_store_helpers import AsyncCachingStoreWrapper
 from ldclient.feature_store import CacheConfig
-from ldclient.versioned_data_kind import VersionedDataKind
+from ldclient.testing.builders import (
+    FlagBuilder,
+    FlagRuleBuilder,
+    SegmentBuilder,
+    SegmentRuleBuilder,
+    make_clause_matching_segment_key
+)
+from ldclient.versioned_data_kind import FEATURES, SEGMENTS, VersionedDataKind
 
 # These tests exercise the caching-wrapper logic only, using an in-memory mock core, so they run
 # without a Redis instance. They mirror ldclient.testing.test_feature_store_helpers for the sync
@@ -84,6 +91,54 @@ class AvailableCore(MockAsyncCore):
         return self._available
 
 
+class BlockingAsyncCore(MockAsyncCore):
+    """Holds each query until released, so that several tasks can miss the cache at once."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = asyncio.Event()
+        self.query_count = 0
+
+    async def get_internal(self, kind, key):
+        self.query_count += 1
+        await self.release.wait()
+        return await super().get_internal(kind, key)
+
+    async def get_all_internal(self, kind):
+        self.query_count += 1
+        await self.release.wait()
+        return await super().get_all_internal(kind)
+
+
+class BatchingAsyncCore(MockAsyncCore):
+    """Records the keys of each query, and supports reading several items at once."""
+
+    def __init__(self):
+        super().__init__()
+        self.queries = []
+
+    async def get_internal(self, kind, key):
+        self.queries.append((kind, {key}))
+        return await super().get_internal(kind, key)
+
+    async def get_many_internal(self, kind, keys):
+        self.queries.append((kind, set(keys)))
+        items = self.data.get(kind, {})
+        return {key: items[key] for key in keys if key in items}
+
+
+def flag_with_dependencies():
+    flag = FlagBuilder("flag1").prerequisite("flag2", 0).prerequisite("flag3", 0) \
+        .rules(FlagRuleBuilder().clauses(make_clause_matching_segment_key("seg1", "seg2")).build()).build()
+    flags = [flag, FlagBuilder("flag2").prerequisite("flag4", 0).build(), FlagBuilder("flag3").build(), FlagBuilder("flag4").build()]
+    segments = [
+        SegmentBuilder("seg1").rules(SegmentRuleBuilder().clauses(make_clause_matching_segment_key("seg3")).build()).build(),
+        SegmentBuilder("seg2").build(),
+        SegmentBuilder("seg3").build(),
+    ]
+    return flags, segments
+
+
 class CustomError(Exception):
     pass
 
@@ -234,6 +289,151 @@ class TestAsyncCachingStoreWrapper:
         with pytest.raises(CustomError):
             await wrapper.all(THINGS)
 
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("cached", [False, True])
+    async def test_concurrent_get_misses_share_one_query(self, cached):
+        core = BlockingAsyncCore()
+        wrapper = make_wrapper(core, cached)
+        item = {"key": "flag", "version": 1}
+        core.force_set(THINGS, item)
+
+        tasks = [asyncio.ensure_future(wrapper.get(THINGS, "flag")) for _ in range(5)]
+        await asyncio.sleep(0)
+        core.release.set()
+
+        assert await asyncio.gather(*tasks) == [item] * 5
+        assert core.query_count == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("cached", [False, True])
+    async def test_concurrent_get_all_misses_share_one_query(self, cached):
+        core = BlockingAsyncCore()
+        wrapper = make_wrapper(core, cached)
+        item = {"key": "flag", "version": 1}
+        core.force_set(THINGS, item)
+
+        tasks = [asyncio.ensure_future(wrapper.all(THINGS)) for _ in range(5)]
+        await asyncio.sleep(0)
+        core.release.set()
+
+        assert await asyncio.gather(*tasks) == [{"flag": item}] * 5
+        assert core.query_count == 1
+
+    @pytest.mark.asyncio
+    async def test_cancelling_one_caller_does_not_cancel_shared_query(self):
+        core = BlockingAsyncCore()
+        wrapper = make_wrapper(core, True)
+        item = {"key": "flag", "version": 1}
+        core.force_set(THINGS, item)
+
+        first = asyncio.ensure_future(wrapper.get(THINGS, "flag"))
+        second = asyncio.ensure_future(wrapper.get(THINGS, "flag"))
+        await asyncio.sleep(0)
+        first.cancel()
+        core.release.set()
+
+        assert await second == item
+        assert first.cancelled()
+        assert core.query_count == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_get_misses_all_receive_query_error(self):
+        core = BlockingAsyncCore()
+        wrapper = make_wrapper(core, True)
+        core.error = CustomError()
+
+        tasks = [asyncio.ensure_future(wrapper.get(THINGS, "flag")) for _ in range(3)]
+        await asyncio.sleep(0)
+        core.release.set()
+
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(isinstance(r, CustomError) for r in results)
+
+        core.error = None
+        assert await wrapper.get(THINGS, "flag") is None  # a failed query is not remembered
+
+    @pytest.mark.asyncio
+    async def test_stale_item_is_returned_while_it_is_refreshed(self):
+        core = MockAsyncCore()
+        wrapper = AsyncCachingStoreWrapper(core, CacheConfig(expiration=0.1, max_staleness=30))
+        itemv1 = {"key": "flag", "version": 1}
+        itemv2 = {"key": "flag", "version": 2}
+        core.force_set(THINGS, itemv1)
+        assert await wrapper.get(THINGS, "flag") == itemv1
+
+        core.force_set(THINGS, itemv2)
+        await asyncio.sleep(0.2)
+        assert await wrapper.get(THINGS, "flag") == itemv1  # stale, so a refresh starts in the background
+        await asyncio.sleep(0.01)
+        assert await wrapper.get(THINGS, "flag") == itemv2
+        await wrapper.close()
+
+    @pytest.mark.asyncio
+    async def test_get_many_reads_uncached_items_together(self):
+        core = BatchingAsyncCore()
+        wrapper = make_wrapper(core, True)
+        item1 = {"key": "flag1", "version": 1}
+        item2 = {"key": "flag2", "version": 1}
+        core.force_set(THINGS, item1)
+        core.force_set(THINGS, item2)
+        assert await wrapper.get(THINGS, "flag1") == item1
+
+        assert await wrapper.get_many(THINGS, ["flag1", "flag2", "flag3"]) == {"flag1": item1, "flag2": item2, "flag3": None}
+        assert core.queries == [(THINGS, {"flag1"}), (THINGS, {"flag2", "flag3"})]
+
+    @pytest.mark.asyncio
+    async def test_loading_flag_loads_its_dependencies_by_level(self):
+        core = BatchingAsyncCore()
+        wrapper = make_wrapper(core, True)
+        flags, segments = flag_with_dependencies()
+        for f in flags:
+            core.force_set(FEATURES, f.to_json_dict())
+        for s in segments:
+            core.force_set(SEGMENTS, s.to_json_dict())
+
+        assert (await wrapper.get(FEATURES, "flag1")).key == "flag1"
+        assert core.queries[0] == (FEATURES, {"flag1"})
+        assert sorted(core.queries[1:3], key=lambda q: q[0].namespace) == [(FEATURES, {"flag2", "flag3"}), (SEGMENTS, {"seg1", "seg2"})]
+        assert sorted(core.queries[3:], key=lambda q: q[0].namespace) == [(FEATURES, {"flag4"}), (SEGMENTS, {"seg3"})]
+
+        for key in ["flag2", "flag3", "flag4"]:
+            assert (await wrapper.get(FEATURES, key)).key == key
+        for key in ["seg1", "seg2", "seg3"]:
+            assert (await wrapper.get(SEGMENTS, key)).key == key
+        assert len(core.queries) == 5
+
+    @pytest.mark.asyncio
+    async def test_loading_flag_does_not_reload_its_cached_dependencies(self):
+        core = BatchingAsyncCore()
+        wrapper = make_wrapper(core, True)
+        flags, segments = flag_with_dependencies()
+        for f in flags:
+            core.force_set(FEATURES, f.to_json_dict())
+        for s in segments:
+            core.force_set(SEGMENTS, s.to_json_dict())
+        assert (await wrapper.get(FEATURES, "flag2")).key == "flag2"
+        assert (await wrapper.get(SEGMENTS, "seg1")).key == "seg1"
+        del core.queries[:]
+
+        assert (await wrapper.get(FEATURES, "flag1")).key == "flag1"
+        assert core.queries[0] == (FEATURES, {"flag1"})
+        # flag2, flag4, seg1 and seg3 were cached; the cached ones are still followed to their dependencies
+        assert sorted(core.queries[1:], key=lambda q: q[0].namespace) == [(FEATURES, {"flag3"}), (SEGMENTS, {"seg2"})]
+
+    @pytest.mark.asyncio
+    async def test_all_items_are_refreshed_proactively(self):
+        core = MockAsyncCore()
+        wrapper = AsyncCachingStoreWrapper(core, CacheConfig(expiration=1, refresh_all_proactively=True))
+        itemv1 = {"key": "flag", "version": 1}
+        itemv2 = {"key": "flag", "version": 2}
+        core.force_set(THINGS, itemv1)
+        assert await wrapper.all(THINGS) == {"flag": itemv1}
+
+        core.force_set(THINGS, itemv2)
+        await asyncio.sleep(0.7)  # the cached set has not expired yet, but was refreshed after half of the TTL
+        assert await wrapper.all(THINGS) == {"flag": itemv2}
+        await wrapper.close()
+
     @pytest.mark.asyncio
     @pytest.mark.parametrize("cached", [False, True])
     async def test_upsert_successful(self, cached):
@@ -275,6 +475,25 @@ class TestAsyncCachingStoreWrapper:
         core.force_set(THINGS, itemv3)  # bypasses cache so we can verify itemv2 is in the cache
         assert await wrapper.get(THINGS, key) == itemv2
 
+    @pytest.mark.asyncio
+    async def test_cached_upsert_updates_cached_all_items(self):
+        core = MockAsyncCore()
+        wrapper = make_wrapper(core, True)
+        item1 = {"key": "flag1", "version": 1}
+        item2 = {"key": "flag2", "version": 1}
+        item1v2 = {"key": "flag1", "version": 2}
+        await wrapper.init({THINGS: {"flag1": item1}})
+        before = await wrapper.all(THINGS)
+
+        await wrapper.upsert(THINGS, item2)
+        await wrapper.upsert(THINGS, item1v2)
+        core.force_remove(THINGS, "flag1")  # bypasses cache so we can verify that the set was not reloaded
+        assert await wrapper.all(THINGS) == {"flag1": item1v2, "flag2": item2}
+
+        await wrapper.delete(THINGS, "flag2", 2)
+        assert await wrapper.all(THINGS) == {"flag1": item1v2}
+        assert before == {"flag1": item1}  # a set that was already returned is not modified
+
     @pytest.mark.asyncio
     @pytest.mark.parametrize("cached", [False, True])
     async def test_upsert_can_throw_exception(self, cached):
@@ -1,3 +1,4 @@
+from threading import Event, Thread
 from time import sleep
 from unittest.mock import Mock
 
@@ -5,7 +6,14 @@ import pytest
 
 from ldclient.feature_store import CacheConfig
 from ldclient.feature_store_helpers import CachingStoreWrapper
-from ldclient.versioned_data_kind import VersionedDataKind
+from ldclient.testing.builders import (
+    FlagBuilder,
+    FlagRuleBuilder,
+    SegmentBuilder,
+    SegmentRuleBuilder,
+    make_clause_matching_segment_key
+)
+from ldclient.versioned_data_kind import FEATURES, SEGMENTS, VersionedDataKind
 
 THINGS = VersionedDataKind(namespace="things", request_api_path="", stream_api_path="")
 WRONG_THINGS = VersionedDataKind(namespace="wrong", request_api_path="", stream_api_path="")
@@ -72,6 +80,74 @@ class MockCore:
             items.pop(key, None)
 
 
+class BlockingCore(MockCore):
+    """Holds each query until released, so that several threads can miss the cache at once."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = Event()
+        self.query_count = 0
+
+    def get_internal(self, kind, key):
+        self.query_count += 1
+        self.release.wait()
+        return super().get_internal(kind, key)
+
+    def get_all_internal(self, kind):
+        self.query_count += 1
+        self.release.wait()
+        return super().get_all_internal(kind)
+
+
+def call_concurrently(count, fn):
+    results = []
+    errors = []
+
+    def run():
+        try:
+            results.append(fn())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [Thread(target=run) for _ in range(count)]
+    for t in threads:
+        t.start()
+    return threads, results, errors
+
+
+class RecordingCore(MockCore):
+    """Records the keys of each query."""
+
+    def __init__(self):
+        super().__init__()
+        self.queries = []
+
+    def get_internal(self, kind, key):
+        self.queries.append((kind, {key}))
+        return super().get_internal(kind, key)
+
+
+class BatchingCore(RecordingCore):
+    """Records the keys of each query, and supports reading several items at once."""
+
+    def get_many_internal(self, kind, keys):
+        self.queries.append((kind, set(keys)))
+        items = self.data.get(kind, {})
+        return {key: items[key] for key in keys if key in items}
+
+
+def flag_with_dependencies():
+    flag = FlagBuilder("flag1").prerequisite("flag2", 0).prerequisite("flag3", 0) \
+        .rules(FlagRuleBuilder().clauses(make_clause_matching_segment_key("seg1", "seg2")).build()).build()
+    flags = [flag, FlagBuilder("flag2").prerequisite("flag4", 0).build(), FlagBuilder("flag3").build(), FlagBuilder("flag4").build()]
+    segments = [
+        SegmentBuilder("seg1").rules(SegmentRuleBuilder().clauses(make_clause_matching_segment_key("seg3")).build()).build(),
+        SegmentBuilder("seg2").build(),
+        SegmentBuilder("seg3").build(),
+    ]
+    return flags, segments
+
+
 class CustomError(Exception):
     pass
 
@@ -226,6 +302,183 @@ class TestCachingStoreWrapper:
         with pytest.raises(CustomError):
             wrapper.all(THINGS)
 
+    def test_concurrent_get_misses_share_one_query(self):
+        core = BlockingCore()
+        wrapper = make_wrapper(core, True)
+        item = {"key": "flag", "version": 1}
+        core.force_set(THINGS, item)
+
+        threads, results, errors = call_concurrently(5, lambda: wrapper.get(THINGS, "flag"))
+        sleep(0.1)
+        core.release.set()
+        for t in threads:
+            t.join()
+
+        assert errors == []
+        assert results == [item] * 5
+        assert core.query_count == 1
+
+    def test_concurrent_get_all_misses_share_one_query(self):
+        core = BlockingCore()
+        wrapper = make_wrapper(core, True)
+        item = {"key": "flag", "version": 1}
+        core.force_set(THINGS, item)
+
+        threads, results, errors = call_concurrently(5, lambda: wrapper.all(THINGS))
+        sleep(0.1)
+        core.release.set()
+        for t in threads:
+            t.join()
+
+        assert errors == []
+        assert results == [{"flag": item}] * 5
+        assert core.query_count == 1
+
+    def test_concurrent_get_misses_all_receive_query_error(self):
+        core = BlockingCore()
+        wrapper = make_wrapper(core, True)
+        core.error = CustomError()
+
+        threads, results, errors = call_concurrently(3, lambda: wrapper.get(THINGS, "flag"))
+        sleep(0.1)
+        core.release.set()
+        for t in threads:
+            t.join()
+
+        assert results == []
+        assert len(errors) == 3
+        assert all(isinstance(e, CustomError) for e in errors)
+
+        core.error = None
+        assert wrapper.get(THINGS, "flag") is None  # a failed query is not remembered
+
+    def test_stale_item_is_returned_while_it_is_refreshed(self):
+        core = MockCore()
+        wrapper = CachingStoreWrapper(core, CacheConfig(expiration=0.1, max_staleness=30))
+        itemv1 = {"key": "flag", "version": 1}
+        itemv2 = {"key": "flag", "version": 2}
+        core.force_set(THINGS, itemv1)
+        assert wrapper.get(THINGS, "flag") == itemv1
+
+        core.force_set(THINGS, itemv2)
+        sleep(0.2)
+        assert wrapper.get(THINGS, "flag") == itemv1  # stale, so a refresh starts in the background
+        for _ in range(50):
+            if wrapper.get(THINGS, "flag") == itemv2:
+                break
+            sleep(0.01)
+        assert wrapper.get(THINGS, "flag") == itemv2
+        wrapper.close()
+
+    def test_item_older_than_max_staleness_is_read_from_store(self):
+        core = MockCore()
+        wrapper = CachingStoreWrapper(core, CacheConfig(expiration=0.1, max_staleness=0.2))
+        itemv1 = {"key": "flag", "version": 1}
+        itemv2 = {"key": "flag", "version": 2}
+        core.force_set(THINGS, itemv1)
+        assert wrapper.get(THINGS, "flag") == itemv1
+
+        core.force_set(THINGS, itemv2)
+        sleep(0.3)
+        assert wrapper.get(THINGS, "flag") == itemv2
+        wrapper.close()
+
+    def test_all_items_are_refreshed_proactively(self):
+        core = MockCore()
+        wrapper = CachingStoreWrapper(core, CacheConfig(expiration=1, refresh_all_proactively=True))
+        itemv1 = {"key": "flag", "version": 1}
+        itemv2 = {"key": "flag", "version": 2}
+        core.force_set(THINGS, itemv1)
+        assert wrapper.all(THINGS) == {"flag": itemv1}
+
+        core.force_set(THINGS, itemv2)
+        sleep(0.7)  # the cached set has not expired yet, but was refreshed after half of the TTL
+        assert wrapper.all(THINGS) == {"flag": itemv2}
+        wrapper.close()
+
+    def test_get_many_reads_uncached_items_together(self):
+        core = BatchingCore()
+        wrapper = make_wrapper(core, True)
+        item1 = {"key": "flag1", "version": 1}
+        item2 = {"key": "flag2", "version": 1}
+        core.force_set(THINGS, item1)
+        core.force_set(THINGS, item2)
+        assert wrapper.get(THINGS, "flag1") == item1
+
+        assert wrapper.get_many(THINGS, ["flag1", "flag2", "flag3"]) == {"flag1": item1, "flag2": item2, "flag3": None}
+        assert core.queries == [(THINGS, {"flag1"}), (THINGS, {"flag2", "flag3"})]
+        assert wrapper.get_many(THINGS, ["flag2", "flag3"]) == {"flag2": item2, "flag3": None}
+        assert len(core.queries) == 2
+
+    def test_get_many_reads_items_one_at_a_time_if_core_cannot_batch(self):
+        core = MockCore()
+        wrapper = make_wrapper(core, True)
+        item1 = {"key": "flag1", "version": 1}
+        core.force_set(THINGS, item1)
+        assert wrapper.get_many(THINGS, ["flag1", "flag2"]) == {"flag1": item1, "flag2": None}
+
+    def test_loading_flag_loads_its_dependencies_by_level(self):
+        core = BatchingCore()
+        wrapper = make_wrapper(core, True)
+        flags, segments = flag_with_dependencies()
+        for f in flags:
+            core.force_set(FEATURES, f.to_json_dict())
+        for s in segments:
+            core.force_set(SEGMENTS, s.to_json_dict())
+
+        assert wrapper.get(FEATURES, "flag1").key == "flag1"
+        assert core.queries[0] == (FEATURES, {"flag1"})
+        assert sorted(core.queries[1:3], key=lambda q: q[0].namespace) == [(FEATURES, {"flag2", "flag3"}), (SEGMENTS, {"seg1", "seg2"})]
+        assert sorted(core.queries[3:], key=lambda q: q[0].namespace) == [(FEATURES, {"flag4"}), (SEGMENTS, {"seg3"})]
+
+        for key in ["flag2", "flag3", "flag4"]:
+            assert wrapper.get(FEATURES, key).key == key
+        for key in ["seg1", "seg2", "seg3"]:
+            assert wrapper.get(SEGMENTS, key).key == key
+        assert len(core.queries) == 5
+
+    def test_loading_flag_does_not_load_its_dependencies_without_cache(self):
+        core = BatchingCore()
+        wrapper = make_wrapper(core, False)
+        flags, segments = flag_with_dependencies()
+        for f in flags:
+            core.force_set(FEATURES, f.to_json_dict())
+
+        assert wrapper.get(FEATURES, "flag1").key == "flag1"
+        assert core.queries == [(FEATURES, {"flag1"})]
+
+    def test_loading_flag_does_not_load_its_dependencies_if_core_cannot_batch(self):
+        core = RecordingCore()
+        wrapper = make_wrapper(core, True)
+        flags, segments = flag_with_dependencies()
+        for f in flags:
+            core.force_set(FEATURES, f.to_json_dict())
+
+        assert wrapper.get(FEATURES, "flag1").key == "flag1"
+        assert core.queries == [(FEATURES, {"flag1"})]
+
+    def test_loading_flag_does_not_reload_its_cached_dependencies(self):
+        core = BatchingCore()
+        wrapper = make_wrapper(core, True)
+        flags, segments = flag_with_dependencies()
+        for f in flags:
+            core.force_set(FEATURES, f.to_json_dict())
+        for s in segments:
+            core.force_set(SEGMENTS, s.to_json_dict())
+        assert wrapper.get(FEATURES, "flag2").key == "flag2"
+        assert wrapper.get(SEGMENTS, "seg1").key == "seg1"
+        del core.queries[:]
+
+        assert wrapper.get(FEATURES, "flag1").key == "flag1"
+        assert core.queries[0] == (FEATURES, {"flag1"})
+        # flag2, flag4, seg1 and seg3 were cached; the cached ones are still followed to their dependencies
+        assert sorted(core.queries[1:], key=lambda q: q[0].namespace) == [(FEATURES, {"flag3"}), (SEGMENTS, {"seg2"})]
+
+    def test_max_staleness_not_greater_than_expiration_is_ignored(self):
+        assert CacheConfig(expiration=10, max_staleness=5).max_staleness is None
+        assert CacheConfig(expiration=10, max_staleness=20).max_staleness == 20
+        assert CacheConfig(expiration=0, max_staleness=20).max_staleness is None
+
     @pytest.mark.parametrize("cached", [False, True])
     def test_upsert_successful(self, cached):
         core = MockCore()
@@ -269,6 +522,24 @@ class TestCachingStoreWrapper:
         core.force_set(THINGS, itemv3)  # bypasses cache so we can verify that itemv2 is in the cache
         assert wrapper.get(THINGS, key) == itemv2
 
+    def test_cached_upsert_updates_cached_all_items(self):
+        core = MockCore()
+        wrapper = make_wrapper(core, True)
+        item1 = {"key": "flag1", "version": 1}
+        item2 = {"key": "flag2", "version": 1}
+        item1v2 = {"key": "flag1", "version": 2}
+        wrapper.init({THINGS: {"flag1": item1}})
+        before = wrapper.all(THINGS)
+
+        wrapper.upsert(THINGS, item2)
+        wrapper.upsert(THINGS, item1v2)
+        core.force_remove(THINGS, "flag1")  # bypasses cache so we can verify that the set was not reloaded
+        assert wrapper.all(THINGS) == {"flag1": item1v2, "flag2": item2}
+
+        wrapper.delete(THINGS, "flag2", 2)
+        assert wrapper.all(THINGS) == {"flag1": item1v2}
+        assert before == {"flag1": item1}  # a set that was already returned is not modified
+
     @pytest.mark.parametrize("cached", [False, True])
     def test_upsert_can_throw_exception(self, cached):
         core = MockCore()
@@ -1,11 +1,13 @@
 import pytest
 
 from ldclient.feature_store import InMemoryFeatureStore
+from ldclient.impl.datasystem import store as datasystem_store
 from ldclient.interfaces import FeatureStore
 from ldclient.testing.feature_store_test_base import (
     FeatureStoreTestBase,
     FeatureStoreTester
 )
+from ldclient.versioned_data_kind import FEATURES, SEGMENTS
 
 
 def test_in_memory_status_checks():
@@ -15,6 +17,37 @@ def test_in_memory_status_checks():
     assert store.is_available() is True
 
 
+def test_all_returns_read_only_snapshot_unaffected_by_later_updates():
+    store = InMemoryFeatureStore()
+    store.init({FEATURES: {'a': {'key': 'a', 'version': 1}, 'b': {'key': 'b', 'version': 1}}})
+    store.delete(FEATURES, 'b', 2)
+    before = store.all(FEATURES, lambda x: x)
+    assert sorted(before.keys()) == ['a']
+    with pytest.raises(TypeError):
+        before['c'] = {}  # type: ignore[index]
+
+    store.upsert(FEATURES, {'key': 'c', 'version': 1})
+    store.delete(FEATURES, 'a', 2)
+    store.upsert(FEATURES, {'key': 'c', 'version': 1, 'on': True})
+    assert sorted(before.keys()) == ['a']
+    assert sorted(store.all(FEATURES, lambda x: x).keys()) == ['c']
+    assert store.get(FEATURES, 'a') is None
+    assert store.get(FEATURES, 'c').on is False
+    assert store.all(SEGMENTS, lambda x: x) == {}
+
+
+def test_data_system_store_applies_deltas_to_new_snapshot():
+    store = datasystem_store.InMemoryFeatureStore()
+    assert store.set_basis({FEATURES: {'a': {'key': 'a', 'version': 1}}, SEGMENTS: {'s': {'key': 's', 'version': 1}}})
+    before = store.all(FEATURES)
+    assert store.apply_delta({FEATURES: {'a': {'key': 'a', 'version': 2, 'deleted': True}, 'b': {'key': 'b', 'version': 1}}})
+    assert sorted(before.keys()) == ['a']
+    assert sorted(store.all(FEATURES).keys()) == ['b']
+    assert store.get(FEATURES, 'a') is None
+    assert store.get(FEATURES, 'b').version == 1
+    assert sorted(store.all(SEGMENTS).keys()) == ['s']
+
+
 class InMemoryFeatureStoreTester(FeatureStoreTester):
     def create_feature_store(self) -> FeatureStore:
         return InMemoryFeatureStore()
@@ -79,6 +79,21 @@ def test_client_has_polling_processor_if_streaming_is_disabled():
         assert isinstance(client._data_system._update_processor, PollingUpdateProcessor)
 
 
+def test_event_metrics_are_none_when_events_are_disabled():
+    with make_offline_client() as client:
+        assert client.get_event_metrics() is None
+
+
+def test_event_metrics_come_from_event_processor():
+    config = Config(sdk_key="secret", base_uri=unreachable_uri, events_uri=unreachable_uri, update_processor_class=MockUpdateProcessor, diagnostic_opt_out=True)
+    with LDClient(config=config) as client:
+        client.track('event', context)
+        client._event_processor._wait_until_inactive()
+        metrics = client.get_event_metrics()
+        assert metrics is not None
+        assert metrics.context_lookups == 1
+
+
 def test_toggle_offline():
     with make_offline_client() as client:
         assert client.variation('feature.key', user, default=None) is None
@@ -365,7 +365,7 @@ def test_all_flags_state_degrades_per_flag_on_evaluator_error():
     good_result.detail = EvaluationDetail('y', 0, {'kind': 'FALLTHROUGH'})
     good_result.prerequisites = ['prereq-of-good']
 
-    def fake_evaluate(flag, context, event_factory):
+    def fake_evaluate(flag, context, event_factory, scope=None):
         if flag['key'] == 'good':
             return good_result
         raise RuntimeError("boom")
@@ -382,3 +382,165 @@ def test_all_flags_state_degrades_per_flag_on_evaluator_error():
     assert metadata['good'].get('prerequisites') == ['prereq-of-good']
     assert 'prerequisites' not in metadata['bad-first']
     assert 'prerequisites' not in metadata['bad-last']
+
+
+class CountingFeatureStore(InMemoryFeatureStore):
+    def __init__(self):
+        super().__init__()
+        self.gets = []
+
+    def get(self, kind, key, callback=lambda x: x):
+        self.gets.append((kind.namespace, key))
+        return super().get(kind, key, callback)
+
+
+def _make_batch_test_store() -> CountingFeatureStore:
+    segment = SegmentBuilder('segkey').included(user.key).build()
+    prereq = FlagBuilder('prereq').version(5).on(True).variations(False, True).fallthrough_variation(1).build()
+    flag_a = FlagBuilder('flag-a').on(True).variations('a-off', 'a-on').off_variation(0).prerequisite('prereq', 1).fallthrough_variation(1).build()
+    flag_b = (
+        FlagBuilder('flag-b')
+        .on(True)
+        .variations('b-off', 'b-on', 'b-segment')
+        .off_variation(0)
+        .prerequisite('prereq', 1)
+        .rules(FlagRuleBuilder().clauses(make_clause_matching_segment_key('segkey')).variation(2).build())
+        .fallthrough_variation(1)
+        .build()
+    )
+    flag_c = FlagBuilder('flag-c').on(True).variations('c-off', 'c-segment').rules(FlagRuleBuilder().clauses(make_clause_matching_segment_key('segkey')).variation(1).build()).build()
+    store = CountingFeatureStore()
+    store.init({FEATURES: {f.key: f.to_json_dict() for f in [prereq, flag_a, flag_b, flag_c]}, SEGMENTS: {'segkey': segment.to_json_dict()}})
+    return store
+
+
+def _events_without_timestamps(client) -> list:
+    events = [e.to_debugging_dict() for e in client._event_processor._events]
+    for e in events:
+        del e['timestamp']
+    return events
+
+
+def test_variations_returns_values_and_defaults():
+    client = make_client(_make_batch_test_store())
+    values = client.variations(['flag-a', 'flag-b', 'flag-c', 'unknown'], user, {'unknown': 'default-value'})
+    assert values == {'flag-a': 'a-on', 'flag-b': 'b-segment', 'flag-c': 'c-segment', 'unknown': 'default-value'}
+
+
+def test_variations_produces_same_events_as_individual_calls():
+    keys = ['flag-a', 'flag-b', 'flag-c', 'unknown']
+    individual_client = make_client(_make_batch_test_store())
+    for key in keys:
+        individual_client.variation(key, user, None)
+    batch_client = make_client(_make_batch_test_store())
+    batch_client.variations(keys, user)
+    assert _events_without_timestamps(batch_client) == _events_without_timestamps(individual_client)
+
+
+def test_variation_details_produces_same_details_and_events_as_individual_calls():
+    keys = ['flag-a', 'flag-b', 'flag-c']
+    individual_client = make_client(_make_batch_test_store())
+    individual_details = {key: individual_client.variation_detail(key, user, None) for key in keys}
+    batch_client = make_client(_make_batch_test_store())
+    assert batch_client.variation_details(keys, user) == individual_details
+    assert _events_without_timestamps(batch_client) == _events_without_timestamps(individual_client)
+
+
+def test_variations_reads_each_flag_and_segment_once():
+    store = _make_batch_test_store()
+    client = make_client(store)
+    client.variations(['flag-a', 'flag-b', 'flag-c', 'prereq'], user)
+    assert sorted(store.gets) == [('features', 'flag-a'), ('features', 'flag-b'), ('features', 'flag-c'), ('features', 'prereq'), ('segments', 'segkey')]
+
+
+def test_variation_details_shares_big_segment_query():
+    segment = SegmentBuilder('segkey').unbounded(True).generation(1).build()
+    flag_a = FlagBuilder('flag-a').on(True).variations(False, True).rules(FlagRuleBuilder().clauses(make_clause_matching_segment_key('segkey')).variation(1).build()).build()
+    flag_b = FlagBuilder('flag-b').on(True).variations(False, True).rules(FlagRuleBuilder().clauses(make_clause_matching_segment_key('segkey')).variation(1).build()).build()
+    store = InMemoryFeatureStore()
+    store.init({FEATURES: {'flag-a': flag_a.to_json_dict(), 'flag-b': flag_b.to_json_dict()}, SEGMENTS: {'segkey': segment.to_json_dict()}})
+    segstore = MockBigSegmentStore()
+    segstore.setup_metadata_always_up_to_date()
+    segstore.setup_membership(_hash_for_user_key(user.key), {_make_big_segment_ref(segment): True})
+    config = Config(sdk_key='SDK_KEY', feature_store=store, big_segments=BigSegmentsConfig(store=segstore), event_processor_class=MockEventProcessor, update_processor_class=MockUpdateProcessor)
+    with LDClient(config) as client:
+        details = client.variation_details(['flag-a', 'flag-b'], user)
+        for detail in details.values():
+            assert detail.value is True
+            assert detail.reason['bigSegmentsStatus'] == BigSegmentsStatus.HEALTHY
+        assert len(segstore.membership_queries) == 1
+
+
+def _make_two_big_segments_config():
+    # The context is only in seg2. flag-b has a rule for seg1 and then one for seg2, so it queries the
+    # membership and then reuses it; flag-c only has a rule for seg2.
+    seg1 = SegmentBuilder('seg1').unbounded(True).generation(1).build()
+    seg2 = SegmentBuilder('seg2').unbounded(True).generation(1).build()
+
+    def rule_for(segment):
+        return FlagRuleBuilder().clauses(make_clause_matching_segment_key(segment.key)).variation(1).build()
+
+    flag_b = FlagBuilder('flag-b').on(True).variations(False, True).fallthrough_variation(0).rules(rule_for(seg1), rule_for(seg2)).build()
+    flag_c = FlagBuilder('flag-c').on(True).variations(False, True).fallthrough_variation(0).rules(rule_for(seg2)).build()
+    # flag-d and flag-e reach the same segments through prerequisites
+    flag_d = FlagBuilder('flag-d').on(True).variations(False, True).fallthrough_variation(1).prerequisite('flag-b', 1).prerequisite('flag-c', 1).build()
+    flag_e = FlagBuilder('flag-e').on(True).variations(False, True).fallthrough_variation(1).prerequisite('flag-c', 1).build()
+    flags = {f.key: f.to_json_dict() for f in [flag_b, flag_c, flag_d, flag_e]}
+    store = InMemoryFeatureStore()
+    store.init({FEATURES: flags, SEGMENTS: {'seg1': seg1.to_json_dict(), 'seg2': seg2.to_json_dict()}})
+    segstore = MockBigSegmentStore()
+    segstore.setup_metadata_always_up_to_date()
+    segstore.setup_membership(_hash_for_user_key(user.key), {_make_big_segment_ref(seg2): True})
+    return Config(sdk_key='SDK_KEY', feature_store=store, big_segments=BigSegmentsConfig(store=segstore), event_processor_class=MockEventProcessor, update_processor_class=MockUpdateProcessor)
+
+
+def test_variation_details_reports_big_segments_status_for_reused_membership():
+    with LDClient(_make_two_big_segments_config()) as client:
+        individual_details = {key: client.variation_detail(key, user, None) for key in ['flag-b', 'flag-c']}
+    with LDClient(_make_two_big_segments_config()) as client:
+        details = client.variation_details(['flag-b', 'flag-c'], user)
+    assert details == individual_details
+    assert details['flag-c'].reason['bigSegmentsStatus'] == BigSegmentsStatus.HEALTHY
+
+
+def test_all_flags_state_reports_big_segments_status_for_flags_sharing_a_big_segment():
+    keys = ['flag-b', 'flag-c', 'flag-d', 'flag-e']
+    with LDClient(_make_two_big_segments_config()) as client:
+        individual_details = {key: client.variation_detail(key, user, None) for key in keys}
+    with LDClient(_make_two_big_segments_config()) as client:
+        state = client.all_flags_state(user, with_reasons=True)
+    for key in keys:
+        assert state.get_flag_value(key) == individual_details[key].value
+        assert state.get_flag_reason(key) == individual_details[key].reason
+        assert state.get_flag_reason(key)['bigSegmentsStatus'] == BigSegmentsStatus.HEALTHY
+
+
+def test_all_flags_state_reads_each_segment_once_and_reuses_fetched_flags():
+    store = _make_batch_test_store()
+    client = make_client(store)
+    state = client.all_flags_state(user)
+    assert state.valid
+    assert store.gets == [('segments', 'segkey')]
+    individual_client = make_client(_make_batch_test_store())
+    for key in ['flag-a', 'flag-b', 'flag-c', 'prereq']:
+        detail = individual_client.variation_detail(key, user, None)
+        assert state.get_flag_value(key) == detail.value
+        assert state.get_flag_reason(key) is None
+
+
+def test_all_flags_state_shares_big_segment_query():
+    segment = SegmentBuilder('segkey').unbounded(True).generation(1).build()
+    flag_a = FlagBuilder('flag-a').on(True).variations(False, True).rules(FlagRuleBuilder().clauses(make_clause_matching_segment_key('segkey')).variation(1).build()).build()
+    flag_b = FlagBuilder('flag-b').on(True).variations(False, True).rules(FlagRuleBuilder().clauses(make_clause_matching_segment_key('segkey')).variation(1).build()).build()
+    store = InMemoryFeatureStore()
+    store.init({FEATURES: {'flag-a': flag_a.to_json_dict(), 'flag-b': flag_b.to_json_dict()}, SEGMENTS: {'segkey': segment.to_json_dict()}})
+    segstore = MockBigSegmentStore()
+    segstore.setup_metadata_always_up_to_date()
+    segstore.setup_membership(_hash_for_user_key(user.key), {_make_big_segment_ref(segment): True})
+    config = Config(sdk_key='SDK_KEY', feature_store=store, big_segments=BigSegmentsConfig(store=segstore), event_processor_class=MockEventProcessor, update_processor_class=MockUpdateProcessor)
+    with LDClient(config) as client:
+        state = client.all_flags_state(user, with_reasons=True)
+        for key in ['flag-a', 'flag-b']:
+            assert state.get_flag_value(key) is True
+            assert state.get_flag_reason(key)['bigSegmentsStatus'] == BigSegmentsStatus.HEALTHY
+        assert len(segstore.membership_queries) == 1
@@ -46,6 +46,13 @@ def test_client_has_null_event_processor_if_send_events_off():
         assert isinstance(client._event_processor, NullEventProcessor)
 
 
+def test_client_does_not_create_evaluation_events_if_send_events_off():
+    config = Config(sdk_key="secret", base_uri=unreachable_uri, update_processor_class=MockUpdateProcessor, send_events=False)
+    with LDClient(config=config) as client:
+        assert not client._event_factory_default.enabled
+        assert not client._event_factory_with_reasons.enabled
+
+
 def test_client_has_normal_event_processor_in_ldd_mode():
     with make_ldd_client() as client:
         assert isinstance(client._event_processor, DefaultEventProcessor)